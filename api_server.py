@@ -1,11 +1,26 @@
-from fastapi import FastAPI, HTTPException, Depends
+from fastapi import FastAPI, HTTPException, Depends, Request, Response
 from main import PersonalizedAdRecommendation
-from database.database import SessionLocal, init_database
+from config import Config
+from database.database import SessionLocal, engine, init_database, pool_metrics
+from database.interaction_writer import InteractionWriter
+from retraining import BackgroundTrainer
+from database.async_database import AsyncSessionLocal, AsyncRepository, async_pool_metrics, dispose_async_engine
+import metrics
+import tracing
 from sqlalchemy.orm import Session
 import uvicorn
-from typing import List, Dict, Any
-from contextlib import asynccontextmanager
+from typing import List, Dict, Any, Optional
+import logging
+import time
+from contextlib import asynccontextmanager, nullcontext
+import asyncio
+import contextvars
+import functools
+import queue
+from concurrent.futures import ThreadPoolExecutor
+from fastapi.encoders import jsonable_encoder
 from fastapi.middleware.cors import CORSMiddleware
+from pydantic import BaseModel
 
 app = FastAPI(
     title="个性化广告推荐API",
@@ -18,12 +33,72 @@ app = FastAPI(
 
 # 全局变量存储推荐系统实例
 ad_system = None
+interaction_writer = None
+# CPU 密集的推荐打分在有界线程池中执行，避免阻塞事件循环
+scoring_executor = None
+# 异步数据访问层（交互记录写入、用户画像读取）
+async_repository = None
+# 后台重新训练（独立进程训练，完成后热替换模型）
+background_trainer = None
+
+
+async def run_scoring(fn, *args):
+    """在打分线程池中执行 fn(*args)，上下文变量随任务一起传递；未启用线程池时直接执行"""
+    if scoring_executor is None:
+        return fn(*args)
+    loop = asyncio.get_running_loop()
+    context = contextvars.copy_context()
+    return await loop.run_in_executor(scoring_executor, functools.partial(context.run, fn, *args))
+
+
+# 请求头 X-Debug-Timing: 1 与查询参数 ?debug=timing 等价，在响应中附带各阶段耗时
+TIMING_HEADER = "X-Debug-Timing"
+
+
+def timing_requested(request: Request, debug: Optional[str]) -> bool:
+    return debug == "timing" or request.headers.get(TIMING_HEADER, "").lower() in ("1", "true", "timing")
+
+
+def with_timing(response: Dict[str, Any], trace) -> Dict[str, Any]:
+    """追踪模式下单独计时响应序列化，并把耗时明细放入响应的 timing 字段"""
+    with tracing.span("serialize"):
+        response = jsonable_encoder(response)
+    response["timing"] = trace.to_dict()
+    return response
+
+
+async def delta_sync_loop(interval: float):
+    """定时增量同步数据库中其他写入方的新数据
+
+    同步在线程中执行（使用独立的数据库会话，修改内存结构时持有写锁），不阻塞事件循环上的其他请求。
+    """
+    while True:
+        await asyncio.sleep(interval)
+        if ad_system is None:
+            continue
+        try:
+            await asyncio.to_thread(ad_system.sync_from_db)
+        except Exception as e:
+            print(f"❌ 增量同步失败: {e}")
+
+
+async def retrain_loop(interval: float):
+    """定时检查是否达到重新训练条件（定时或新增交互条数），训练本身在独立进程中进行"""
+    while True:
+        await asyncio.sleep(interval)
+        try:
+            reason = background_trainer.due()
+            if reason is not None:
+                background_trainer.trigger(reason)
+        except Exception as e:
+            print(f"❌ 触发后台重新训练失败: {e}")
 
 
 @asynccontextmanager
 async def lifespan(app: FastAPI):
     """应用生命周期管理"""
-    global ad_system
+    global ad_system, interaction_writer, scoring_executor, async_repository, background_trainer
+    logging.basicConfig(level=Config.LOG_LEVEL, format="%(asctime)s %(levelname)s %(name)s: %(message)s")
     try:
         print("🚀 启动个性化广告推荐API服务器...")
 
@@ -35,30 +110,20 @@ async def lifespan(app: FastAPI):
             print(f"❌ 数据库初始化失败: {e}")
             # 继续尝试，可能数据库已存在
 
-        # 创建数据库会话
-        try:
-            db = SessionLocal()
-            print("✅ 数据库连接成功")
-        except Exception as e:
-            print(f"❌ 数据库连接失败: {e}")
-            raise
-
-        # 创建推荐系统实例
+        # 创建推荐系统实例（不再持有全局会话，每个工作单元从连接池取独立的会话）
         try:
-            ad_system = PersonalizedAdRecommendation(db)
+            ad_system = PersonalizedAdRecommendation(session_factory=SessionLocal)
             print("✅ 推荐系统实例创建成功")
         except Exception as e:
             print(f"❌ 推荐系统创建失败: {e}")
-            db.close()
             raise
 
-        # 初始化系统
+        # 初始化系统（没有可加载的模型产物时，按配置在后台训练，不阻塞服务启动）
         try:
-            ad_system.initialize()
+            ad_system.initialize(train=not Config.BACKGROUND_INITIAL_TRAINING)
             print("✅ 系统初始化成功")
         except Exception as e:
             print(f"❌ 系统初始化失败: {e}")
-            db.close()
             raise
 
         print("📊 系统信息:")
@@ -73,12 +138,70 @@ async def lifespan(app: FastAPI):
         # 不要重新抛出异常，让服务器继续运行
         ad_system = None
 
+    if ad_system is not None and Config.INTERACTION_WRITE_BEHIND:
+        interaction_writer = InteractionWriter(
+            SessionLocal,
+            batch_size=Config.INTERACTION_WRITER_BATCH_SIZE,
+            flush_interval=Config.INTERACTION_WRITER_FLUSH_INTERVAL,
+            max_queue_size=Config.INTERACTION_WRITER_QUEUE_SIZE,
+            dead_letter_path=Config.INTERACTION_WRITER_DEAD_LETTER_PATH or None
+        )
+        interaction_writer.start()
+        ad_system.data_processor.interaction_writer = interaction_writer
+        print(f"✅ 交互记录异步批量写入已启动（每批 {Config.INTERACTION_WRITER_BATCH_SIZE} 条）")
+
+    if Config.SCORING_EXECUTOR_WORKERS > 0:
+        scoring_executor = ThreadPoolExecutor(max_workers=Config.SCORING_EXECUTOR_WORKERS,
+                                              thread_name_prefix="scoring")
+    if AsyncSessionLocal is not None:
+        async_repository = AsyncRepository(AsyncSessionLocal)
+
+    sync_task = None
+    if ad_system is not None and Config.DELTA_SYNC_INTERVAL > 0:
+        sync_task = asyncio.create_task(delta_sync_loop(Config.DELTA_SYNC_INTERVAL))
+        print(f"🔄 增量同步已启动，间隔 {Config.DELTA_SYNC_INTERVAL} 秒")
+
+    retrain_task = None
+    # 后台训练进程从数据库加载数据；使用示例数据时（数据库不可用）模型已在初始化时直接训练
+    if ad_system is not None and ad_system.data_processor.serves_database_data:
+        try:
+            background_trainer = BackgroundTrainer(ad_system, retrain_interval=Config.RETRAIN_INTERVAL,
+                                                   retrain_after_interactions=Config.RETRAIN_AFTER_INTERACTIONS)
+            if not ad_system.recommendation_model.is_trained:
+                background_trainer.trigger("startup")
+        except Exception as e:
+            print(f"❌ 后台重新训练启动失败: {e}")
+            background_trainer = None
+        if background_trainer is not None and (Config.RETRAIN_INTERVAL > 0 or Config.RETRAIN_AFTER_INTERACTIONS > 0):
+            retrain_task = asyncio.create_task(retrain_loop(Config.RETRAIN_CHECK_INTERVAL))
+            print(f"🏋️ 后台重新训练已启用（间隔 {Config.RETRAIN_INTERVAL} 秒 / "
+                  f"每 {Config.RETRAIN_AFTER_INTERACTIONS} 条新交互）")
+
     yield
 
     # Shutdown
-    if ad_system and ad_system.db_session:
-        ad_system.db_session.close()
-        print("✅ 数据库连接已关闭")
+    if sync_task is not None:
+        sync_task.cancel()
+    if retrain_task is not None:
+        retrain_task.cancel()
+    if background_trainer is not None:
+        background_trainer.stop()
+        background_trainer = None
+    if interaction_writer is not None:
+        ad_system.data_processor.interaction_writer = None
+        interaction_writer.stop()
+        stats = interaction_writer.stats()
+        print(f"✅ 交互写入队列已清空: 共写入 {stats['written']} 条, 失败 {stats['failed']} 条"
+              f"（死信 {stats['dead_lettered']} 条, 丢弃 {stats['dropped']} 条）")
+    if scoring_executor is not None:
+        scoring_executor.shutdown(wait=True)
+        scoring_executor = None
+    if ad_system is not None:
+        ad_system.close()
+    async_repository = None
+    await dispose_async_engine()
+    engine.dispose()
+    print("✅ 数据库连接池已关闭")
 
 
 app = FastAPI(
@@ -102,6 +225,29 @@ app.add_middleware(
     allow_headers=["*"],  # 允许所有头部
 )
 
+
+@app.middleware("http")
+async def record_request_metrics(request: Request, call_next):
+    """按接口（路由模板，如 /recommend/{user_id}）统计请求数、错误数和处理耗时"""
+    if not Config.METRICS_ENABLED:
+        return await call_next(request)
+
+    start = time.perf_counter()
+    status = 500
+    try:
+        response = await call_next(request)
+        status = response.status_code
+        return response
+    finally:
+        route = request.scope.get("route")
+        endpoint = getattr(route, "path", "unmatched")
+        method = request.method
+        metrics.HTTP_REQUESTS.inc(method=method, endpoint=endpoint, status=status)
+        metrics.HTTP_REQUEST_SECONDS.observe(time.perf_counter() - start, method=method, endpoint=endpoint)
+        if status >= 400:
+            metrics.HTTP_ERRORS.inc(method=method, endpoint=endpoint, status=status)
+
+
 @app.get("/")
 async def root():
     """根路径"""
@@ -115,35 +261,213 @@ async def root():
 
 @app.get("/health")
 async def health_check():
-    """健康检查"""
-    status = "healthy" if ad_system is not None else "degraded"
+    """健康检查：推荐系统未初始化时为 degraded；后台训练首个模型期间（点击概率暂按 0.5 计）为 training"""
+    trained = ad_system is not None and ad_system.recommendation_model.is_trained
+    if ad_system is None:
+        status, message = "degraded", "系统初始化中"
+    elif not trained:
+        status, message = "training", "模型训练中，暂以默认点击概率提供推荐"
+    else:
+        status, message = "healthy", "系统运行中"
     return {
         "status": status,
         "database": "connected",
-        "model_loaded": ad_system is not None,
-        "message": "系统运行中" if ad_system else "系统初始化中"
+        "model_loaded": trained,
+        "model": {
+            "trained": ad_system.recommendation_model.is_trained,
+            "click_model": ad_system.recommendation_model.model_type,
+            "model_version": ad_system.model_version,
+            "artifact_version": ad_system.artifact_version,
+            "last_trained_at": ad_system.last_trained_at,
+            "retraining": background_trainer is not None and background_trainer.running
+        } if ad_system is not None else None,
+        "message": message
     }
 
 
-@app.get("/recommend/{user_id}")
-async def recommend_ads(user_id: str, top_k: int = 5):
-    """为用户推荐广告"""
+@app.post("/retrain", status_code=202)
+async def trigger_retrain():
+    """在后台独立进程中重新训练模型，完成后热替换；训练期间继续使用当前模型提供服务"""
+    if background_trainer is None:
+        raise HTTPException(status_code=503, detail="后台重新训练不可用（推荐系统未初始化或数据库不可用）")
+
+    if not background_trainer.trigger("api"):
+        raise HTTPException(status_code=409, detail="已有重新训练任务在进行中")
+    return {"status": "accepted", "retrain": background_trainer.stats()}
+
+
+@app.get("/stats/retrain")
+async def retrain_stats():
+    """后台重新训练状态：当前阶段、触发原因、训练耗时、最近一次换入的版本、距上次训练新增的交互数"""
+    if background_trainer is None:
+        raise HTTPException(status_code=503, detail="后台重新训练不可用（推荐系统未初始化或数据库不可用）")
+
+    return {
+        "status": "success",
+        "model_version": ad_system.model_version,
+        "artifact_version": ad_system.artifact_version,
+        "last_trained_at": ad_system.last_trained_at,
+        "retrain": background_trainer.stats()
+    }
+
+
+@app.get("/stats/cache")
+async def cache_stats():
+    """缓存统计：推荐结果缓存与用户特征缓存的命中率、淘汰数等"""
+    if ad_system is None:
+        raise HTTPException(status_code=503, detail="推荐系统未初始化")
+
+    return {
+        "status": "success",
+        "model_version": ad_system.model_version,
+        "result_cache": ad_system.result_cache.stats(),
+        "user_feature_cache": ad_system.data_processor.user_feature_cache.stats()
+    }
+
+
+@app.get("/stats/interaction-writer")
+async def interaction_writer_stats():
+    """交互记录异步写入统计：队列深度、批大小、刷盘耗时、拒绝、失败、死信与丢弃条数"""
+    if interaction_writer is None:
+        return {"status": "success", "enabled": False}
+
+    return {"status": "success", "enabled": True, "writer": interaction_writer.stats()}
+
+
+@app.get("/metrics")
+async def prometheus_metrics():
+    """Prometheus 文本格式的指标：各阶段耗时直方图、各接口请求数/错误数/延迟、交互写入队列（含死信/丢弃条数）与连接池状态"""
+    lines = [metrics.registry.render()]
+    gauges = {"ad_db_pool_checked_out": pool_metrics.snapshot()["checked_out"]}
+    if ad_system is not None:
+        gauges["ad_model_version"] = ad_system.model_version
+    if interaction_writer is not None:
+        writer_stats = interaction_writer.stats()
+        gauges["ad_interaction_writer_queue_depth"] = writer_stats["queue_depth"]
+        gauges["ad_interaction_writer_dead_lettered"] = writer_stats["dead_lettered"]
+        gauges["ad_interaction_writer_dropped"] = writer_stats["dropped"]
+    for name, value in gauges.items():
+        lines.append(f"# TYPE {name} gauge\n{name} {value}\n")
+    return Response("".join(lines), media_type=metrics.CONTENT_TYPE)
+
+
+@app.get("/stats/db-pool")
+async def db_pool_stats():
+    """数据库连接池状态：池大小、已借出/空闲连接数、溢出连接数、利用率和借出峰值"""
+    return {
+        "status": "success",
+        "sync": pool_metrics.snapshot(),
+        "async": async_pool_metrics.snapshot() if async_pool_metrics is not None else None
+    }
+
+
+@app.get("/stats/sync")
+async def sync_stats():
+    """增量同步状态：各表的高水位、最近一次同步的变更条数，以及累计因行为未知跳过的交互记录数"""
+    if ad_system is None:
+        raise HTTPException(status_code=503, detail="推荐系统未初始化")
+
+    watermarks = ad_system.data_processor.watermarks
+    return {
+        "status": "success",
+        "interval": Config.DELTA_SYNC_INTERVAL,
+        "watermarks": {
+            "users": watermarks["users"].isoformat() if watermarks["users"] else None,
+            "ads": watermarks["ads"].isoformat() if watermarks["ads"] else None,
+            "interactions": watermarks["interactions"]
+        },
+        "last_sync": ad_system.last_sync,
+        "unknown_action_interactions": ad_system.data_processor.unknown_action_interactions
+    }
+
+
+@app.post("/sync")
+async def trigger_sync():
+    """立即执行一次增量同步"""
+    if ad_system is None:
+        raise HTTPException(status_code=503, detail="推荐系统未初始化")
+
+    try:
+        return {"status": "success", "sync": await asyncio.to_thread(ad_system.sync_from_db)}
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"增量同步失败: {str(e)}")
+
+
+@app.get("/stats/retrieval")
+async def retrieval_stats(top_k: int = 10, sample_size: int = 100):
+    """候选召回质量：抽样用户上召回结果相对全量扫描的 recall@k"""
     if ad_system is None:
         raise HTTPException(status_code=503, detail="推荐系统未初始化")
 
     try:
-        recommendations = ad_system.get_recommendations(user_id, top_k)
         return {
             "status": "success",
-            "user_id": user_id,
-            "top_k": top_k,
-            "recommendations": recommendations,
-            "count": len(recommendations)
+            "retrieval": await run_scoring(
+                functools.partial(ad_system.evaluate_retrieval_recall, top_k=top_k, sample_size=sample_size))
         }
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"召回评估失败: {str(e)}")
+
+
+@app.get("/recommend/{user_id}")
+async def recommend_ads(user_id: str, request: Request, top_k: int = 5, debug: Optional[str] = None):
+    """为用户推荐广告
+
+    ?debug=timing（或请求头 X-Debug-Timing: 1）时响应中附带 timing：各阶段耗时、打分的候选数和缓存命中情况。
+    """
+    if ad_system is None:
+        raise HTTPException(status_code=503, detail="推荐系统未初始化")
+
+    try:
+        with tracing.start_trace() if timing_requested(request, debug) else nullcontext() as trace:
+            with tracing.span("scoring"):
+                recommendations = await run_scoring(ad_system.get_recommendations, user_id, top_k)
+            response = {
+                "status": "success",
+                "user_id": user_id,
+                "top_k": top_k,
+                "recommendations": recommendations,
+                "count": len(recommendations)
+            }
+            return with_timing(response, trace) if trace is not None else response
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"推荐失败: {str(e)}")
 
 
+class BatchRecommendRequest(BaseModel):
+    """批量推荐请求"""
+    user_ids: List[str]
+    top_k: int = 5
+
+
+@app.post("/recommend/batch")
+async def recommend_ads_batch(request: BatchRecommendRequest, http_request: Request, debug: Optional[str] = None):
+    """为多个用户批量推荐广告（一次请求内统一打分），支持与单用户推荐相同的 debug=timing"""
+    if ad_system is None:
+        raise HTTPException(status_code=503, detail="推荐系统未初始化")
+
+    try:
+        with tracing.start_trace() if timing_requested(http_request, debug) else nullcontext() as trace:
+            with tracing.span("scoring"):
+                results = await run_scoring(ad_system.get_batch_recommendations, request.user_ids, request.top_k)
+            response = {
+                "status": "success",
+                "top_k": request.top_k,
+                "results": [
+                    {
+                        "user_id": user_id,
+                        "recommendations": recommendations,
+                        "count": len(recommendations)
+                    }
+                    for user_id, recommendations in results.items()
+                ],
+                "count": len(results)
+            }
+            return with_timing(response, trace) if trace is not None else response
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"批量推荐失败: {str(e)}")
+
+
 @app.post("/interaction/{user_id}/{ad_id}/{action}")
 async def record_interaction(user_id: str, ad_id: str, action: str):
     """记录用户与广告的交互行为"""
@@ -151,11 +475,19 @@ async def record_interaction(user_id: str, ad_id: str, action: str):
         raise HTTPException(status_code=503, detail="推荐系统未初始化")
 
     try:
-        valid_actions = ["click", "view", "purchase", "ignore"]
+        valid_actions = Config.INTERACTION_ACTIONS
         if action not in valid_actions:
             raise HTTPException(status_code=400, detail=f"无效的action参数，可选值: {valid_actions}")
 
-        ad_system.record_user_interaction(user_id, ad_id, action)
+        # 内存状态的更新需要获取交互日志的锁（增量同步批量追加时会持有），放到线程中执行，不阻塞事件循环
+        if interaction_writer is None and async_repository is not None:
+            # 未启用异步批量写入时，通过异步数据访问层提交
+            timestamp = await async_repository.add_interaction(
+                user_id, ad_id, action, context={"writer": ad_system.data_processor.writer_id})
+            await asyncio.to_thread(ad_system.apply_persisted_interaction, user_id, ad_id, action, timestamp)
+        else:
+            # 启用异步批量写入时只入队（队列满时抛出 queue.Full），否则同步写入数据库
+            await asyncio.to_thread(ad_system.record_user_interaction, user_id, ad_id, action)
         return {
             "status": "success",
             "message": "交互记录成功",
@@ -165,6 +497,10 @@ async def record_interaction(user_id: str, ad_id: str, action: str):
                 "action": action
             }
         }
+    except HTTPException:
+        raise
+    except queue.Full:
+        raise HTTPException(status_code=503, detail="交互写入队列已满，请稍后重试", headers={"Retry-After": "1"})
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"记录交互失败: {str(e)}")
 
@@ -217,10 +553,13 @@ async def get_user_profile(user_id: str):
         raise HTTPException(status_code=503, detail="推荐系统未初始化")
 
     try:
-        if user_id not in ad_system.data_processor.user_profiles:
+        profile = ad_system.data_processor.user_profiles.get(user_id)
+        if profile is None and async_repository is not None:
+            # 内存中还没有（尚未增量同步到）的用户直接查数据库
+            profile = await async_repository.get_user_profile(user_id)
+        if profile is None:
             raise HTTPException(status_code=404, detail="用户不存在")
 
-        profile = ad_system.data_processor.user_profiles[user_id]
         return {
             "status": "success",
             "user_id": user_id,
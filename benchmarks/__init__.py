@@ -0,0 +1 @@
+"""性能基准测试（在项目根目录下以 python -m benchmarks.<name> 运行）"""
@@ -0,0 +1,153 @@
+"""API 并发基准：打分和数据库写入直接在事件循环中执行 vs 打分线程池 + 异步数据访问层
+
+API 由 uvicorn 在独立线程中监听本机端口，客户端通过 httpx 并发发送三类请求：
+推荐请求、交互写入请求（写入临时 SQLite 文件，逐条提交），以及每 5ms 一次的 /health 探测。
+服务端事件循环被阻塞时 /health 的延迟会明显升高。
+
+运行: python -m benchmarks.bench_api_concurrency --ads 20000 --duration 10
+"""
+
+import argparse
+import asyncio
+import os
+import random
+import socket
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+import httpx
+import numpy as np
+import uvicorn
+from sqlalchemy import create_engine
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
+from sqlalchemy.orm import sessionmaker
+import api_server
+from config import Config
+from database.models import Base
+from database.async_database import AsyncRepository
+from conftest import build_system
+from benchmarks.synthetic import quiet
+
+
+def start_server():
+    """在独立线程中启动 uvicorn（不执行 lifespan，推荐系统实例由基准测试直接注入）"""
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        port = sock.getsockname()[1]
+    server = uvicorn.Server(uvicorn.Config(api_server.app, host="127.0.0.1", port=port,
+                                           lifespan="off", log_level="warning"))
+    thread = threading.Thread(target=server.run, daemon=True)
+    thread.start()
+    while not server.started:
+        time.sleep(0.05)
+    return server, thread, f"http://127.0.0.1:{port}"
+
+
+def percentile(latencies, q) -> float:
+    return float(np.percentile(latencies, q) * 1000) if latencies else 0.0
+
+
+async def client_loop(client, make_request, latencies, deadline):
+    while time.perf_counter() < deadline:
+        start = time.perf_counter()
+        response = await make_request(client)
+        response.raise_for_status()
+        latencies.append(time.perf_counter() - start)
+
+
+async def probe_loop(client, latencies, deadline, interval=0.005):
+    while time.perf_counter() < deadline:
+        start = time.perf_counter()
+        (await client.get("/health")).raise_for_status()
+        latencies.append(time.perf_counter() - start)
+        await asyncio.sleep(interval)
+
+
+async def run_mode(mode: str, system, db_path: str, args) -> dict:
+    sync_engine = create_engine(f"sqlite:///{db_path}", connect_args={"check_same_thread": False})
+    Base.metadata.create_all(sync_engine)
+    async_engine = create_async_engine(f"sqlite+aiosqlite:///{db_path}")
+
+    system.data_processor.db_session = sessionmaker(bind=sync_engine)()
+    api_server.ad_system = system
+    api_server.interaction_writer = None
+    if mode == "blocking":
+        api_server.scoring_executor = None
+        api_server.async_repository = None
+    else:
+        api_server.scoring_executor = ThreadPoolExecutor(max_workers=args.workers)
+        api_server.async_repository = AsyncRepository(async_sessionmaker(async_engine, expire_on_commit=False))
+
+    users = list(system.data_processor.user_profiles)
+    ads = list(system.data_processor.ad_inventory)
+    rng = random.Random(0)
+
+    def recommend(client):
+        return client.get(f"/recommend/{rng.choice(users)}", params={"top_k": 10})
+
+    def interact(client):
+        return client.post(f"/interaction/{rng.choice(users)}/{rng.choice(ads)}/click")
+
+    recommend_latencies, interaction_latencies, probe_latencies = [], [], []
+    server, thread, base_url = start_server()
+    limits = httpx.Limits(max_connections=args.recommend_clients + args.interaction_clients + 1)
+    async with httpx.AsyncClient(base_url=base_url, limits=limits, timeout=60) as client:
+        deadline = time.perf_counter() + args.duration
+        with quiet():
+            await asyncio.gather(
+                *[client_loop(client, recommend, recommend_latencies, deadline) for _ in range(args.recommend_clients)],
+                *[client_loop(client, interact, interaction_latencies, deadline)
+                  for _ in range(args.interaction_clients)],
+                probe_loop(client, probe_latencies, deadline)
+            )
+    server.should_exit = True
+    thread.join()
+
+    if api_server.scoring_executor is not None:
+        api_server.scoring_executor.shutdown(wait=True)
+    system.data_processor.db_session.close()
+    await async_engine.dispose()
+    sync_engine.dispose()
+    return {
+        "mode": mode,
+        "recommend_rps": len(recommend_latencies) / args.duration,
+        "recommend_p50": percentile(recommend_latencies, 50),
+        "recommend_p99": percentile(recommend_latencies, 99),
+        "interaction_rps": len(interaction_latencies) / args.duration,
+        "interaction_p99": percentile(interaction_latencies, 99),
+        "health_p50": percentile(probe_latencies, 50),
+        "health_p99": percentile(probe_latencies, 99),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--ads", type=int, default=20000)
+    parser.add_argument("--users", type=int, default=500)
+    parser.add_argument("--duration", type=float, default=10.0)
+    parser.add_argument("--recommend-clients", type=int, default=8)
+    parser.add_argument("--interaction-clients", type=int, default=4)
+    parser.add_argument("--workers", type=int, default=Config.SCORING_EXECUTOR_WORKERS or 4)
+    args = parser.parse_args()
+
+    # 关闭结果缓存，测量的是每次真实打分的开销
+    Config.RESULT_CACHE_ENABLED = False
+    system = build_system(args.ads, n_users=args.users)
+
+    results = []
+    with tempfile.TemporaryDirectory() as tmp:
+        for mode in ("blocking", "async"):
+            results.append(asyncio.run(run_mode(mode, system, os.path.join(tmp, f"{mode}.db"), args)))
+
+    print(f"广告数 {args.ads}, 推荐客户端 {args.recommend_clients}, 交互客户端 {args.interaction_clients}, "
+          f"打分线程 {args.workers}, CPU {os.cpu_count()}")
+    print(f"{'模式':>9} {'推荐 req/s':>10} {'推荐 p50':>9} {'推荐 p99':>9} {'交互 req/s':>10} {'交互 p99':>9} "
+          f"{'health p50':>10} {'health p99':>10}  (延迟单位 ms)")
+    for r in results:
+        print(f"{r['mode']:>9} {r['recommend_rps']:>10.1f} {r['recommend_p50']:>9.1f} {r['recommend_p99']:>9.1f} "
+              f"{r['interaction_rps']:>10.1f} {r['interaction_p99']:>9.1f} {r['health_p50']:>10.1f} {r['health_p99']:>10.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,31 @@
+"""逐个广告打分 vs 批量打分的基准测试
+
+运行: python -m benchmarks.bench_batch_scoring
+"""
+
+import argparse
+from benchmarks.synthetic import quiet, time_call
+from conftest import build_system, check_equivalent
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--sizes", type=int, nargs="+", default=[100, 500, 1000, 2000])
+    parser.add_argument("--top-k", type=int, default=10)
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    print(f"{'广告数':>8} {'逐个(ms)':>12} {'批量(ms)':>12} {'加速比':>8}")
+    for n_ads in args.sizes:
+        system = build_system(n_ads)
+        user_id = next(iter(system.data_processor.user_profiles))
+        check_equivalent(system, user_id, args.top_k)
+
+        with quiet():
+            per_ad = time_call(lambda: system._score_ads_per_ad(user_id, args.top_k), args.repeat)
+            batch = time_call(lambda: system._score_ads_batch(user_id, args.top_k), args.repeat)
+        print(f"{n_ads:>8} {per_ad * 1000:>12.2f} {batch * 1000:>12.2f} {per_ad / batch:>7.1f}x")
+
+
+if __name__ == "__main__":
+    main()
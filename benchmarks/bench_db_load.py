@@ -0,0 +1,115 @@
+"""启动加载：旧版 .query().all() 全量物化 vs 流式分块加载 的峰值内存（RSS）与耗时
+
+每种加载方式在独立子进程中运行，峰值 RSS 取 resource.getrusage 的 ru_maxrss，
+减去导入模块后的基线，只统计加载过程本身。
+
+运行: python -m benchmarks.bench_db_load --users 20000 --ads 20000 --interactions 1000000
+"""
+
+import argparse
+import json
+import os
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+from database.models import User, Advertisement, UserInteraction
+from benchmarks.synthetic import populate_sqlite, quiet
+
+
+def legacy_load(processor):
+    """优化前的加载方式：全量物化 ORM 对象后逐条复制"""
+    session = processor.db_session
+    for user in session.query(User).all():
+        processor.user_profiles[user.user_id] = {
+            "age": user.age,
+            "gender": user.gender,
+            "interests": user.interests or [],
+            "location": user.location,
+            "device": user.device
+        }
+    for ad in session.query(Advertisement).filter(Advertisement.is_active == True).all():
+        processor.ad_inventory[ad.ad_id] = {
+            "title": ad.title,
+            "category": ad.category,
+            "keywords": ad.keywords or [],
+            "target_age": [ad.target_age_min, ad.target_age_max],
+            "target_gender": ad.target_gender,
+            "bid_price": ad.bid_price
+        }
+    for interaction in session.query(UserInteraction).all():
+        processor.interaction_history.append(
+            interaction.user_id, interaction.ad_id, interaction.action, interaction.timestamp)
+    processor.rebuild_ad_feature_store()
+
+
+def worker(path: str, mode: str, chunk_size: int):
+    """子进程入口：加载一次并输出 JSON 结果"""
+    from data_processor import DataProcessor
+
+    session = sessionmaker(bind=create_engine(f"sqlite:///{path}"))()
+    processor = DataProcessor(session)
+    baseline = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    start = time.perf_counter()
+    with quiet():
+        if mode == "legacy":
+            legacy_load(processor)
+        else:
+            processor.load_data_from_db(chunk_size=chunk_size)
+    elapsed = time.perf_counter() - start
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    print(json.dumps({
+        "mode": mode,
+        "seconds": elapsed,
+        "peak_rss_mb": (peak - baseline) / 1024,  # Linux 上 ru_maxrss 单位为 KB
+        "users": len(processor.user_profiles),
+        "ads": len(processor.ad_inventory),
+        "interactions": len(processor.interaction_history)
+    }))
+
+
+def run_worker(path: str, mode: str, chunk_size: int) -> dict:
+    output = subprocess.run(
+        [sys.executable, "-m", "benchmarks.bench_db_load", "--worker", mode, "--db", path,
+         "--chunk-size", str(chunk_size)],
+        check=True, capture_output=True, text=True).stdout
+    return json.loads(output.strip().splitlines()[-1])
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--users", type=int, default=20000)
+    parser.add_argument("--ads", type=int, default=20000)
+    parser.add_argument("--interactions", type=int, default=500000)
+    parser.add_argument("--chunk-size", type=int, default=10000)
+    parser.add_argument("--db", help="已有的数据库文件（不指定则生成临时数据库）")
+    parser.add_argument("--worker", choices=["legacy", "streaming"], help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.worker:
+        worker(args.db, args.worker, args.chunk_size)
+        return
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = args.db
+        if path is None:
+            path = os.path.join(tmp, "bench.db")
+            start = time.perf_counter()
+            populate_sqlite(path, args.users, args.ads, args.interactions)
+            print(f"生成数据库: {args.users} 用户, {args.ads} 广告, {args.interactions} 交互, "
+                  f"耗时 {time.perf_counter() - start:.1f} 秒")
+
+        results = [run_worker(path, mode, args.chunk_size) for mode in ("legacy", "streaming")]
+        assert results[0]["interactions"] == results[1]["interactions"]
+
+        print(f"{'加载方式':>10} {'耗时(秒)':>9} {'峰值RSS增量(MB)':>16} {'交互行/秒':>10}")
+        for result in results:
+            print(f"{result['mode']:>10} {result['seconds']:>9.2f} {result['peak_rss_mb']:>16.1f} "
+                  f"{result['interactions'] / result['seconds']:>10.0f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,79 @@
+"""嵌入模型内存占用：原实现 dict[id -> float64 ndarray] vs EmbeddingStore 连续矩阵 + 共享存储的向量索引
+
+新实现与 UserEmbeddingModel 一致：用户向量、广告向量各一个 EmbeddingStore，广告向量索引直接引用广告存储
+（只额外保存每行范数），逐条写入后调用 shrink_to_fit()（训练/回放结束时的状态）。
+
+运行: python -m benchmarks.bench_embedding_memory --users 1000000 --ads 100000
+"""
+
+import argparse
+import gc
+import time
+import tracemalloc
+import numpy as np
+from models.embedding_store import EmbeddingStore
+from models.vector_index import BruteForceIndex
+
+# (用户向量精度, 广告向量精度)，第一项为默认配置（USER_EMBEDDING_DTYPE / EMBEDDING_DTYPE）
+CONFIGS = [("float16", "float32"), ("float32", "float32"), ("float16", "float16")]
+
+
+def measure(build):
+    """返回 (构建结果占用的内存字节数, 构建耗时秒)"""
+    gc.collect()
+    tracemalloc.start()
+    start = time.perf_counter()
+    container = build()
+    elapsed = time.perf_counter() - start
+    current, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    del container
+    return current, elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--users", type=int, nargs="+", default=[500000, 1000000])
+    parser.add_argument("--ads", type=int, default=50000)
+    parser.add_argument("--dim", type=int, default=128)
+    args = parser.parse_args()
+
+    ad_ids = [f"ad_{i}" for i in range(args.ads)]
+    print(f"{'用户数':>9} {'广告数':>8} {'精度(用户/广告)':>16} {'原实现(MB)':>11} {'新实现(MB)':>11} {'倍数':>7} "
+          f"{'字节/用户':>9} {'字节/广告':>9}")
+    for n_users in args.users:
+        # id 字符串在两种方式中都会存在（也被用户画像、广告库存等结构引用），预先创建不计入
+        user_ids = [f"user_{i}" for i in range(n_users)]
+        rng = np.random.default_rng(0)
+
+        def build_dicts():
+            users = {user_id: rng.normal(0, 0.1, args.dim) for user_id in user_ids}
+            ads = {ad_id: rng.normal(0, 0.1, args.dim) for ad_id in ad_ids}
+            return users, ads
+
+        def build_stores(user_dtype, ad_dtype):
+            users = EmbeddingStore(args.dim, dtype=user_dtype)
+            for user_id in user_ids:
+                users[user_id] = rng.normal(0, 0.1, args.dim)
+            ads = EmbeddingStore(args.dim, dtype=ad_dtype)
+            index = BruteForceIndex(args.dim, store=ads)
+            for ad_id in ad_ids:
+                index.add(ad_id, rng.normal(0, 0.1, args.dim))
+            users.shrink_to_fit()
+            ads.shrink_to_fit()
+            index.shrink_to_fit()
+            return users, ads, index
+
+        dict_bytes, _ = measure(build_dicts)
+        dict_user_bytes, _ = measure(lambda: {user_id: rng.normal(0, 0.1, args.dim) for user_id in user_ids})
+        for user_dtype, ad_dtype in CONFIGS:
+            store_bytes, _ = measure(lambda: build_stores(user_dtype, ad_dtype))
+            user_bytes, _ = measure(lambda: build_stores(user_dtype, ad_dtype)[0])
+            print(f"{n_users:>9} {args.ads:>8} {f'{user_dtype}/{ad_dtype}':>16} {dict_bytes / 2 ** 20:>11.1f} "
+                  f"{store_bytes / 2 ** 20:>11.1f} {dict_bytes / store_bytes:>6.2f}x "
+                  f"{user_bytes / n_users:>9.0f} {(store_bytes - user_bytes) / args.ads:>9.0f}")
+        print(f"{'':>9} {'':>8} {'原实现 字节/向量':>16} {dict_user_bytes / n_users:>11.0f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,76 @@
+"""交互历史：list[dict] vs 列式 InteractionLog 的内存占用与按广告计数 / 训练样本构建耗时
+
+运行: python -m benchmarks.bench_interaction_log --sizes 100000 1000000
+"""
+
+import argparse
+import gc
+import tracemalloc
+import numpy as np
+from config import Config
+from data.interaction_log import InteractionLog
+from benchmarks.synthetic import generate_interactions, time_call
+
+
+def measure(build):
+    """返回 (构建结果, 构建过程新增的内存字节数)"""
+    gc.collect()
+    tracemalloc.start()
+    container = build()
+    current, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return container, current
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--sizes", type=int, nargs="+", default=[100000, 1000000])
+    parser.add_argument("--users", type=int, default=10000)
+    parser.add_argument("--ads", type=int, default=20000)
+    args = parser.parse_args()
+
+    user_ids = [f"user_{i}" for i in range(args.users)]
+    ad_ids = [f"ad_{i}" for i in range(args.ads)]
+    user_features = np.random.default_rng(0).random((args.users, 8))
+    user_feature_map = dict(zip(user_ids, user_features))
+
+    print(f"{'交互数':>9} {'list(MB)':>9} {'log(MB)':>8} {'内存倍数':>8} "
+          f"{'计数 list(ms)':>13} {'计数 log(ms)':>12} {'样本 list(ms)':>13} {'样本 log(ms)':>12}")
+    for n in args.sizes:
+        rows = generate_interactions(user_ids, ad_ids, n)
+        # 两种结构都引用同一批 id 字符串，只统计容器本身
+        history, list_bytes = measure(lambda: [dict(row) for row in rows])
+        log, log_bytes = measure(lambda: _build_log(rows))
+        del rows
+
+        def count_list():
+            counts = {}
+            for interaction in history:
+                counts[interaction["ad_id"]] = counts.get(interaction["ad_id"], 0) + 1
+            return counts
+
+        def samples_list():
+            X = np.array([user_feature_map[interaction["user_id"]] for interaction in history])
+            y = np.array([1 if interaction["action"] == "click" else 0 for interaction in history])
+            return X, y
+
+        def samples_log():
+            user_codes, _, action_codes, _ = log.columns()
+            matrix = np.array([user_feature_map[user_id] for user_id in log.users.values])
+            return matrix[user_codes], action_codes == log.actions.codes["click"]
+
+        assert count_list() == dict(zip(log.ads.values, log.count_by_ad().tolist()))
+        print(f"{n:>9} {list_bytes / 2 ** 20:>9.1f} {log_bytes / 2 ** 20:>8.1f} {list_bytes / log_bytes:>7.1f}x "
+              f"{time_call(count_list, 3) * 1000:>13.1f} {time_call(log.count_by_ad, 3) * 1000:>12.1f} "
+              f"{time_call(samples_list, 3) * 1000:>13.1f} {time_call(samples_log, 3) * 1000:>12.1f}")
+        del history, log
+
+
+def _build_log(rows):
+    log = InteractionLog(Config.INTERACTION_ACTIONS)
+    log.extend(rows)
+    return log
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,82 @@
+"""交互记录写入吞吐：逐条 add + commit vs InteractionWriter 异步批量写入
+
+两种方式写入同样数量的记录到临时 SQLite 文件，统计请求线程的吞吐（每秒可接收的交互数）
+以及全部记录落盘所需的总时间。
+
+运行: python -m benchmarks.bench_interaction_writes --events 5000 --batch-size 500
+"""
+
+import argparse
+import os
+import tempfile
+import time
+from datetime import datetime
+from sqlalchemy import create_engine, func, select
+from sqlalchemy.orm import sessionmaker
+from database.models import Base, UserInteraction
+from database.interaction_writer import InteractionWriter
+
+
+def make_session_factory(path: str):
+    engine = create_engine(f"sqlite:///{path}", connect_args={"check_same_thread": False})
+    Base.metadata.create_all(engine)
+    return sessionmaker(bind=engine)
+
+
+def count_rows(session_factory) -> int:
+    with session_factory() as session:
+        return session.execute(select(func.count(UserInteraction.id))).scalar()
+
+
+def per_row_commit(session_factory, n_events: int):
+    """优化前的方式：每条交互一次 add + commit"""
+    session = session_factory()
+    start = time.perf_counter()
+    for i in range(n_events):
+        session.add(UserInteraction(user_id=f"user_{i % 1000}", ad_id=f"ad_{i % 5000}", action="click",
+                                    timestamp=datetime.now()))
+        session.commit()
+    elapsed = time.perf_counter() - start
+    session.close()
+    return elapsed, elapsed
+
+
+def write_behind(session_factory, n_events: int, batch_size: int, flush_interval: float):
+    writer = InteractionWriter(session_factory, batch_size=batch_size, flush_interval=flush_interval,
+                               max_queue_size=n_events + 1)
+    writer.start()
+    start = time.perf_counter()
+    for i in range(n_events):
+        writer.submit({"user_id": f"user_{i % 1000}", "ad_id": f"ad_{i % 5000}", "action": "click",
+                       "timestamp": datetime.now()})
+    accepted = time.perf_counter() - start
+    writer.stop()
+    durable = time.perf_counter() - start
+    return accepted, durable, writer.stats()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--events", type=int, default=5000)
+    parser.add_argument("--batch-size", type=int, default=500)
+    parser.add_argument("--flush-interval", type=float, default=0.2)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        factory = make_session_factory(os.path.join(tmp, "per_row.db"))
+        per_row_accepted, per_row_durable = per_row_commit(factory, args.events)
+        assert count_rows(factory) == args.events
+
+        factory = make_session_factory(os.path.join(tmp, "write_behind.db"))
+        accepted, durable, stats = write_behind(factory, args.events, args.batch_size, args.flush_interval)
+        assert count_rows(factory) == args.events
+
+    print(f"{'写入方式':>12} {'接收吞吐(条/秒)':>15} {'全部落盘(秒)':>12} {'批次数':>6} {'平均批大小':>10} {'平均刷盘(ms)':>12}")
+    print(f"{'逐条提交':>12} {args.events / per_row_accepted:>15.0f} {per_row_durable:>12.2f} "
+          f"{args.events:>6} {1:>10.1f} {1000 * per_row_durable / args.events:>12.2f}")
+    print(f"{'异步批量':>12} {args.events / accepted:>15.0f} {durable:>12.2f} "
+          f"{stats['batches']:>6} {stats['avg_batch_size']:>10.1f} {stats['avg_flush_ms']:>12.2f}")
+
+
+if __name__ == "__main__":
+    main()
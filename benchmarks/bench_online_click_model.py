@@ -0,0 +1,132 @@
+"""在线点击模型（SGD 逻辑回归，partial_fit 小批量增量更新）与随机森林的对比
+
+合成交互的点击标签由已知的 logistic 函数（线性项 + 用户×广告交互项）生成，按时间顺序切成三段：
+- 初始段（--initial）：两种模型都全量训练
+- 增量段：随机森林保持不变（等待下一次全量重训），在线模型每 --batch-size 条交互 partial_fit 一次
+- 保留段（--holdout）：离线 AUC 评估
+--drift 大于 0 时，初始段之后点击偏好发生变化（模拟新广告主题/季节变化），体现增量更新的作用。
+
+输出：全量训练与增量更新的耗时、单条/批量打分延迟、保留段 AUC。
+
+运行: python -m benchmarks.bench_online_click_model --users 2000 --ads 2000 --interactions 100000
+"""
+
+import argparse
+import time
+import numpy as np
+from sklearn.metrics import roc_auc_score
+from data_processor import DataProcessor
+from models import RecommendationModel
+from benchmarks.synthetic import generate_users, generate_ads, quiet, time_call
+
+
+def planted_logits(X: np.ndarray, drift: np.ndarray) -> np.ndarray:
+    """已知的点击 logit：列 0-7 为用户特征，8-15 为广告特征（含义见 DataProcessor）"""
+    user_age, user_male, user_interest = X[:, 0], X[:, 1], X[:, 4]
+    ad_price, ad_gender, ad_category = X[:, 8], X[:, 11], X[:, 12]
+    gender_match = np.where(user_male == 1.0, ad_gender - 0.5, 0.5 - ad_gender)
+    logits = (-1.0 + 4.0 * (ad_price - 0.275) + 3.0 * gender_match
+              + 4.0 * user_interest * (ad_category - 0.5) - 3.0 * np.abs(user_age - 0.4))
+    # 偏好变化：高价广告不再受欢迎，偏向低龄用户
+    return logits - drift * (8.0 * (ad_price - 0.275) + 3.0 * (user_age - 0.4))
+
+
+def build_processor(n_users: int, n_ads: int, n_interactions: int, initial: float, drift: float,
+                    seed: int) -> DataProcessor:
+    """内存中的用户、广告和按 planted_logits 生成点击标签的交互日志"""
+    rng = np.random.default_rng(seed)
+    with quiet():
+        processor = DataProcessor()
+        processor.user_profiles = generate_users(n_users, seed=seed)
+        processor.ad_inventory = generate_ads(n_ads, seed=seed + 1)
+    user_ids, ad_ids = list(processor.user_profiles), list(processor.ad_inventory)
+    user_idx = rng.integers(n_users, size=n_interactions)
+    ad_idx = rng.integers(n_ads, size=n_interactions)
+
+    user_matrix = np.array([processor.create_user_features(user_id) for user_id in user_ids])
+    ad_matrix = processor.ad_features.lookup(ad_ids)
+    X = np.hstack([user_matrix[user_idx], ad_matrix[ad_idx]])
+    shift = np.where(np.arange(n_interactions) < int(n_interactions * initial), 0.0, drift)
+    clicks = rng.random(n_interactions) < 1 / (1 + np.exp(-planted_logits(X, shift)))
+
+    base = np.datetime64("2024-01-01T00:00:00")
+    processor.interaction_history = [{
+        "user_id": user_ids[u],
+        "ad_id": ad_ids[a],
+        "action": "click" if clicked else "view",
+        "timestamp": str(base + np.timedelta64(i, "s"))
+    } for i, (u, a, clicked) in enumerate(zip(user_idx, ad_idx, clicks))]
+    return processor
+
+
+def fit_model(model_type: str, X: np.ndarray, y: np.ndarray):
+    model = RecommendationModel(model_type)
+    start = time.perf_counter()
+    model.model.fit(X, y)
+    model.is_trained = True
+    return model, time.perf_counter() - start
+
+
+def auc(model: RecommendationModel, X: np.ndarray, y: np.ndarray) -> float:
+    return roc_auc_score(y, model.model.predict_proba(X)[:, 1])
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--users", type=int, default=2000)
+    parser.add_argument("--ads", type=int, default=2000)
+    parser.add_argument("--interactions", type=int, default=100000)
+    parser.add_argument("--initial", type=float, default=0.5, help="初始全量训练段的比例")
+    parser.add_argument("--holdout", type=float, default=0.2, help="保留评估段的比例")
+    parser.add_argument("--batch-size", type=int, default=256, help="增量更新的小批量大小")
+    parser.add_argument("--drift", type=float, default=1.0, help="初始段之后点击偏好变化的幅度，0 表示不变")
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args()
+
+    processor = build_processor(args.users, args.ads, args.interactions, args.initial, args.drift, args.seed)
+    n_initial = int(args.interactions * args.initial)
+    n_train = int(args.interactions * (1 - args.holdout))
+    X, y = RecommendationModel.interaction_samples(processor)
+    X_initial, y_initial = X[:n_initial], y[:n_initial]
+    X_holdout, y_holdout = X[n_train:], y[n_train:]
+    print(f"交互 {args.interactions} 条（点击率 {y.mean():.1%}）：初始 {n_initial} / 增量 {n_train - n_initial} / "
+          f"保留 {args.interactions - n_train}，drift={args.drift}")
+
+    forest, forest_seconds = fit_model("random_forest", X_initial, y_initial)
+    forest_retrained, forest_retrain_seconds = fit_model("random_forest", X[:n_train], y[:n_train])
+    sgd_full, sgd_full_seconds = fit_model("sgd", X[:n_train], y[:n_train])
+    online, online_initial_seconds = fit_model("sgd", X_initial, y_initial)
+
+    # 增量段：按交互日志区间小批量更新（含构建该批样本特征的耗时）
+    batch_seconds = []
+    for start in range(n_initial, n_train, args.batch_size):
+        batch_start = time.perf_counter()
+        online.partial_fit(processor, start, min(start + args.batch_size, n_train))
+        batch_seconds.append(time.perf_counter() - batch_start)
+    batch_ms = np.array(batch_seconds) * 1000
+
+    print("\n训练/更新耗时:")
+    print(f"  随机森林全量训练 {n_initial} 条: {forest_seconds:.2f} 秒，{n_train} 条: {forest_retrain_seconds:.2f} 秒")
+    print(f"  SGD 全量训练 {n_initial} 条: {online_initial_seconds:.2f} 秒，{n_train} 条: {sgd_full_seconds:.2f} 秒")
+    print(f"  SGD 增量更新 {len(batch_ms)} 批 x {args.batch_size} 条: 每批 p50 {np.median(batch_ms):.2f} ms / "
+          f"p99 {np.percentile(batch_ms, 99):.2f} ms，每条交互 {batch_ms.sum() * 1000 / (n_train - n_initial):.1f} us")
+
+    user_feature, ad_features = X_holdout[0, :8], processor.ad_features.lookup(list(processor.ad_inventory))
+    print(f"\n推理延迟（单条 / 一个用户对 {len(ad_features)} 个广告）:")
+    for name, model in (("随机森林", forest), ("SGD", online)):
+        with quiet():
+            single = time_call(lambda: [model.predict_click_probability(user_feature, ad_features[i])
+                                        for i in range(100)]) / 100
+            batch = time_call(lambda: model.predict_click_probabilities(user_feature, ad_features))
+        print(f"  {name:<6} 单条 {single * 1e6:>8.1f} us   批量 {batch * 1000:>8.2f} ms")
+
+    print(f"\n保留段 AUC（{len(y_holdout)} 条）:")
+    for name, model in (("随机森林（只用初始段训练，未重训）", forest),
+                        ("随机森林（初始段 + 增量段全量重训）", forest_retrained),
+                        ("SGD（初始段训练 + 增量更新）", online),
+                        ("SGD（初始段 + 增量段全量训练）", sgd_full)):
+        print(f"  {name:<24} {auc(model, X_holdout, y_holdout):.4f}")
+
+
+if __name__ == "__main__":
+    main()
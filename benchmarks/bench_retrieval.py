@@ -0,0 +1,40 @@
+"""候选召回 vs 全量扫描：单用户推荐延迟与 recall@k
+
+运行: python -m benchmarks.bench_retrieval
+"""
+
+import argparse
+from conftest import build_system
+from benchmarks.synthetic import quiet, time_call
+from config import Config
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--sizes", type=int, nargs="+", default=[5000, 20000, 50000])
+    parser.add_argument("--max-candidates", type=int, default=1000)
+    parser.add_argument("--popular-fallback", type=int, default=200)
+    parser.add_argument("--top-k", type=int, default=10)
+    parser.add_argument("--users", type=int, default=50)
+    args = parser.parse_args()
+
+    Config.RETRIEVAL_ENABLED = True
+    Config.RETRIEVAL_MAX_CANDIDATES = args.max_candidates
+    Config.RETRIEVAL_POPULAR_FALLBACK = args.popular_fallback
+
+    print(f"{'广告数':>8} {'全量(ms)':>10} {'召回(ms)':>10} {'平均候选数':>10} {'recall@k':>9} {'最低recall':>10}")
+    for n_ads in args.sizes:
+        system = build_system(n_ads, n_users=args.users)
+        user_ids = list(system.data_processor.user_profiles)
+
+        with quiet():
+            full = time_call(lambda: [system._score_ads_batch(u, args.top_k, full_scan=True) for u in user_ids], 1)
+            retrieved = time_call(lambda: [system._score_ads_batch(u, args.top_k) for u in user_ids], 1)
+            report = system.evaluate_retrieval_recall(user_ids, args.top_k)
+
+        print(f"{n_ads:>8} {full / len(user_ids) * 1000:>10.2f} {retrieved / len(user_ids) * 1000:>10.2f} "
+              f"{report['mean_candidates']:>10.0f} {report['recall_at_k']:>9.3f} {report['min_recall_at_k']:>10.3f}")
+
+
+if __name__ == "__main__":
+    main()
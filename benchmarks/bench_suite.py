@@ -0,0 +1,278 @@
+"""基准测试套件：在固定种子生成的 SQLite 数据上测量加载、训练、推荐和交互写入的性能
+
+依次运行：
+- load: DataProcessor.load_data_from_db（流式加载用户、广告、交互记录）
+- train: PersonalizedAdRecommendation.train_models
+- recommend_single: 单用户 get_recommendations（关闭结果缓存，每次真实打分）的延迟分布与吞吐
+- recommend_cached: 开启结果缓存后重复请求同一批用户的延迟
+- recommend_multi: 多用户 get_batch_recommendations 的每批延迟与每秒用户数
+- interactions_sync / interactions_write_behind: record_user_interaction 逐条提交与异步批量写入的吞吐
+  （写入独立的临时库，不修改被测数据库）
+
+结果以 JSON 输出（--output 写入文件，否则打印到标准输出），可用 --compare 与之前的结果对比。
+全部在本机离线运行，单核机器上默认规模约需 3 分钟。
+
+运行: python -m benchmarks.bench_suite --users 2000 --ads 5000 --interactions 100000 --output results.json
+"""
+
+import argparse
+import json
+import os
+import platform
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime
+import numpy as np
+import sklearn
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+from config import Config
+from database.models import Base
+from database.interaction_writer import InteractionWriter
+from benchmarks.synthetic import populate_sqlite, quiet
+
+# --compare 时对比的指标，以及数值越小越好（True）还是越大越好（False）
+COMPARED_METRICS = {
+    ("load", "seconds"): True,
+    ("train", "seconds"): True,
+    ("recommend_single", "p50_ms"): True,
+    ("recommend_single", "p99_ms"): True,
+    ("recommend_single", "requests_per_second"): False,
+    ("recommend_cached", "p50_ms"): True,
+    ("recommend_multi", "users_per_second"): False,
+    ("interactions_sync", "events_per_second"): False,
+    ("interactions_write_behind", "events_per_second"): False,
+}
+
+
+def log(message: str):
+    print(message, file=sys.stderr, flush=True)
+
+
+def make_session_factory(path: str):
+    engine = create_engine(f"sqlite:///{path}", connect_args={"check_same_thread": False})
+    Base.metadata.create_all(engine)
+    return sessionmaker(bind=engine)
+
+
+def latency_summary(latencies) -> dict:
+    latencies = np.asarray(latencies) * 1000
+    return {
+        "count": int(len(latencies)),
+        "mean_ms": float(latencies.mean()),
+        "p50_ms": float(np.percentile(latencies, 50)),
+        "p95_ms": float(np.percentile(latencies, 95)),
+        "p99_ms": float(np.percentile(latencies, 99)),
+        "max_ms": float(latencies.max())
+    }
+
+
+def bench_load(session_factory, chunk_size: int):
+    from main import PersonalizedAdRecommendation
+
+    with quiet():
+        system = PersonalizedAdRecommendation(session_factory=session_factory)
+    processor = system.data_processor
+    start = time.perf_counter()
+    with quiet():
+        processor.load_data_from_db(chunk_size=chunk_size)
+    elapsed = time.perf_counter() - start
+    rows = len(processor.user_profiles) + len(processor.ad_inventory) + len(processor.interaction_history)
+    return system, {
+        "seconds": elapsed,
+        "users": len(processor.user_profiles),
+        "ads": len(processor.ad_inventory),
+        "interactions": len(processor.interaction_history),
+        "rows_per_second": rows / elapsed
+    }
+
+
+def bench_train(system):
+    start = time.perf_counter()
+    with quiet():
+        system.train_models()
+    elapsed = time.perf_counter() - start
+    return {"seconds": elapsed, "interactions": len(system.data_processor.interaction_history)}
+
+
+def bench_recommend(system, user_ids, top_k: int, cached: bool):
+    Config.RESULT_CACHE_ENABLED = cached
+    system.result_cache.clear()
+    if cached:
+        with quiet():
+            for user_id in user_ids:
+                system.get_recommendations(user_id, top_k)
+    latencies = []
+    start = time.perf_counter()
+    with quiet():
+        for user_id in user_ids:
+            request_start = time.perf_counter()
+            system.get_recommendations(user_id, top_k)
+            latencies.append(time.perf_counter() - request_start)
+    elapsed = time.perf_counter() - start
+    Config.RESULT_CACHE_ENABLED = True
+    return {**latency_summary(latencies), "top_k": top_k, "requests_per_second": len(user_ids) / elapsed}
+
+
+def bench_recommend_multi(system, user_ids, batch_size: int, top_k: int):
+    batches = [user_ids[i:i + batch_size] for i in range(0, len(user_ids), batch_size)]
+    latencies = []
+    start = time.perf_counter()
+    with quiet():
+        for batch in batches:
+            batch_start = time.perf_counter()
+            system.get_batch_recommendations(batch, top_k)
+            latencies.append(time.perf_counter() - batch_start)
+    elapsed = time.perf_counter() - start
+    return {**latency_summary(latencies), "batch_size": batch_size, "top_k": top_k,
+            "users_per_second": len(user_ids) / elapsed}
+
+
+def bench_interactions(system, session_factory, events, write_behind: bool):
+    """把交互写入独立的临时库；write_behind 时统计接收吞吐，并单独给出全部落盘的耗时"""
+    processor = system.data_processor
+    original_factory = processor.session_factory
+    processor.session_factory = session_factory
+    writer = None
+    if write_behind:
+        writer = InteractionWriter(session_factory, batch_size=Config.INTERACTION_WRITER_BATCH_SIZE,
+                                   flush_interval=Config.INTERACTION_WRITER_FLUSH_INTERVAL,
+                                   max_queue_size=len(events) + 1)
+        writer.start()
+        processor.interaction_writer = writer
+
+    latencies = []
+    start = time.perf_counter()
+    try:
+        with quiet():
+            for user_id, ad_id, action in events:
+                event_start = time.perf_counter()
+                system.record_user_interaction(user_id, ad_id, action)
+                latencies.append(time.perf_counter() - event_start)
+        accepted = time.perf_counter() - start
+        if writer is not None:
+            writer.stop()
+        durable = time.perf_counter() - start
+    finally:
+        processor.interaction_writer = None
+        processor.session_factory = original_factory
+
+    result = {**latency_summary(latencies), "events_per_second": len(events) / accepted, "durable_seconds": durable}
+    if writer is not None:
+        stats = writer.stats()
+        result.update(written=stats["written"], failed=stats["failed"], avg_batch_size=stats["avg_batch_size"])
+    return result
+
+
+def environment() -> dict:
+    try:
+        commit = subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True,
+                                cwd=os.path.dirname(os.path.abspath(__file__))).stdout.strip() or None
+    except OSError:
+        commit = None
+    return {
+        "timestamp": datetime.now().isoformat(timespec="seconds"),
+        "git_commit": commit,
+        "python": platform.python_version(),
+        "numpy": np.__version__,
+        "sklearn": sklearn.__version__,
+        "platform": platform.platform(),
+        "cpu_count": os.cpu_count()
+    }
+
+
+def compare(previous: dict, current: dict):
+    """打印关键指标相对之前结果的变化"""
+    log(f"\n与 {previous['environment'].get('git_commit')} ({previous['environment']['timestamp']}) 对比:")
+    changed = {key for key in set(previous["parameters"]) | set(current["parameters"])
+               if previous["parameters"].get(key) != current["parameters"].get(key)}
+    if changed:
+        log(f"  ⚠️ 两次运行的参数不同: {', '.join(sorted(changed))}，结果不可直接比较")
+    for (section, metric), lower_is_better in COMPARED_METRICS.items():
+        old = previous["results"].get(section, {}).get(metric)
+        new = current["results"].get(section, {}).get(metric)
+        if old is None or new is None or old == 0:
+            continue
+        change = (new - old) / old * 100
+        better = (change < 0) == lower_is_better
+        name = f"{section}.{metric}"
+        log(f"  {name:<46} {old:>12.3f} -> {new:>12.3f}  ({change:+.1f}%{'' if better else ' ⚠️'})")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--users", type=int, default=2000)
+    parser.add_argument("--ads", type=int, default=5000)
+    parser.add_argument("--interactions", type=int, default=100000)
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--db", help="已有的数据库文件（不指定则按上面的规模生成临时数据库）")
+    parser.add_argument("--chunk-size", type=int, default=Config.DB_LOAD_CHUNK_SIZE)
+    parser.add_argument("--requests", type=int, default=1000, help="单用户推荐的请求数")
+    parser.add_argument("--batch-size", type=int, default=50, help="多用户推荐每批的用户数")
+    parser.add_argument("--top-k", type=int, default=10)
+    parser.add_argument("--events", type=int, default=2000, help="交互写入的条数")
+    parser.add_argument("--output", help="JSON 结果文件（不指定则打印到标准输出）")
+    parser.add_argument("--compare", help="之前的 JSON 结果文件，打印关键指标的变化")
+    args = parser.parse_args()
+
+    report = {
+        "environment": environment(),
+        "parameters": {key: value for key, value in vars(args).items() if key not in ("output", "compare")},
+        "results": {}
+    }
+    results = report["results"]
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = args.db
+        if path is None:
+            path = os.path.join(tmp, "bench.db")
+            log(f"生成数据库: {args.users} 用户, {args.ads} 广告, {args.interactions} 交互 (seed={args.seed})...")
+            start = time.perf_counter()
+            populate_sqlite(path, args.users, args.ads, args.interactions, seed=args.seed)
+            results["populate"] = {"seconds": time.perf_counter() - start}
+
+        log("load ...")
+        system, results["load"] = bench_load(make_session_factory(path), args.chunk_size)
+        log("train ...")
+        results["train"] = bench_train(system)
+
+        rng = np.random.default_rng(args.seed)
+        users = list(system.data_processor.user_profiles)
+        ads = list(system.data_processor.ad_inventory)
+        request_users = [users[i] for i in rng.integers(len(users), size=args.requests)]
+
+        log("recommend ...")
+        results["recommend_single"] = bench_recommend(system, request_users, args.top_k, cached=False)
+        results["recommend_cached"] = bench_recommend(system, request_users, args.top_k, cached=True)
+        results["recommend_multi"] = bench_recommend_multi(system, request_users, args.batch_size, args.top_k)
+
+        log("interactions ...")
+        events = [(users[u], ads[a], Config.INTERACTION_ACTIONS[c]) for u, a, c in zip(
+            rng.integers(len(users), size=args.events), rng.integers(len(ads), size=args.events),
+            rng.integers(len(Config.INTERACTION_ACTIONS), size=args.events))]
+        results["interactions_sync"] = bench_interactions(
+            system, make_session_factory(os.path.join(tmp, "sync.db")), events, write_behind=False)
+        results["interactions_write_behind"] = bench_interactions(
+            system, make_session_factory(os.path.join(tmp, "write_behind.db")), events, write_behind=True)
+
+    # Linux 上 ru_maxrss 单位为 KB
+    results["peak_rss_mb"] = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+    output = json.dumps(report, indent=2, ensure_ascii=False)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            f.write(output + "\n")
+        log(f"结果已写入 {args.output}")
+    else:
+        print(output)
+
+    if args.compare:
+        with open(args.compare, encoding="utf-8") as f:
+            compare(json.load(f), report)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,55 @@
+"""全量排序 vs 部分选择 top-k 的微基准测试
+
+运行: python -m benchmarks.bench_top_k
+"""
+
+import argparse
+import numpy as np
+from benchmarks.synthetic import time_call
+from models.ranking import top_k_indices
+
+
+def full_sort_dicts(ad_ids, scores, top_k):
+    """原始做法：为每个广告构建结果字典，整体排序后截取"""
+    recommendations = [{'ad_id': ad_id, 'combined_score': float(score)} for ad_id, score in zip(ad_ids, scores)]
+    recommendations.sort(key=lambda x: x['combined_score'], reverse=True)
+    return recommendations[:top_k]
+
+
+def full_argsort(ad_ids, scores, top_k):
+    """对分数数组整体稳定排序，只为前 k 个构建结果"""
+    return [{'ad_id': ad_ids[i], 'combined_score': float(scores[i])}
+            for i in np.argsort(-scores, kind="stable")[:top_k]]
+
+
+def partial_top_k(ad_ids, scores, top_k):
+    """部分选择前 k 个，只为前 k 个构建结果"""
+    return [{'ad_id': ad_ids[i], 'combined_score': float(scores[i])}
+            for i in top_k_indices(scores, top_k)]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--sizes", type=int, nargs="+", default=[100, 1000, 10000, 100000])
+    parser.add_argument("--top-k", type=int, default=10)
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(42)
+    print(f"{'广告数':>8} {'字典全排序(ms)':>16} {'argsort(ms)':>12} {'部分选择(ms)':>14}")
+    for n_ads in args.sizes:
+        ad_ids = [f"ad_{i}" for i in range(n_ads)]
+        # 保留三位小数制造大量并列分数，验证并列顺序的确定性
+        scores = np.round(rng.random(n_ads), 3)
+
+        expected = full_sort_dicts(ad_ids, scores, args.top_k)
+        assert partial_top_k(ad_ids, scores, args.top_k) == expected, "部分选择结果与全排序不一致"
+        assert full_argsort(ad_ids, scores, args.top_k) == expected
+
+        timings = [time_call(lambda fn=fn: fn(ad_ids, scores, args.top_k), args.repeat)
+                   for fn in (full_sort_dicts, full_argsort, partial_top_k)]
+        print(f"{n_ads:>8} {timings[0] * 1000:>16.3f} {timings[1] * 1000:>12.3f} {timings[2] * 1000:>14.3f}")
+
+
+if __name__ == "__main__":
+    main()
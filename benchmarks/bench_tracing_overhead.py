@@ -0,0 +1,71 @@
+"""请求耗时追踪的开销：未开启追踪时 span()/count() 的单次调用开销，以及推荐打分在不同模式下的耗时
+
+三种模式交替运行同一批用户的推荐（关闭结果缓存，每次都真实打分）：
+- off: 关闭阶段指标（METRICS_ENABLED=False）且不开启追踪
+- metrics: 只记录阶段耗时直方图（默认配置）
+- trace: 阶段指标 + 每个请求开启追踪
+
+运行: python -m benchmarks.bench_tracing_overhead --ads 2000 --requests 2000
+"""
+
+import argparse
+import time
+import timeit
+import numpy as np
+import tracing
+from config import Config
+from conftest import build_system
+from benchmarks.synthetic import quiet
+
+
+def run_requests(system, user_ids, top_k: int, traced: bool) -> np.ndarray:
+    latencies = np.empty(len(user_ids))
+    for i, user_id in enumerate(user_ids):
+        start = time.perf_counter()
+        if traced:
+            with tracing.start_trace() as trace:
+                system.get_recommendations(user_id, top_k)
+            trace.to_dict()
+        else:
+            system.get_recommendations(user_id, top_k)
+        latencies[i] = time.perf_counter() - start
+    return latencies
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--ads", type=int, default=2000)
+    parser.add_argument("--requests", type=int, default=2000)
+    parser.add_argument("--rounds", type=int, default=3)
+    parser.add_argument("--top-k", type=int, default=10)
+    args = parser.parse_args()
+
+    # 调用 100 万次的总秒数即每次调用的微秒数
+    noop_span = timeit.timeit(lambda: tracing.span("x").__enter__(), number=1_000_000)
+    noop_count = timeit.timeit(lambda: tracing.count("x"), number=1_000_000)
+    print(f"未开启追踪: span() {noop_span:.3f} us/次, count() {noop_count:.3f} us/次")
+
+    Config.RESULT_CACHE_ENABLED = False
+    system = build_system(args.ads, n_users=200)
+    users = list(system.data_processor.user_profiles)
+    user_ids = [users[i % len(users)] for i in range(args.requests)]
+
+    modes = {"off": (False, False), "metrics": (True, False), "trace": (True, True)}
+    results = {mode: [] for mode in modes}
+    with quiet():
+        run_requests(system, user_ids[:200], args.top_k, False)  # 预热
+        for _ in range(args.rounds):
+            for mode, (metrics_enabled, traced) in modes.items():
+                Config.METRICS_ENABLED = metrics_enabled
+                results[mode].append(run_requests(system, user_ids, args.top_k, traced))
+    Config.METRICS_ENABLED = True
+
+    print(f"广告数 {args.ads}, 每轮 {args.requests} 次推荐, {args.rounds} 轮（取各轮中位数最小的一轮）")
+    print(f"{'模式':>8} {'p50(ms)':>9} {'p99(ms)':>9} {'平均(ms)':>9}")
+    for mode, rounds in results.items():
+        best = min(rounds, key=np.median)
+        print(f"{mode:>8} {np.median(best) * 1000:>9.3f} {np.percentile(best, 99) * 1000:>9.3f} {best.mean() * 1000:>9.3f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,89 @@
+"""广告嵌入向量检索：原始逐个计算 vs 精确矩阵索引 vs IVF 近似索引的 recall@k 与 QPS
+
+运行: python -m benchmarks.bench_vector_index --sizes 100000 1000000
+"""
+
+import argparse
+import time
+import numpy as np
+from models.user_embedding import UserEmbeddingModel
+from models.vector_index import BruteForceIndex, IVFIndex
+
+
+def clustered_vectors(n: int, dim: int, n_clusters: int, rng) -> np.ndarray:
+    """生成带簇结构的向量（模拟训练后的嵌入分布）"""
+    centers = rng.normal(0, 1, (n_clusters, dim)).astype(np.float32)
+    labels = rng.integers(n_clusters, size=n)
+    vectors = np.empty((n, dim), dtype=np.float32)
+    for start in range(0, n, 100000):
+        end = min(start + 100000, n)
+        vectors[start:end] = centers[labels[start:end]] + rng.normal(0, 0.6, (end - start, dim)).astype(np.float32)
+    return vectors
+
+
+def measure(index, queries, k):
+    """返回 (每次检索结果列表, QPS)"""
+    results = []
+    start = time.perf_counter()
+    for query in queries:
+        results.append([item_id for item_id, _ in index.search(query, k)])
+    return results, len(queries) / (time.perf_counter() - start)
+
+
+def legacy_search(vectors, ad_ids, query, k):
+    """原始实现：逐个广告计算余弦相似度后整体排序"""
+    similarities = [(ad_id, UserEmbeddingModel.cosine_similarity(query, vector)) for ad_id, vector in zip(ad_ids, vectors)]
+    similarities.sort(key=lambda x: x[1], reverse=True)
+    return [ad_id for ad_id, _ in similarities[:k]]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--sizes", type=int, nargs="+", default=[100000, 500000])
+    parser.add_argument("--dim", type=int, default=128)
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--k", type=int, default=10)
+    parser.add_argument("--n-probe", type=int, nargs="+", default=[4, 8, 16])
+    parser.add_argument("--uniform", action="store_true", help="使用无簇结构的均匀随机向量")
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(42)
+    print(f"{'向量数':>9} {'索引':>14} {'recall@k':>9} {'QPS':>10} {'平均(ms)':>9}")
+    for n in args.sizes:
+        if args.uniform:
+            vectors = rng.normal(0, 1, (n, args.dim)).astype(np.float32)
+        else:
+            vectors = clustered_vectors(n, args.dim, max(16, n // 1000), rng)
+        queries = vectors[rng.integers(n, size=args.queries)] + rng.normal(0, 0.3, (args.queries, args.dim)).astype(np.float32)
+        ad_ids = [f"ad_{i}" for i in range(n)]
+
+        exact = BruteForceIndex(args.dim, initial_capacity=n)
+        for ad_id, vector in zip(ad_ids, vectors):
+            exact.add(ad_id, vector)
+        truth, qps = measure(exact, queries, args.k)
+        print(f"{n:>9} {'exact':>14} {1.0:>9.3f} {qps:>10.1f} {1000 / qps:>9.2f}")
+
+        # 原始实现太慢，只测少量查询
+        legacy_queries = queries[:max(1, 20000000 // n // 10)]
+        start = time.perf_counter()
+        for query in legacy_queries:
+            legacy_search(vectors, ad_ids, query, args.k)
+        legacy_qps = len(legacy_queries) / (time.perf_counter() - start)
+        print(f"{n:>9} {'legacy loop':>14} {'-':>9} {legacy_qps:>10.1f} {1000 / legacy_qps:>9.2f}")
+
+        ivf = IVFIndex(args.dim, initial_capacity=n, min_train_size=0)
+        for ad_id, vector in zip(ad_ids, vectors):
+            ivf.add(ad_id, vector)
+        start = time.perf_counter()
+        ivf.train()
+        print(f"{n:>9} {'ivf train':>14} {'-':>9} {'-':>10} {(time.perf_counter() - start) * 1000:>9.0f}")
+
+        for n_probe in args.n_probe:
+            ivf.n_probe = n_probe
+            approx, qps = measure(ivf, queries, args.k)
+            recall = np.mean([len(set(a) & set(t)) / len(t) for a, t in zip(approx, truth)])
+            print(f"{n:>9} {f'ivf probe={n_probe}':>14} {recall:>9.3f} {qps:>10.1f} {1000 / qps:>9.2f}")
+
+
+if __name__ == "__main__":
+    main()
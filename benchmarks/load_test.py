@@ -0,0 +1,306 @@
+"""API 压测：在固定种子生成的 SQLite 数据库上启动 uvicorn，按配置的流量配比并发请求，输出延迟分布报告
+
+流量由三类请求按权重混合：/recommend/{user_id}、/interaction/{user_id}/{ad_id}/{action}、/user/{user_id}/profile。
+两种负载模式：
+- closed: --concurrency 个客户端各自循环发送请求（收到响应后立即发下一个），得到的吞吐即最大 RPS
+- open: 按 --rate 的固定到达率发送（--arrival poisson 时为泊松到达），与响应快慢无关；
+  延迟从计划发送时刻算起，避免协同遗漏（coordinated omission）低估排队时间，
+  同时在途请求超过 --max-inflight 时丢弃并计数
+
+服务端运行在独立子进程中（与压测客户端不共享 GIL），日志写入临时目录。单核机器上客户端与服务端争用 CPU，
+结果偏保守，对比不同版本时请使用相同的机器和参数。
+
+运行:
+  python -m benchmarks.load_test --mode closed --concurrency 16 --duration 30
+  python -m benchmarks.load_test --mode open --rate 50 --duration 30 --mix recommend=0.6,interaction=0.3,profile=0.1
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import random
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+from collections import defaultdict
+from datetime import datetime
+import httpx
+import numpy as np
+from benchmarks.synthetic import populate_sqlite
+
+ENDPOINTS = ("recommend", "interaction", "profile")
+ACTIONS = ("view", "click", "purchase", "ignore")
+# 延迟分布报告的桶边界（毫秒）
+HISTOGRAM_BOUNDS_MS = (1, 2, 5, 10, 20, 50, 100, 200, 500, 1000, 2000, 5000, 10000)
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def parse_mix(text: str) -> dict:
+    mix = {}
+    for part in text.split(","):
+        name, _, weight = part.partition("=")
+        name = name.strip()
+        if name not in ENDPOINTS:
+            raise argparse.ArgumentTypeError(f"未知的请求类型 {name}，可选: {', '.join(ENDPOINTS)}")
+        mix[name] = float(weight)
+    if sum(mix.values()) <= 0:
+        raise argparse.ArgumentTypeError("流量权重之和必须大于 0")
+    return mix
+
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def start_server(db_path: str, port: int, log_path: str, env_overrides: dict) -> subprocess.Popen:
+    """在子进程中启动 uvicorn，服务端使用 db_path 指向的 SQLite 数据库"""
+    env = dict(os.environ, DB_TYPE="sqlite", SQLITE_PATH=db_path, **env_overrides)
+    with open(log_path, "w") as log_file:
+        return subprocess.Popen(
+            [sys.executable, "-m", "uvicorn", "api_server:app", "--host", "127.0.0.1", "--port", str(port),
+             "--log-level", "warning", "--no-access-log"],
+            cwd=REPO_ROOT, env=env, stdout=log_file, stderr=subprocess.STDOUT)
+
+
+async def wait_until_ready(base_url: str, process: subprocess.Popen, timeout: float):
+    """等待数据加载完成且点击模型已训练（/health 的 model.trained 为真且 model_version >= 1）
+
+    没有可加载的模型产物时服务端先以未训练的模型开始服务、在后台训练，
+    只看 status 会测到未训练时的快速路径和压测中途的模型热替换。
+    """
+    deadline = time.monotonic() + timeout
+    async with httpx.AsyncClient(base_url=base_url, timeout=5) as client:
+        while time.monotonic() < deadline:
+            if process.poll() is not None:
+                raise RuntimeError(f"服务端进程已退出（返回码 {process.returncode}）")
+            try:
+                model = (await client.get("/health")).json().get("model") or {}
+                if model.get("trained") and model.get("model_version", 0) >= 1:
+                    return
+            except httpx.TransportError:
+                pass
+            await asyncio.sleep(0.5)
+    raise TimeoutError(f"服务端 {timeout} 秒内未就绪")
+
+
+class LoadGenerator:
+    """按流量配比生成请求并记录每个请求的类型、状态码和延迟"""
+
+    def __init__(self, client: httpx.AsyncClient, users: list, ads: list, mix: dict, top_k: int, seed: int):
+        self.client = client
+        self.users = users
+        self.ads = ads
+        self.endpoints = list(mix)
+        self.weights = [mix[name] for name in self.endpoints]
+        self.top_k = top_k
+        self.rng = random.Random(seed)
+        self.records = []  # (类型, 状态码, 延迟秒数, 完成时刻)；状态码 0 表示连接错误或超时
+        self.recording = False
+
+    def next_request(self):
+        endpoint = self.rng.choices(self.endpoints, self.weights)[0]
+        user_id = self.rng.choice(self.users)
+        if endpoint == "recommend":
+            return endpoint, "GET", f"/recommend/{user_id}", {"top_k": self.top_k}
+        if endpoint == "interaction":
+            ad_id = self.rng.choice(self.ads)
+            return endpoint, "POST", f"/interaction/{user_id}/{ad_id}/{self.rng.choice(ACTIONS)}", None
+        return endpoint, "GET", f"/user/{user_id}/profile", None
+
+    async def send(self, request, started: float):
+        """发送请求；started 为计算延迟的起点（open 模式下是计划发送时刻）"""
+        endpoint, method, path, params = request
+        try:
+            status = (await self.client.request(method, path, params=params)).status_code
+        except httpx.HTTPError:
+            status = 0
+        finished = time.perf_counter()
+        if self.recording:
+            self.records.append((endpoint, status, finished - started, finished))
+
+    async def closed_loop(self, concurrency: int, deadline: float):
+        async def worker():
+            while time.perf_counter() < deadline:
+                await self.send(self.next_request(), time.perf_counter())
+
+        await asyncio.gather(*[worker() for _ in range(concurrency)])
+
+    async def open_loop(self, rate: float, deadline: float, arrival: str, max_inflight: int) -> int:
+        """按到达率发送请求，返回因在途请求过多而丢弃的请求数"""
+        inflight = set()
+        dropped = 0
+        scheduled = time.perf_counter()
+        while scheduled < deadline:
+            delay = scheduled - time.perf_counter()
+            if delay > 0:
+                await asyncio.sleep(delay)
+            if len(inflight) >= max_inflight:
+                dropped += self.recording
+            else:
+                task = asyncio.create_task(self.send(self.next_request(), scheduled))
+                inflight.add(task)
+                task.add_done_callback(inflight.discard)
+            scheduled += self.rng.expovariate(rate) if arrival == "poisson" else 1.0 / rate
+        if inflight:
+            await asyncio.gather(*inflight)
+        return dropped
+
+
+def latency_report(records, measured_seconds: float) -> dict:
+    latencies = np.array([latency for _, _, latency, _ in records]) * 1000
+    statuses = defaultdict(int)
+    for _, status, _, _ in records:
+        statuses[str(status)] += 1
+    errors = sum(count for status, count in statuses.items() if status == "0" or int(status) >= 500)
+    report = {"requests": len(records), "rps": len(records) / measured_seconds, "errors": errors,
+              "status_codes": dict(sorted(statuses.items()))}
+    if len(latencies):
+        report.update({
+            "mean_ms": float(latencies.mean()),
+            "p50_ms": float(np.percentile(latencies, 50)),
+            "p95_ms": float(np.percentile(latencies, 95)),
+            "p99_ms": float(np.percentile(latencies, 99)),
+            "max_ms": float(latencies.max()),
+            # 各桶为 <= 边界（毫秒）的请求数（非累计），最后一个桶为超过最大边界的请求
+            "histogram_ms": {
+                **{f"<={bound}": int(count) for bound, count in zip(
+                    HISTOGRAM_BOUNDS_MS, np.histogram(latencies, bins=(0,) + HISTOGRAM_BOUNDS_MS)[0])},
+                f">{HISTOGRAM_BOUNDS_MS[-1]}": int((latencies > HISTOGRAM_BOUNDS_MS[-1]).sum())
+            }
+        })
+    return report
+
+
+async def run(args, base_url: str) -> dict:
+    limits = httpx.Limits(max_connections=max(args.concurrency, args.max_inflight) + 1)
+    async with httpx.AsyncClient(base_url=base_url, limits=limits, timeout=args.timeout) as client:
+        users = (await client.get("/users")).json()["users"]
+        ads = [ad["ad_id"] for ad in (await client.get("/ads")).json()["ads"]]
+        generator = LoadGenerator(client, users, ads, args.mix, args.top_k, args.seed)
+
+        start = time.perf_counter()
+        measure_start = start + args.warmup
+        deadline = measure_start + args.duration
+
+        async def start_recording():
+            await asyncio.sleep(args.warmup)
+            generator.recording = True
+
+        recorder = asyncio.create_task(start_recording())
+        dropped = 0
+        if args.mode == "closed":
+            await generator.closed_loop(args.concurrency, deadline)
+        else:
+            dropped = await generator.open_loop(args.rate, deadline, args.arrival, args.max_inflight)
+        await recorder
+        # 只统计在测量窗口内完成的请求
+        records = [r for r in generator.records if measure_start <= r[3] <= deadline]
+
+        metrics_text = (await client.get("/metrics")).text if args.scrape_metrics else None
+
+    by_endpoint = defaultdict(list)
+    for record in records:
+        by_endpoint[record[0]].append(record)
+    report = {
+        "overall": latency_report(records, args.duration),
+        "endpoints": {name: latency_report(by_endpoint[name], args.duration) for name in args.mix},
+        "dropped": dropped
+    }
+    if metrics_text is not None:
+        report["server_metrics"] = metrics_text
+    return report
+
+
+def print_report(report: dict, args):
+    print(f"模式 {args.mode}" + (f", 并发 {args.concurrency}" if args.mode == "closed"
+                                 else f", 到达率 {args.rate}/s ({args.arrival}), 丢弃 {report['dropped']}")
+          + f", 测量 {args.duration} 秒 (预热 {args.warmup} 秒), CPU {os.cpu_count()}")
+    print(f"{'请求类型':>12} {'请求数':>8} {'RPS':>8} {'错误':>6} {'p50(ms)':>9} {'p95(ms)':>9} "
+          f"{'p99(ms)':>9} {'max(ms)':>9}")
+    for name, r in [("overall", report["overall"]), *report["endpoints"].items()]:
+        if not r["requests"]:
+            print(f"{name:>12} {0:>8}")
+            continue
+        print(f"{name:>12} {r['requests']:>8} {r['rps']:>8.1f} {r['errors']:>6} {r['p50_ms']:>9.1f} "
+              f"{r['p95_ms']:>9.1f} {r['p99_ms']:>9.1f} {r['max_ms']:>9.1f}")
+    histogram = report["overall"].get("histogram_ms", {})
+    total = max(report["overall"]["requests"], 1)
+    print("\n延迟分布（全部请求）:")
+    for bucket, count in histogram.items():
+        print(f"  {bucket:>8} ms {count:>8} {'#' * int(50 * count / total)}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--mode", choices=["closed", "open"], default="closed")
+    parser.add_argument("--concurrency", type=int, default=16, help="closed 模式的客户端数")
+    parser.add_argument("--rate", type=float, default=50.0, help="open 模式每秒发送的请求数")
+    parser.add_argument("--arrival", choices=["uniform", "poisson"], default="poisson")
+    parser.add_argument("--max-inflight", type=int, default=1000, help="open 模式在途请求上限")
+    parser.add_argument("--mix", type=parse_mix, default=parse_mix("recommend=0.7,interaction=0.2,profile=0.1"))
+    parser.add_argument("--duration", type=float, default=30.0, help="测量时长（秒）")
+    parser.add_argument("--warmup", type=float, default=5.0, help="预热时长（秒），期间的请求不计入结果")
+    parser.add_argument("--top-k", type=int, default=10)
+    parser.add_argument("--timeout", type=float, default=30.0)
+    parser.add_argument("--users", type=int, default=2000)
+    parser.add_argument("--ads", type=int, default=5000)
+    parser.add_argument("--interactions", type=int, default=100000)
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--db", help="已有的数据库文件（压测中会写入交互记录；不指定则生成临时数据库）")
+    parser.add_argument("--server-env", action="append", default=[], metavar="KEY=VALUE",
+                        help="传给服务端的环境变量，如 --server-env SCORING_EXECUTOR_WORKERS=0")
+    parser.add_argument("--startup-timeout", type=float, default=600.0)
+    parser.add_argument("--scrape-metrics", action="store_true", help="结束时抓取服务端 /metrics 放入报告")
+    parser.add_argument("--output", help="JSON 报告文件")
+    args = parser.parse_args()
+
+    server_env = dict(item.split("=", 1) for item in args.server_env)
+    with tempfile.TemporaryDirectory() as tmp:
+        db_path = args.db
+        if db_path is None:
+            db_path = os.path.join(tmp, "load_test.db")
+            print(f"生成数据库: {args.users} 用户, {args.ads} 广告, {args.interactions} 交互 (seed={args.seed})...")
+            populate_sqlite(db_path, args.users, args.ads, args.interactions, seed=args.seed)
+
+        port = free_port()
+        base_url = f"http://127.0.0.1:{port}"
+        log_path = os.path.join(tmp, "server.log")
+        process = start_server(os.path.abspath(db_path), port, log_path, server_env)
+        try:
+            print("等待服务端启动（加载数据、训练模型）...")
+            start = time.perf_counter()
+            asyncio.run(wait_until_ready(base_url, process, args.startup_timeout))
+            startup_seconds = time.perf_counter() - start
+            print(f"服务端就绪，耗时 {startup_seconds:.1f} 秒，开始压测...")
+            report = asyncio.run(run(args, base_url))
+        except Exception:
+            with open(log_path) as f:
+                print(f.read()[-4000:], file=sys.stderr)
+            raise
+        finally:
+            process.terminate()
+            try:
+                process.wait(timeout=30)
+            except subprocess.TimeoutExpired:
+                process.kill()
+
+    report = {
+        "timestamp": datetime.now().isoformat(timespec="seconds"),
+        "parameters": {key: value for key, value in vars(args).items() if key != "output"},
+        "server_startup_seconds": startup_seconds,
+        **report
+    }
+    print_report(report, args)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2, ensure_ascii=False)
+        print(f"\n报告已写入 {args.output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,116 @@
+"""基准测试用的合成数据生成器（固定随机种子，结果可复现）"""
+
+import contextlib
+import io
+import time
+from datetime import datetime
+import numpy as np
+from sqlalchemy import create_engine, insert
+from config import Config
+from database.models import Base, User, Advertisement, UserInteraction
+
+INTERESTS = [
+    "technology", "sports", "gaming", "fashion", "beauty", "travel",
+    "business", "finance", "food", "music", "education", "health"
+]
+GENDERS = ["male", "female"]
+TARGET_GENDERS = ["all", "male", "female"]
+DEVICES = ["mobile", "desktop", "tablet"]
+LOCATIONS = ["Beijing", "Shanghai", "Shenzhen", "Guangzhou", "Hangzhou"]
+ACTIONS = ["view", "click", "purchase", "ignore"]
+
+
+def generate_users(n_users: int, seed: int = 42) -> dict:
+    """生成 n_users 个用户画像"""
+    rng = np.random.default_rng(seed)
+    users = {}
+    for i in range(n_users):
+        n_interests = int(rng.integers(1, 5))
+        users[f"user_{i + 1}"] = {
+            "age": int(rng.integers(16, 65)),
+            "gender": GENDERS[int(rng.integers(len(GENDERS)))],
+            "interests": [str(x) for x in rng.choice(INTERESTS, n_interests, replace=False)],
+            "location": LOCATIONS[int(rng.integers(len(LOCATIONS)))],
+            "device": DEVICES[int(rng.integers(len(DEVICES)))]
+        }
+    return users
+
+
+def generate_ads(n_ads: int, seed: int = 43) -> dict:
+    """生成 n_ads 个广告"""
+    rng = np.random.default_rng(seed)
+    ads = {}
+    for i in range(n_ads):
+        n_keywords = int(rng.integers(1, 5))
+        age_min = int(rng.integers(15, 40))
+        ads[f"ad_{i + 1}"] = {
+            "title": f"广告 {i + 1}",
+            "category": Config.AD_CATEGORIES[int(rng.integers(len(Config.AD_CATEGORIES)))],
+            "keywords": [str(x) for x in rng.choice(INTERESTS, n_keywords, replace=False)],
+            "target_age": [age_min, age_min + int(rng.integers(5, 30))],
+            "target_gender": TARGET_GENDERS[int(rng.integers(len(TARGET_GENDERS)))],
+            "bid_price": round(float(rng.uniform(0.5, 5.0)), 2)
+        }
+    return ads
+
+
+def generate_interactions(user_ids: list, ad_ids: list, n_interactions: int, seed: int = 44) -> list:
+    """生成 n_interactions 条交互记录，约 30% 为点击"""
+    rng = np.random.default_rng(seed)
+    user_idx = rng.integers(len(user_ids), size=n_interactions)
+    ad_idx = rng.integers(len(ad_ids), size=n_interactions)
+    action_idx = rng.choice(len(ACTIONS), size=n_interactions, p=[0.6, 0.3, 0.05, 0.05])
+    base = np.datetime64("2024-01-01T00:00:00")
+    return [{
+        "user_id": user_ids[u],
+        "ad_id": ad_ids[a],
+        "action": ACTIONS[c],
+        "timestamp": str(base + np.timedelta64(int(i), "m")).replace("T", " ")
+    } for i, (u, a, c) in enumerate(zip(user_idx, ad_idx, action_idx))]
+
+
+def populate_sqlite(path: str, n_users: int, n_ads: int, n_interactions: int, seed: int = 42,
+                    chunk: int = 50000):
+    """生成带固定随机种子的 SQLite 数据库（用户、广告、交互记录），相同参数生成的数据完全相同"""
+    engine = create_engine(f"sqlite:///{path}")
+    Base.metadata.create_all(engine)
+    users = generate_users(n_users, seed=seed)
+    ads = generate_ads(n_ads, seed=seed + 1)
+    with engine.begin() as conn:
+        conn.execute(insert(User), [{"user_id": user_id, **profile} for user_id, profile in users.items()])
+        conn.execute(insert(Advertisement), [{
+            "ad_id": ad_id,
+            "title": ad["title"],
+            "category": ad["category"],
+            "keywords": ad["keywords"],
+            "target_age_min": ad["target_age"][0],
+            "target_age_max": ad["target_age"][1],
+            "target_gender": ad["target_gender"],
+            "bid_price": ad["bid_price"],
+            "is_active": True
+        } for ad_id, ad in ads.items()])
+    user_ids, ad_ids = list(users), list(ads)
+    for start in range(0, n_interactions, chunk):
+        rows = generate_interactions(user_ids, ad_ids, min(chunk, n_interactions - start), seed=seed + 2 + start)
+        for row in rows:
+            row["timestamp"] = datetime.fromisoformat(row["timestamp"])
+        with engine.begin() as conn:
+            conn.execute(insert(UserInteraction), rows)
+    engine.dispose()
+
+
+@contextlib.contextmanager
+def quiet():
+    """屏蔽被测代码中的 print 输出"""
+    with contextlib.redirect_stdout(io.StringIO()):
+        yield
+
+
+def time_call(fn, repeat: int = 5) -> float:
+    """多次调用取最小耗时（秒）"""
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - start)
+    return best
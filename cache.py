@@ -0,0 +1,156 @@
+import threading
+import time
+from collections import OrderedDict, defaultdict
+from typing import Any, Callable, Dict, Hashable, List, Optional
+
+
+class LRUCache:
+    """线程安全的 LRU 缓存，支持容量上限、可选 TTL 以及命中/未命中/淘汰计数"""
+
+    def __init__(self, max_size: int = 10000, ttl: Optional[float] = None,
+                 on_evict: Optional[Callable[[Hashable], None]] = None):
+        """
+        Args:
+            max_size: 最大条目数，超出时淘汰最久未使用的条目
+            ttl: 条目存活秒数，None 表示不过期
+            on_evict: 条目因容量淘汰或过期被移除时的回调（参数为 key）
+        """
+        self.max_size = max_size
+        self.ttl = ttl
+        self.on_evict = on_evict
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+        self.invalidations = 0
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+    def __contains__(self, key: Hashable) -> bool:
+        return key in self._data
+
+    def get(self, key: Hashable, default: Any = None) -> Any:
+        """读取条目，命中时将其移到最近使用端"""
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is None:
+                self.misses += 1
+                return default
+
+            value, expires_at = entry
+            if expires_at is not None and expires_at <= time.monotonic():
+                del self._data[key]
+                self.expirations += 1
+                self.misses += 1
+                if self.on_evict:
+                    self.on_evict(key)
+                return default
+
+            self._data.move_to_end(key)
+            self.hits += 1
+            return value
+
+    def put(self, key: Hashable, value: Any):
+        """写入条目，超出容量时淘汰最久未使用的条目"""
+        if self.max_size <= 0:
+            return
+        expires_at = time.monotonic() + self.ttl if self.ttl else None
+        with self._lock:
+            self._data[key] = (value, expires_at)
+            self._data.move_to_end(key)
+            while len(self._data) > self.max_size:
+                evicted_key, _ = self._data.popitem(last=False)
+                self.evictions += 1
+                if self.on_evict:
+                    self.on_evict(evicted_key)
+
+    def invalidate(self, key: Hashable) -> bool:
+        """使单个条目失效"""
+        with self._lock:
+            if self._data.pop(key, None) is None:
+                return False
+            self.invalidations += 1
+            return True
+
+    def clear(self):
+        """清空缓存（计数保留）"""
+        with self._lock:
+            self.invalidations += len(self._data)
+            self._data.clear()
+
+    def stats(self) -> Dict[str, Any]:
+        """缓存统计信息"""
+        lookups = self.hits + self.misses
+        return {
+            "size": len(self._data),
+            "max_size": self.max_size,
+            "ttl": self.ttl,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_ratio": self.hits / lookups if lookups else 0.0,
+            "evictions": self.evictions,
+            "expirations": self.expirations,
+            "invalidations": self.invalidations
+        }
+
+
+class RecommendationCache:
+    """推荐结果缓存：按 (user_id, top_k, 模型版本) 缓存，支持按用户精确失效
+
+    当模型版本或广告库版本变化时整体失效。
+    """
+
+    def __init__(self, max_size: int = 50000, ttl: Optional[float] = 60.0):
+        self._lock = threading.Lock()
+        self._keys_by_user = defaultdict(set)
+        self._cache = LRUCache(max_size=max_size, ttl=ttl, on_evict=self._forget_key)
+        self._state = None
+
+    def _forget_key(self, key):
+        keys = self._keys_by_user.get(key[0])
+        if keys is not None:
+            keys.discard(key)
+            if not keys:
+                del self._keys_by_user[key[0]]
+
+    def _check_state(self, model_version, inventory_version):
+        """模型或广告库发生变化时清空全部结果"""
+        state = (model_version, inventory_version)
+        if state != self._state:
+            self._clear()
+            self._state = state
+
+    def get(self, user_id: str, top_k: int, model_version, inventory_version=None) -> Optional[List[Dict[str, Any]]]:
+        with self._lock:
+            self._check_state(model_version, inventory_version)
+            return self._cache.get((user_id, top_k, model_version))
+
+    def put(self, user_id: str, top_k: int, model_version, recommendations: List[Dict[str, Any]],
+            inventory_version=None):
+        with self._lock:
+            self._check_state(model_version, inventory_version)
+            key = (user_id, top_k, model_version)
+            self._keys_by_user[user_id].add(key)
+            self._cache.put(key, recommendations)
+
+    def invalidate_user(self, user_id: str):
+        """使某个用户的全部缓存结果失效（例如用户产生了新的交互）"""
+        with self._lock:
+            for key in self._keys_by_user.pop(user_id, ()):
+                self._cache.invalidate(key)
+
+    def _clear(self):
+        self._cache.clear()
+        self._keys_by_user.clear()
+
+    def clear(self):
+        with self._lock:
+            self._clear()
+
+    def stats(self) -> Dict[str, Any]:
+        stats = self._cache.stats()
+        stats["users"] = len(self._keys_by_user)
+        return stats
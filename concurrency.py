@@ -0,0 +1,63 @@
+import functools
+import threading
+from contextlib import contextmanager
+
+
+class ReadWriteLock:
+    """读写锁：多个读者可以并发，写者独占；有写者等待时新的读者排队（写优先，避免写者饿死）
+
+    不可重入：持有读锁时不要再次获取读锁或写锁。
+    """
+
+    def __init__(self):
+        self._condition = threading.Condition()
+        self._readers = 0
+        self._writing = False
+        self._waiting_writers = 0
+
+    @contextmanager
+    def read(self):
+        with self._condition:
+            while self._writing or self._waiting_writers:
+                self._condition.wait()
+            self._readers += 1
+        try:
+            yield
+        finally:
+            with self._condition:
+                self._readers -= 1
+                if self._readers == 0:
+                    self._condition.notify_all()
+
+    @contextmanager
+    def write(self):
+        with self._condition:
+            self._waiting_writers += 1
+            while self._writing or self._readers:
+                self._condition.wait()
+            self._waiting_writers -= 1
+            self._writing = True
+        try:
+            yield
+        finally:
+            with self._condition:
+                self._writing = False
+                self._condition.notify_all()
+
+
+def reads_state(method):
+    """方法装饰器：在 self.state_lock 的读锁内执行"""
+    @functools.wraps(method)
+    def wrapper(self, *args, **kwargs):
+        with self.state_lock.read():
+            return method(self, *args, **kwargs)
+    return wrapper
+
+
+def writes_state(method):
+    """方法装饰器：在 self.state_lock 的写锁内执行"""
+    @functools.wraps(method)
+    def wrapper(self, *args, **kwargs):
+        with self.state_lock.write():
+            return method(self, *args, **kwargs)
+    return wrapper
@@ -16,22 +16,117 @@ class Config:
     MYSQL_PASSWORD = os.getenv("MYSQL_PASSWORD", "")
     MYSQL_DB = os.getenv("MYSQL_DB", "ad_recommendation")
 
+    # SQLite 数据库文件路径（基准测试/压测可指向生成的测试库）
+    SQLITE_PATH = os.getenv("SQLITE_PATH", "./ad_recommendation.db")
+
+    # 连接池配置（多线程服务时按并发量调整，使用情况见 /stats/db-pool）
+    DB_POOL_SIZE = int(os.getenv("DB_POOL_SIZE", "10"))
+    DB_MAX_OVERFLOW = int(os.getenv("DB_MAX_OVERFLOW", "20"))
+    DB_POOL_TIMEOUT = float(os.getenv("DB_POOL_TIMEOUT", "30"))
+    DB_POOL_RECYCLE = int(os.getenv("DB_POOL_RECYCLE", "300"))
+    # 打印 SQL 语句（仅用于调试）
+    DB_ECHO = os.getenv("DB_ECHO", "false").lower() == "true"
+    POOL_KWARGS = {"pool_size": DB_POOL_SIZE, "max_overflow": DB_MAX_OVERFLOW, "pool_timeout": DB_POOL_TIMEOUT}
+
     # 构建数据库URL
     if DB_TYPE == "sqlite":
-        DATABASE_URL = "sqlite:///./ad_recommendation.db"
-        ENGINE_KWARGS = {"connect_args": {"check_same_thread": False}}
+        DATABASE_URL = f"sqlite:///{SQLITE_PATH}"
+        ENGINE_KWARGS = {"connect_args": {"check_same_thread": False}, **POOL_KWARGS}
+        # API 异步数据访问层使用的驱动
+        ASYNC_DATABASE_URL = f"sqlite+aiosqlite:///{SQLITE_PATH}"
+        ASYNC_ENGINE_KWARGS = dict(POOL_KWARGS)
     else:
         DATABASE_URL = f"mysql+pymysql://{MYSQL_USER}:{MYSQL_PASSWORD}@{MYSQL_HOST}:{MYSQL_PORT}/{MYSQL_DB}"
-        ENGINE_KWARGS = {"pool_pre_ping": True, "pool_recycle": 300}
+        ENGINE_KWARGS = {"pool_pre_ping": True, "pool_recycle": DB_POOL_RECYCLE, **POOL_KWARGS}
+        ASYNC_DATABASE_URL = f"mysql+aiomysql://{MYSQL_USER}:{MYSQL_PASSWORD}@{MYSQL_HOST}:{MYSQL_PORT}/{MYSQL_DB}"
+        ASYNC_ENGINE_KWARGS = {"pool_pre_ping": True, "pool_recycle": DB_POOL_RECYCLE, **POOL_KWARGS}
+
+    # API 中推荐打分（CPU 密集）所用线程池的大小，0 表示直接在事件循环中执行
+    SCORING_EXECUTOR_WORKERS = int(os.getenv("SCORING_EXECUTOR_WORKERS", str(min(4, os.cpu_count() or 1))))
+
+    # 启动时从数据库流式加载数据的分块行数，以及每加载多少行打印一次进度
+    DB_LOAD_CHUNK_SIZE = int(os.getenv("DB_LOAD_CHUNK_SIZE", "10000"))
+    DB_LOAD_PROGRESS_EVERY = int(os.getenv("DB_LOAD_PROGRESS_EVERY", "100000"))
+    # API 服务内增量同步（按高水位拉取其他写入方的新数据）的间隔秒数，0 表示关闭
+    DELTA_SYNC_INTERVAL = float(os.getenv("DELTA_SYNC_INTERVAL", "5"))
+    # 交互记录增量同步向高水位以下重叠拉取的 id 数（按 id 去重），覆盖自增 id 与提交顺序不一致的晚提交记录
+    DELTA_SYNC_INTERACTION_ID_OVERLAP = int(os.getenv("DELTA_SYNC_INTERACTION_ID_OVERLAP", "10000"))
+    # API 服务中交互记录异步批量写入：攒够 BATCH_SIZE 条或等满 FLUSH_INTERVAL 秒写一次，队列满时返回 503。
+    # 开启后 /interaction 在写入数据库之前就返回成功，默认关闭（同步写入）；
+    # 重试后仍失败的批次写入 DEAD_LETTER_PATH（为空则丢弃），条数见 /metrics
+    INTERACTION_WRITE_BEHIND = os.getenv("INTERACTION_WRITE_BEHIND", "false").lower() == "true"
+    INTERACTION_WRITER_BATCH_SIZE = int(os.getenv("INTERACTION_WRITER_BATCH_SIZE", "500"))
+    INTERACTION_WRITER_FLUSH_INTERVAL = float(os.getenv("INTERACTION_WRITER_FLUSH_INTERVAL", "0.2"))
+    INTERACTION_WRITER_QUEUE_SIZE = int(os.getenv("INTERACTION_WRITER_QUEUE_SIZE", "10000"))
+    INTERACTION_WRITER_DEAD_LETTER_PATH = os.getenv("INTERACTION_WRITER_DEAD_LETTER_PATH",
+                                                    "interaction_dead_letter.jsonl")
+
+    # 各阶段耗时、请求数等指标（/metrics 导出），关闭后阶段计时不再记录
+    METRICS_ENABLED = os.getenv("METRICS_ENABLED", "true").lower() == "true"
+    # 日志级别：每次推荐/交互的明细日志为 DEBUG，默认不输出
+    LOG_LEVEL = os.getenv("LOG_LEVEL", "INFO").upper()
+
+    # 模型产物：训练后保存到版本化目录，启动时加载最新的兼容版本（跳过训练），只保留最近 KEEP 个版本
+    MODEL_ARTIFACT_DIR = os.getenv("MODEL_ARTIFACT_DIR", "./model_artifacts")
+    MODEL_WARM_START = os.getenv("MODEL_WARM_START", "true").lower() == "true"
+    MODEL_ARTIFACT_KEEP = int(os.getenv("MODEL_ARTIFACT_KEEP", "3"))
+    # API 服务后台重新训练（独立进程训练，完成后热替换）：每 RETRAIN_INTERVAL 秒、
+    # 或每新增 RETRAIN_AFTER_INTERACTIONS 条交互触发一次（0 表示关闭），也可调用 POST /retrain 手动触发
+    RETRAIN_INTERVAL = float(os.getenv("RETRAIN_INTERVAL", "0"))
+    RETRAIN_AFTER_INTERACTIONS = int(os.getenv("RETRAIN_AFTER_INTERACTIONS", "0"))
+    RETRAIN_CHECK_INTERVAL = float(os.getenv("RETRAIN_CHECK_INTERVAL", "5"))
+    # 启动时没有可加载的模型产物：true 时先以未训练的模型开始服务、训练放到后台；false 时训练完成后才开始服务
+    BACKGROUND_INITIAL_TRAINING = os.getenv("BACKGROUND_INITIAL_TRAINING", "true").lower() == "true"
 
     # 模型参数
+    # 点击模型：random_forest（只能全量训练）或 sgd（在线逻辑回归，每新增 ONLINE_UPDATE_BATCH_SIZE 条交互增量更新一次）
+    CLICK_MODEL_TYPE = os.getenv("CLICK_MODEL_TYPE", "random_forest")
+    ONLINE_UPDATE_BATCH_SIZE = int(os.getenv("ONLINE_UPDATE_BATCH_SIZE", "256"))
+    ONLINE_SGD_ALPHA = float(os.getenv("ONLINE_SGD_ALPHA", "0.0001"))
     EMBEDDING_SIZE = 128
+    # 广告嵌入向量存储精度：float32，或 float16（内存再减半，但矩阵打分慢数倍）
+    EMBEDDING_DTYPE = os.getenv("EMBEDDING_DTYPE", "float32")
+    # 用户嵌入向量存储精度：只逐行读取作为检索 query，默认 float16
+    USER_EMBEDDING_DTYPE = os.getenv("USER_EMBEDDING_DTYPE", "float16")
+    # 广告嵌入向量索引：exact（精确暴力检索）或 ivf（近似检索）
+    EMBEDDING_INDEX_TYPE = os.getenv("EMBEDDING_INDEX_TYPE", "exact")
+    EMBEDDING_IVF_NPROBE = int(os.getenv("EMBEDDING_IVF_NPROBE", "8"))
+    EMBEDDING_IVF_MIN_TRAIN_SIZE = int(os.getenv("EMBEDDING_IVF_MIN_TRAIN_SIZE", "10000"))
     BATCH_SIZE = 32
     LEARNING_RATE = 0.001
 
+    # 交互行为类型（下标即行为编码）
+    INTERACTION_ACTIONS = ["click", "view", "purchase", "ignore"]
+    # 嵌入模型中每个用户保留的最近交互条数，以及过期时长（秒，0 表示不过期）
+    INTERACTION_HISTORY_DEPTH = int(os.getenv("INTERACTION_HISTORY_DEPTH", "50"))
+    INTERACTION_HISTORY_MAX_AGE_SECONDS = float(os.getenv("INTERACTION_HISTORY_MAX_AGE_SECONDS", "0"))
+
     # 推荐参数
     TOP_K_RECOMMENDATIONS = 10
     SIMILARITY_THRESHOLD = 0.7
+    # 批量打分：整库一次 predict_proba，关闭后回退到逐个广告打分
+    BATCH_SCORING_ENABLED = os.getenv("BATCH_SCORING_ENABLED", "true").lower() == "true"
+    # 多用户批量推荐时每块最多打分的 用户×广告 对数（控制内存峰值）
+    BATCH_SCORING_MAX_ROWS = int(os.getenv("BATCH_SCORING_MAX_ROWS", "200000"))
+
+    # 用户特征缓存容量（LRU 淘汰）
+    USER_FEATURE_CACHE_SIZE = int(os.getenv("USER_FEATURE_CACHE_SIZE", "100000"))
+
+    # 推荐结果缓存（按 user_id + top_k + 模型版本，LRU + TTL）
+    RESULT_CACHE_ENABLED = os.getenv("RESULT_CACHE_ENABLED", "true").lower() == "true"
+    RESULT_CACHE_SIZE = int(os.getenv("RESULT_CACHE_SIZE", "50000"))
+    RESULT_CACHE_TTL = float(os.getenv("RESULT_CACHE_TTL", "60"))
+
+    # 候选召回：广告数超过 RETRIEVAL_MAX_CANDIDATES 时，只对倒排索引召回的候选集打分。
+    # 召回率（python -m benchmarks.bench_retrieval）达标前默认关闭，开启前先用 /stats/retrieval 评估
+    RETRIEVAL_ENABLED = os.getenv("RETRIEVAL_ENABLED", "false").lower() == "true"
+    RETRIEVAL_MAX_CANDIDATES = int(os.getenv("RETRIEVAL_MAX_CANDIDATES", "2000"))
+    # 候选集中至少为热门广告保留的位置数（倒排命中不足时其余位置也用热门广告补足）
+    RETRIEVAL_POPULAR_FALLBACK = int(os.getenv("RETRIEVAL_POPULAR_FALLBACK", "200"))
+    RETRIEVAL_POPULAR_REFRESH_SECONDS = float(os.getenv("RETRIEVAL_POPULAR_REFRESH_SECONDS", "10"))
+
+    # 定向资格过滤：打分前按广告的目标年龄段和目标性别过滤
+    ELIGIBILITY_FILTER_ENABLED = os.getenv("ELIGIBILITY_FILTER_ENABLED", "true").lower() == "true"
 
     # 广告类别
     AD_CATEGORIES = [
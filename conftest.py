@@ -0,0 +1,41 @@
+"""测试共用的辅助函数（基准测试也从这里导入）：基于内存合成数据的推荐系统，以及批量/逐个打分路径的一致性校验"""
+
+import numpy as np
+from benchmarks.synthetic import generate_users, generate_ads, generate_interactions, quiet
+from main import PersonalizedAdRecommendation
+
+
+def build_system(n_ads: int, n_users: int = 50, n_interactions: int = 2000) -> PersonalizedAdRecommendation:
+    """构建一个基于内存合成数据、已训练好的推荐系统"""
+    with quiet():
+        system = PersonalizedAdRecommendation(None)
+        processor = system.data_processor
+        processor.user_profiles = generate_users(n_users)
+        processor.ad_inventory = generate_ads(n_ads)
+        processor.interaction_history = generate_interactions(
+            list(processor.user_profiles), list(processor.ad_inventory), n_interactions)
+        system.train_models()
+    return system
+
+
+# 批量路径读取 float32 存储的广告特征（单个特征相对误差不超过 2^-24 ≈ 6e-8），参照路径按 float64 计算；
+# 相似度在标准化后的特征上计算，除以较小的标准差会放大误差（2000 个广告时实测最大约 1.2e-6）。
+# 点击概率、相似度和综合得分都在 [0, 1] 内，按绝对误差 1e-5 判定一致
+SCORE_ATOL = 1e-5
+
+
+def check_equivalent(system: PersonalizedAdRecommendation, user_id: str, top_k: int):
+    """校验批量路径与逐个打分（float64 参照）路径的结果在 SCORE_ATOL 内一致
+
+    每个返回广告的分数与参照一致，且前 top_k 的综合得分序列与参照一致（得分差在误差内的广告允许交换顺序）。
+    """
+    with quiet():
+        batch = system._score_ads_batch(user_id, top_k)
+        reference = system._score_ads_per_ad(user_id, len(system.data_processor.ad_inventory))
+    by_ad = {r['ad_id']: r for r in reference}
+    assert len(batch) == min(top_k, len(reference)), "推荐数量不一致"
+    for key in ('click_probability', 'similarity', 'combined_score'):
+        assert np.allclose([r[key] for r in batch], [by_ad[r['ad_id']][key] for r in batch],
+                           rtol=0, atol=SCORE_ATOL), f"{key} 不一致"
+    assert np.allclose([r['combined_score'] for r in batch], [r['combined_score'] for r in reference[:top_k]],
+                       rtol=0, atol=SCORE_ATOL), "推荐顺序不一致"
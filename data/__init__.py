@@ -1 +1,5 @@
-from .feature_engineer import FeatureEngineer
\ No newline at end of file
+from .feature_engineer import FeatureEngineer
+from .ad_feature_store import AdFeatureStore
+from .candidate_index import CandidateIndex
+from .eligibility_index import EligibilityIndex
+from .interaction_log import InteractionLog
@@ -0,0 +1,119 @@
+import numpy as np
+from typing import Dict, List, Optional, Tuple
+
+
+class AdFeatureStore:
+    """广告特征存储：连续的 float32 特征矩阵 + ad_id→行号索引
+
+    行号一经分配保持不变（下线的广告只清除 active 标记，重新上线时复用原行），
+    候选索引等结构可以直接用行号引用广告。
+    """
+
+    def __init__(self, feature_dim: int = 8, initial_capacity: int = 1024):
+        self.feature_dim = feature_dim
+        self._matrix = np.zeros((initial_capacity, feature_dim), dtype=np.float32)
+        self._active = np.zeros(initial_capacity, dtype=bool)
+        self.ad_ids: List[str] = []  # 行号 -> ad_id
+        self.index: Dict[str, int] = {}  # ad_id -> 行号
+        self.version = 0  # 每次修改递增，供下游缓存判断是否失效
+        self._active_cache_version = -1
+        self._active_cache: Tuple[np.ndarray, np.ndarray] = (np.zeros(0, dtype=np.int64), self._matrix[:0])
+
+    @property
+    def size(self) -> int:
+        """已分配的行数（包含已下线的行）"""
+        return len(self.ad_ids)
+
+    @property
+    def matrix(self) -> np.ndarray:
+        """全部已分配行的特征矩阵视图"""
+        return self._matrix[:self.size]
+
+    def __len__(self) -> int:
+        return int(self._active[:self.size].sum())
+
+    def __contains__(self, ad_id: str) -> bool:
+        row = self.index.get(ad_id)
+        return row is not None and bool(self._active[row])
+
+    def _grow(self, min_capacity: int):
+        """按倍数扩容，摊销追加成本"""
+        capacity = max(min_capacity, 2 * len(self._matrix))
+        matrix = np.zeros((capacity, self.feature_dim), dtype=np.float32)
+        matrix[:self.size] = self._matrix[:self.size]
+        active = np.zeros(capacity, dtype=bool)
+        active[:self.size] = self._active[:self.size]
+        self._matrix, self._active = matrix, active
+
+    def build(self, ad_ids: List[str], features: np.ndarray):
+        """整体重建（全量加载时使用）"""
+        n = len(ad_ids)
+        self._matrix = np.zeros((max(n, 1), self.feature_dim), dtype=np.float32)
+        self._active = np.zeros(max(n, 1), dtype=bool)
+        if n:
+            self._matrix[:n] = features
+            self._active[:n] = True
+        self.ad_ids = list(ad_ids)
+        self.index = {ad_id: row for row, ad_id in enumerate(self.ad_ids)}
+        self.version += 1
+
+    def upsert(self, ad_id: str, features: np.ndarray) -> int:
+        """新增或原地更新一条广告特征，返回行号"""
+        row = self.index.get(ad_id)
+        if row is None:
+            row = self.size
+            if row >= len(self._matrix):
+                self._grow(row + 1)
+            self.ad_ids.append(ad_id)
+            self.index[ad_id] = row
+        self._matrix[row] = features
+        self._active[row] = True
+        self.version += 1
+        return row
+
+    def deactivate(self, ad_id: str) -> bool:
+        """下线广告（保留行号以便重新上线时复用）"""
+        row = self.index.get(ad_id)
+        if row is None or not self._active[row]:
+            return False
+        self._active[row] = False
+        self.version += 1
+        return True
+
+    def row_of(self, ad_id: str) -> Optional[int]:
+        """返回在线广告的行号，不存在或已下线时返回 None"""
+        row = self.index.get(ad_id)
+        if row is None or not self._active[row]:
+            return None
+        return row
+
+    def get(self, ad_id: str) -> Optional[np.ndarray]:
+        """返回单条广告特征（矩阵行视图）"""
+        row = self.row_of(ad_id)
+        return None if row is None else self._matrix[row]
+
+    def lookup(self, ad_ids: List[str]) -> np.ndarray:
+        """批量取特征，不存在或已下线的广告返回全零行"""
+        rows = np.array([self.index.get(ad_id, -1) for ad_id in ad_ids], dtype=np.int64)
+        found = rows >= 0
+        found[found] = self._active[rows[found]]
+        features = np.zeros((len(ad_ids), self.feature_dim), dtype=np.float32)
+        features[found] = self._matrix[rows[found]]
+        return features
+
+    def active_matrix(self) -> Tuple[np.ndarray, np.ndarray]:
+        """返回 (在线行号, 在线广告特征矩阵)
+
+        没有下线行时直接返回视图；否则按版本缓存压缩后的副本，避免每次请求重新分配。
+        """
+        if self._active_cache_version != self.version:
+            active = self._active[:self.size]
+            if active.all():
+                rows = np.arange(self.size)
+                matrix = self._matrix[:self.size]
+            else:
+                rows = np.flatnonzero(active)
+                matrix = self._matrix[rows]
+            self._active_cache = (rows, matrix)
+            self._active_cache_version = self.version
+        return self._active_cache
@@ -0,0 +1,115 @@
+import time
+import numpy as np
+from collections import defaultdict
+from typing import Dict, Iterable, List, Set
+from models.ranking import top_k_indices
+
+
+class CandidateIndex:
+    """候选召回索引：关键词/类别倒排索引 + 热门广告兜底
+
+    索引中的广告用 AdFeatureStore 的行号表示，下线的广告从倒排表中移除。
+    """
+
+    def __init__(self, popular_refresh_seconds: float = 10.0):
+        self.postings: Dict[str, Set[int]] = defaultdict(set)  # 词 -> 广告行号集合
+        self._row_tokens: Dict[int, List[str]] = {}  # 广告行号 -> 词列表（用于增量更新）
+        self._popularity = np.zeros(0, dtype=np.int64)
+        self._active = np.zeros(0, dtype=bool)
+        self.popular_refresh_seconds = popular_refresh_seconds
+        self._popular_rows = np.zeros(0, dtype=np.int64)
+        self._popular_k = 0
+        self._popular_refreshed_at = float("-inf")
+
+    @staticmethod
+    def ad_tokens(ad_info: dict) -> List[str]:
+        """广告的可检索词：关键词 + 类别"""
+        tokens = set(ad_info.get("keywords") or [])
+        if ad_info.get("category"):
+            tokens.add(ad_info["category"])
+        return sorted(tokens)
+
+    def _ensure_size(self, size: int):
+        if size > len(self._active):
+            capacity = max(size, 2 * len(self._active))
+            self._popularity = np.concatenate([self._popularity, np.zeros(capacity - len(self._popularity), dtype=np.int64)])
+            self._active = np.concatenate([self._active, np.zeros(capacity - len(self._active), dtype=bool)])
+
+    def build(self, rows_tokens: Iterable):
+        """全量重建倒排索引，rows_tokens 为 (行号, 词列表) 序列"""
+        self.postings = defaultdict(set)
+        self._row_tokens = {}
+        self._active[:] = False
+        for row, tokens in rows_tokens:
+            self.update(row, tokens)
+        self._popular_refreshed_at = float("-inf")
+
+    def update(self, row: int, tokens: List[str]):
+        """新增或更新单条广告的倒排项"""
+        self._ensure_size(row + 1)
+        self.remove(row)
+        for token in tokens:
+            self.postings[token].add(row)
+        self._row_tokens[row] = list(tokens)
+        self._active[row] = True
+
+    def remove(self, row: int):
+        """移除单条广告（下线）"""
+        for token in self._row_tokens.pop(row, ()):
+            posting = self.postings.get(token)
+            if posting is not None:
+                posting.discard(row)
+                if not posting:
+                    del self.postings[token]
+        if row < len(self._active):
+            self._active[row] = False
+
+    def set_popularity(self, counts: np.ndarray):
+        """设置各行广告的交互次数（全量加载后调用）"""
+        self._ensure_size(len(counts))
+        self._popularity[:] = 0
+        self._popularity[:len(counts)] = counts
+        self._popular_refreshed_at = float("-inf")
+
+    def record_interaction(self, row: int):
+        """累加单条广告的交互次数"""
+        self._ensure_size(row + 1)
+        self._popularity[row] += 1
+
+    def popular(self, k: int) -> np.ndarray:
+        """交互次数最多的 k 个在线广告行号（定期刷新，避免每次请求全量扫描）"""
+        now = time.monotonic()
+        if k > self._popular_k or now - self._popular_refreshed_at >= self.popular_refresh_seconds:
+            scores = np.where(self._active, self._popularity, -1)
+            rows = top_k_indices(scores, k)
+            self._popular_rows = rows[self._active[rows]]
+            self._popular_k = k
+            self._popular_refreshed_at = now
+        rows = self._popular_rows[:k]
+        return rows[self._active[rows]]
+
+    def match(self, tokens: Iterable[str], limit: int) -> np.ndarray:
+        """按命中词数从多到少返回最多 limit 个广告行号（命中数相同时行号小的优先）"""
+        postings = [self.postings[token] for token in set(tokens) if token in self.postings]
+        if not postings:
+            return np.zeros(0, dtype=np.int64)
+
+        rows = np.concatenate([np.fromiter(posting, dtype=np.int64, count=len(posting)) for posting in postings])
+        unique_rows, hit_counts = np.unique(rows, return_counts=True)
+        if len(unique_rows) <= limit:
+            return unique_rows
+
+        return unique_rows[top_k_indices(hit_counts, limit)]
+
+    def candidates(self, tokens: Iterable[str], limit: int, popular_fallback: int) -> np.ndarray:
+        """召回候选集：倒排命中 + 热门广告，总数不超过 limit，按行号升序返回
+
+        倒排命中最多占 limit - popular_fallback 个位置（至少为热门广告保留 popular_fallback 个），
+        剩余的位置全部按热门程度补足，兴趣词少或冷门的用户也能得到接近 limit 个候选。
+        """
+        matched = self.match(tokens, max(limit - popular_fallback, 0))
+        if len(matched) < limit:
+            popular = self.popular(limit)
+            popular = popular[~np.isin(popular, matched)][:limit - len(matched)]
+            matched = np.concatenate([matched, popular])
+        return np.sort(matched)
@@ -0,0 +1,74 @@
+import numpy as np
+from typing import Optional
+
+
+class EligibilityIndex:
+    """广告定向资格索引：按年龄分桶的位图 + 按目标性别的位图
+
+    每个年龄（0..max_age）一行位图，第 r 位表示 AdFeatureStore 第 r 行的广告是否覆盖该年龄；
+    另有 all / male / female 三个性别位图。位图按 np.packbits 的大端位序存储，
+    判断候选集中的 k 条广告只需 O(k) 的位运算，生成全量掩码只需扫描 N/8 字节。
+    """
+
+    GENDERS = ("all", "male", "female")
+
+    def __init__(self, max_age: int = 120, initial_capacity: int = 1024):
+        self.max_age = max_age
+        n_bytes = (initial_capacity + 7) // 8
+        self._age_bits = np.zeros((max_age + 1, n_bytes), dtype=np.uint8)
+        self._gender_bits = {gender: np.zeros(n_bytes, dtype=np.uint8) for gender in self.GENDERS}
+        self.size = 0
+
+    def _grow(self, min_rows: int):
+        n_bytes = max((min_rows + 7) // 8, 2 * self._age_bits.shape[1])
+        age_bits = np.zeros((self.max_age + 1, n_bytes), dtype=np.uint8)
+        age_bits[:, :self._age_bits.shape[1]] = self._age_bits
+        self._age_bits = age_bits
+        for gender, bits in self._gender_bits.items():
+            grown = np.zeros(n_bytes, dtype=np.uint8)
+            grown[:len(bits)] = bits
+            self._gender_bits[gender] = grown
+
+    def _clip_age(self, age) -> int:
+        return int(min(max(age, 0), self.max_age))
+
+    def update(self, row: int, target_age, target_gender: Optional[str]):
+        """设置单条广告的定向条件；target_age 缺失时视为不限年龄，target_gender 缺失时视为 all"""
+        if row >= self._age_bits.shape[1] * 8:
+            self._grow(row + 1)
+        self.size = max(self.size, row + 1)
+        self.remove(row)
+
+        byte, bit = row >> 3, np.uint8(0x80 >> (row & 7))
+        age_min, age_max = (list(target_age) + [None, None])[:2] if target_age else (None, None)
+        age_min = 0 if age_min is None else self._clip_age(age_min)
+        age_max = self.max_age if age_max is None else self._clip_age(age_max)
+        if age_min <= age_max:
+            self._age_bits[age_min:age_max + 1, byte] |= bit
+
+        gender = target_gender if target_gender in self.GENDERS else "all"
+        self._gender_bits[gender][byte] |= bit
+
+    def remove(self, row: int):
+        """清除单条广告的全部位（下线）"""
+        if row >= self._age_bits.shape[1] * 8:
+            return
+        byte, mask = row >> 3, np.uint8(~(0x80 >> (row & 7)) & 0xFF)
+        self._age_bits[:, byte] &= mask
+        for bits in self._gender_bits.values():
+            bits[byte] &= mask
+
+    def _user_bits(self, age, gender: Optional[str]) -> np.ndarray:
+        """用户可见广告的位图（年龄位图 AND 性别位图）"""
+        gender_bits = self._gender_bits["all"]
+        if gender in ("male", "female"):
+            gender_bits = gender_bits | self._gender_bits[gender]
+        if age is None:
+            return gender_bits
+        return self._age_bits[self._clip_age(age)] & gender_bits
+
+    def eligible_mask(self, rows: np.ndarray, age, gender: Optional[str]) -> np.ndarray:
+        """判断给定行号的广告对该用户是否可投放，返回布尔数组"""
+        rows = np.asarray(rows, dtype=np.int64)
+        bits = self._user_bits(age, gender)
+        return ((bits[rows >> 3] >> (7 - (rows & 7)).astype(np.uint8)) & 1).astype(bool)
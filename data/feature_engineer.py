@@ -1,18 +1,36 @@
 import numpy as np
 from sklearn.preprocessing import StandardScaler
 from sklearn.metrics.pairwise import cosine_similarity
+import tracing
+
+
+def _l2_normalize(features: np.ndarray) -> np.ndarray:
+    """按行做 L2 归一化，零向量保持为零（与 sklearn cosine_similarity 一致）"""
+    norms = np.linalg.norm(features, axis=-1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return features / norms
 
 
 class FeatureEngineer:
     def __init__(self):
         self.scaler = StandardScaler()
         self.is_fitted = False
+        # 预先标准化 + L2 归一化后的广告向量，按广告特征存储版本缓存
+        self._ad_unit_vectors = np.zeros((0, 0))
+        self._ad_vectors_key = None
 
     def fit(self, user_features: np.ndarray, ad_features: np.ndarray):
         """拟合特征标准化器"""
         all_features = np.vstack([user_features, ad_features])
         self.scaler.fit(all_features)
         self.is_fitted = True
+        self._ad_vectors_key = None
+
+    def use_scaler(self, scaler: StandardScaler):
+        """复用训练阶段已拟合的标准化器，保证线上与训练使用同一套缩放参数"""
+        self.scaler = scaler
+        self.is_fitted = True
+        self._ad_vectors_key = None
 
     def transform_user_features(self, user_features: np.ndarray) -> np.ndarray:
         """转换用户特征"""
@@ -41,4 +59,45 @@ class FeatureEngineer:
             ad_feature.reshape(1, -1)
         )[0][0]
 
-        return float(similarity)
\ No newline at end of file
+        return float(similarity)
+
+    def prepare_ad_vectors(self, ad_features: np.ndarray, version=None):
+        """标准化并 L2 归一化广告特征矩阵，之后相似度只需一次矩阵-向量乘法
+
+        Args:
+            ad_features: 广告特征矩阵 (n_ads, dim)
+            version: 广告特征存储的版本号，版本未变且标准化器未变时跳过重算
+        """
+        if version is not None and self._ad_vectors_key == version:
+            tracing.count("ad_vector_cache_hit")
+            return
+        tracing.count("ad_vector_cache_miss")
+        ad_features = np.asarray(ad_features, dtype=np.float64)
+        if self.is_fitted and len(ad_features) > 0:
+            ad_features = self.scaler.transform(ad_features)
+        self._ad_unit_vectors = _l2_normalize(ad_features)
+        self._ad_vectors_key = version
+
+    def _user_unit_vectors(self, user_features: np.ndarray) -> np.ndarray:
+        user_features = np.atleast_2d(np.asarray(user_features, dtype=np.float64))
+        if self.is_fitted:
+            user_features = self.scaler.transform(user_features)
+        return _l2_normalize(user_features)
+
+    def _ad_vectors(self, rows=None) -> np.ndarray:
+        # rows 为升序且不重复的行号，长度等于总行数时即为全部行，直接使用原矩阵避免复制
+        if rows is None or len(rows) == len(self._ad_unit_vectors):
+            return self._ad_unit_vectors
+        return self._ad_unit_vectors[rows]
+
+    def batch_similarity(self, user_feature: np.ndarray, rows=None) -> np.ndarray:
+        """一个用户对 prepare_ad_vectors 中广告的相似度 (n_ads,)
+
+        Args:
+            rows: 只计算这些行的广告，None 表示全部
+        """
+        return self._ad_vectors(rows) @ self._user_unit_vectors(user_feature)[0]
+
+    def batch_similarity_matrix(self, user_features: np.ndarray, rows=None) -> np.ndarray:
+        """多个用户对 prepare_ad_vectors 中广告的相似度矩阵 (n_users, n_ads)"""
+        return self._user_unit_vectors(user_features) @ self._ad_vectors(rows).T
@@ -0,0 +1,178 @@
+import numpy as np
+from datetime import datetime, timedelta
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Tuple
+
+# 缺失时间戳的占位值
+TIMESTAMP_MISSING = np.iinfo(np.int64).min
+_EPOCH = datetime(1970, 1, 1)
+
+
+class Vocabulary:
+    """字符串 <-> 整数编码的双向映射；frozen 为 True 时不再接受新值（encode 未知值抛出 ValueError）"""
+
+    def __init__(self, values: Iterable[str] = (), frozen: bool = False):
+        self.values: List[str] = []
+        self.codes: Dict[str, int] = {}
+        self.frozen = False
+        for value in values:
+            self.encode(value)
+        self.frozen = frozen
+
+    def __len__(self) -> int:
+        return len(self.values)
+
+    def encode(self, value: str) -> int:
+        code = self.codes.get(value)
+        if code is None:
+            if self.frozen:
+                raise ValueError(f"未知的取值: {value}")
+            code = len(self.values)
+            self.codes[value] = code
+            self.values.append(value)
+        return code
+
+
+class InteractionLog:
+    """列式交互日志：用户/广告/行为用整数编码，时间戳为 int64 微秒，存放在可增长的 NumPy 数组中
+
+    追加为摊销 O(1)（容量按倍数增长）；遍历时按需生成与原来列表元素相同结构的只读字典，
+    训练和统计应优先使用 columns() 与 count_by_user / count_by_ad 等向量化接口。
+    """
+
+    def __init__(self, actions: Iterable[str] = (), initial_capacity: int = 1024):
+        self.users = Vocabulary()
+        self.ads = Vocabulary()
+        # 给定行为列表时行为编码固定（int8 存储），未知行为由调用方在追加前过滤
+        self.actions = Vocabulary(actions, frozen=bool(actions))
+        self._size = 0
+        self._user_codes = np.zeros(initial_capacity, dtype=np.int32)
+        self._ad_codes = np.zeros(initial_capacity, dtype=np.int32)
+        self._action_codes = np.zeros(initial_capacity, dtype=np.int8)
+        self._timestamps = np.zeros(initial_capacity, dtype=np.int64)
+
+    def __len__(self) -> int:
+        return self._size
+
+    @property
+    def nbytes(self) -> int:
+        return sum(a.nbytes for a in (self._user_codes, self._ad_codes, self._action_codes, self._timestamps))
+
+    def _reserve(self, size: int):
+        capacity = len(self._user_codes)
+        if size <= capacity:
+            return
+        capacity = max(size, 2 * capacity)
+
+        def grown(array):
+            result = np.zeros(capacity, dtype=array.dtype)
+            result[:self._size] = array[:self._size]
+            return result
+
+        self._user_codes = grown(self._user_codes)
+        self._ad_codes = grown(self._ad_codes)
+        self._action_codes = grown(self._action_codes)
+        self._timestamps = grown(self._timestamps)
+
+    @staticmethod
+    def to_timestamp_us(timestamp) -> int:
+        """把 datetime / ISO 字符串 / None 转为 int64 微秒"""
+        if timestamp is None:
+            return TIMESTAMP_MISSING
+        if isinstance(timestamp, str):
+            timestamp = timestamp.replace(" ", "T")
+        return int(np.datetime64(timestamp, "us").astype(np.int64))
+
+    @staticmethod
+    def to_isoformat(timestamp_us: int) -> Optional[str]:
+        if timestamp_us == TIMESTAMP_MISSING:
+            return None
+        return (_EPOCH + timedelta(microseconds=int(timestamp_us))).isoformat()
+
+    def append(self, user_id: str, ad_id: str, action: str, timestamp=None):
+        """追加一条交互"""
+        self._reserve(self._size + 1)
+        i = self._size
+        self._user_codes[i] = self.users.encode(user_id)
+        self._ad_codes[i] = self.ads.encode(ad_id)
+        self._action_codes[i] = self.actions.encode(action)
+        self._timestamps[i] = self.to_timestamp_us(timestamp)
+        self._size += 1
+
+    def extend(self, interactions: Iterable[Dict[str, Any]]):
+        """批量追加（兼容原来 list.extend 的字典格式）"""
+        self.extend_rows([(i["user_id"], i["ad_id"], i["action"], i.get("timestamp")) for i in interactions])
+
+    def extend_rows(self, rows: Iterable[Tuple[str, str, str, Any]]):
+        """批量追加 (user_id, ad_id, action, timestamp) 元组，编码和时间戳解析按列批量完成"""
+        rows = list(rows)
+        n = len(rows)
+        self._reserve(self._size + n)
+        end = self._size + n
+        users, ads, actions = self.users.encode, self.ads.encode, self.actions.encode
+        self._user_codes[self._size:end] = [users(row[0]) for row in rows]
+        self._ad_codes[self._size:end] = [ads(row[1]) for row in rows]
+        self._action_codes[self._size:end] = [actions(row[2]) for row in rows]
+        # NaT 的整数表示正好是 TIMESTAMP_MISSING
+        self._timestamps[self._size:end] = np.array(
+            [row[3] for row in rows], dtype="datetime64[us]").astype(np.int64)
+        self._size = end
+
+    def clear(self):
+        self._size = 0
+
+    # ---- 只读兼容层 ----
+    def _record(self, i: int) -> Dict[str, Any]:
+        return {
+            "user_id": self.users.values[self._user_codes[i]],
+            "ad_id": self.ads.values[self._ad_codes[i]],
+            "action": self.actions.values[self._action_codes[i]],
+            "timestamp": self.to_isoformat(self._timestamps[i])
+        }
+
+    def __getitem__(self, i: int) -> Dict[str, Any]:
+        if i < 0:
+            i += self._size
+        if not 0 <= i < self._size:
+            raise IndexError(i)
+        return self._record(i)
+
+    def __iter__(self) -> Iterator[Dict[str, Any]]:
+        for i in range(self._size):
+            yield self._record(i)
+
+    def iter_tuples(self, start: int = 0) -> Iterator[Tuple[str, str, str, Optional[int]]]:
+        """按顺序遍历 (user_id, ad_id, action, 时间戳微秒)，比逐条生成字典更轻量；没有时间戳的记录为 None"""
+        users, ads, actions = self.users.values, self.ads.values, self.actions.values
+        for user_code, ad_code, action_code, timestamp_us in zip(self._user_codes[start:self._size].tolist(),
+                                                                 self._ad_codes[start:self._size].tolist(),
+                                                                 self._action_codes[start:self._size].tolist(),
+                                                                 self._timestamps[start:self._size].tolist()):
+            yield (users[user_code], ads[ad_code], actions[action_code],
+                   None if timestamp_us == TIMESTAMP_MISSING else timestamp_us)
+
+    # ---- 向量化接口 ----
+    def columns(self) -> Tuple[np.ndarray, np.ndarray, np.ndarray, np.ndarray]:
+        """返回 (用户编码, 广告编码, 行为编码, 时间戳微秒) 四列的只读视图"""
+        views = (self._user_codes[:self._size], self._ad_codes[:self._size],
+                 self._action_codes[:self._size], self._timestamps[:self._size])
+        for view in views:
+            view.flags.writeable = False
+        return views
+
+    def _action_mask(self, action: Optional[str]) -> Optional[np.ndarray]:
+        if action is None:
+            return None
+        code = self.actions.codes.get(action, -1)
+        return self._action_codes[:self._size] == code
+
+    def count_by_user(self, action: Optional[str] = None) -> np.ndarray:
+        """每个用户的交互次数，下标为用户编码（users.values 中的顺序）"""
+        codes = self._user_codes[:self._size]
+        mask = self._action_mask(action)
+        return np.bincount(codes if mask is None else codes[mask], minlength=len(self.users))
+
+    def count_by_ad(self, action: Optional[str] = None) -> np.ndarray:
+        """每条广告的交互次数，下标为广告编码（ads.values 中的顺序）"""
+        codes = self._ad_codes[:self._size]
+        mask = self._action_mask(action)
+        return np.bincount(codes if mask is None else codes[mask], minlength=len(self.ads))
@@ -0,0 +1,69 @@
+import numpy as np
+from data.candidate_index import CandidateIndex
+
+
+def build_index():
+    index = CandidateIndex(popular_refresh_seconds=0)
+    index.build([(0, ["sports", "technology"]), (1, ["sports"]), (2, ["food"]), (3, ["technology"])])
+    index.set_popularity(np.array([5, 1, 9, 3]))
+    return index
+
+
+def test_match_orders_by_hit_count():
+    index = build_index()
+    assert index.match(["sports", "technology"], 1).tolist() == [0]
+    assert index.match(["sports", "technology"], 10).tolist() == [0, 1, 3]
+
+
+def test_remove_drops_postings_and_popularity():
+    index = build_index()
+    index.remove(0)
+    assert index.match(["sports", "technology"], 10).tolist() == [1, 3]
+    assert 0 not in index.popular(4).tolist()
+
+    # 只出现在被移除广告中的词整体删除
+    index.remove(2)
+    assert "food" not in index.postings
+    assert len(index.match(["food"], 10)) == 0
+    assert index.popular(4).tolist() == [3, 1]
+
+
+def test_remove_unknown_row_is_noop():
+    index = build_index()
+    index.remove(100)
+    assert index.match(["sports"], 10).tolist() == [0, 1]
+
+
+def test_update_replaces_tokens():
+    index = build_index()
+    index.update(1, ["food"])
+    assert index.match(["sports"], 10).tolist() == [0]
+    assert index.match(["food"], 10).tolist() == [1, 2]
+
+
+def test_candidates_fall_back_to_active_popular_ads():
+    index = build_index()
+    index.remove(2)
+    assert index.candidates(["sports"], limit=3, popular_fallback=3).tolist() == [0, 1, 3]
+    assert index.candidates(["unknown"], limit=2, popular_fallback=2).tolist() == [0, 3]
+
+
+def test_candidates_fill_up_to_limit_with_popular_ads():
+    index = CandidateIndex(popular_refresh_seconds=0)
+    index.build([(row, ["rare"] if row == 7 else ["common"]) for row in range(50)])
+    index.set_popularity(np.arange(50))
+    # 命中只有 1 个时，其余位置按热门程度补足到 limit，而不只是 popular_fallback 个
+    candidates = index.candidates(["rare"], limit=20, popular_fallback=5)
+    assert len(candidates) == 20
+    assert 7 in candidates.tolist()
+    assert set(candidates.tolist()) - {7} == set(range(31, 50))
+
+
+def test_candidates_reserve_popular_slots():
+    index = CandidateIndex(popular_refresh_seconds=0)
+    index.build([(row, ["common"]) for row in range(50)])
+    index.set_popularity(np.arange(50))
+    # 倒排命中可以填满 limit 时，仍为热门广告保留 popular_fallback 个位置
+    candidates = index.candidates(["common"], limit=10, popular_fallback=4)
+    assert candidates.tolist() == list(range(6)) + [46, 47, 48, 49]
+    assert index.candidates(["common"], limit=10, popular_fallback=0).tolist() == list(range(10))
@@ -0,0 +1,84 @@
+import numpy as np
+import pytest
+from data.eligibility_index import EligibilityIndex
+from data_processor import DataProcessor
+
+
+def expected_eligible(ad, age, gender):
+    """逐条判断的参考实现"""
+    age_min, age_max = ad.get("target_age") or (None, None)
+    if age is not None and ((age_min is not None and age < age_min) or (age_max is not None and age > age_max)):
+        return False
+    target_gender = ad.get("target_gender") or "all"
+    return target_gender == "all" or target_gender == gender
+
+
+ADS = [
+    {"target_age": [18, 30], "target_gender": "all"},
+    {"target_age": [25, 60], "target_gender": "male"},
+    {"target_age": None, "target_gender": "female"},
+    {"target_age": [40, 200], "target_gender": None},
+]
+
+
+@pytest.mark.parametrize("age", [None, 10, 18, 25, 30, 45, 130])
+@pytest.mark.parametrize("gender", [None, "male", "female"])
+def test_mask_matches_reference(age, gender):
+    index = EligibilityIndex(initial_capacity=8)
+    for row, ad in enumerate(ADS):
+        index.update(row, ad["target_age"], ad["target_gender"])
+    expected = [expected_eligible(ad, age, gender) for ad in ADS]
+    assert index.eligible_mask(np.arange(len(ADS)), age, gender).tolist() == expected
+
+
+def test_update_clears_previous_targeting():
+    index = EligibilityIndex(initial_capacity=8)
+    index.update(3, [18, 30], "male")
+    index.update(3, [50, 60], "female")
+    assert index.eligible_mask([3], 20, "male").tolist() == [False]
+    assert index.eligible_mask([3], 55, "female").tolist() == [True]
+
+
+def test_remove_clears_all_bits():
+    index = EligibilityIndex(initial_capacity=8)
+    index.update(0, None, "all")
+    index.update(1, None, "all")
+    index.remove(0)
+    assert index.eligible_mask([0, 1], None, None).tolist() == [False, True]
+    index.remove(100)  # 超出容量的行号直接忽略
+
+
+def test_grows_past_initial_capacity():
+    index = EligibilityIndex(initial_capacity=8)
+    index.update(2, [20, 30], "all")
+    index.update(1000, [20, 30], "all")
+    assert index.size == 1001
+    assert index.eligible_mask([2, 1000, 999], 25, None).tolist() == [True, True, False]
+
+
+def test_processor_upsert_and_deactivate_update_bitmap():
+    processor = DataProcessor()
+    processor.user_profiles = {"young": {"age": 20, "gender": "male"}, "old": {"age": 50, "gender": "female"}}
+    processor.ad_inventory = {
+        "ad_a": {"category": "sports", "keywords": ["sports"], "target_age": [18, 30], "target_gender": "all",
+                 "bid_price": 1.0},
+        "ad_b": {"category": "food", "keywords": ["food"], "target_age": [18, 60], "target_gender": "female",
+                 "bid_price": 1.0},
+    }
+    row_a, row_b = processor.ad_features.row_of("ad_a"), processor.ad_features.row_of("ad_b")
+    rows = np.array([row_a, row_b])
+    assert processor.filter_eligible("young", rows).tolist() == [row_a]
+    assert processor.filter_eligible("old", rows).tolist() == [row_b]
+
+    # 修改定向条件：覆盖原来的位
+    processor.upsert_ad("ad_a", {**processor.ad_inventory["ad_a"], "target_age": [40, 60]})
+    assert processor.filter_eligible("young", rows).tolist() == []
+    assert processor.filter_eligible("old", rows).tolist() == [row_a, row_b]
+
+    processor.deactivate_ad("ad_b")
+    assert processor.filter_eligible("old", rows).tolist() == [row_a]
+
+    processor.upsert_ad("ad_c", {"category": "travel", "keywords": [], "target_age": [18, 25],
+                                 "target_gender": "male", "bid_price": 1.0})
+    row_c = processor.ad_features.row_of("ad_c")
+    assert processor.filter_eligible("young", np.array([row_a, row_b, row_c])).tolist() == [row_c]
@@ -0,0 +1,69 @@
+from collections import Counter
+from datetime import datetime
+import numpy as np
+import pytest
+from data.interaction_log import InteractionLog
+
+ACTIONS = ["click", "view", "purchase", "ignore"]
+
+
+def sample_interactions(n):
+    return [{
+        "user_id": f"user_{i % 3}",
+        "ad_id": f"ad_{i % 5}",
+        "action": ACTIONS[i % 4],
+        "timestamp": f"2024-01-01T00:00:{i % 60:02d}" if i % 7 else None
+    } for i in range(n)]
+
+
+def test_matches_list_of_dicts_across_growth():
+    interactions = sample_interactions(50)
+    log = InteractionLog(ACTIONS, initial_capacity=4)
+    for record in interactions[:20]:
+        log.append(**record)
+    log.extend(interactions[20:])
+    assert len(log) == 50
+    assert list(log) == interactions
+    assert log[-1] == interactions[-1]
+
+
+def test_extend_rows_matches_append():
+    rows = [("u1", "a1", "click", datetime(2024, 1, 1, 12, 30)), ("u2", "a1", "view", None),
+            ("u1", "a2", "purchase", "2024-01-02 08:00:00")]
+    appended, extended = InteractionLog(ACTIONS), InteractionLog(ACTIONS)
+    for row in rows:
+        appended.append(*row)
+    extended.extend_rows(rows)
+    assert list(appended) == list(extended)
+    for a, b in zip(appended.columns(), extended.columns()):
+        assert np.array_equal(a, b)
+
+
+def test_iter_tuples_from_offset():
+    interactions = sample_interactions(10)
+    log = InteractionLog(ACTIONS)
+    log.extend(interactions)
+    expected = [(i["user_id"], i["ad_id"], i["action"],
+                 i["timestamp"] and InteractionLog.to_timestamp_us(i["timestamp"])) for i in interactions[6:]]
+    assert list(log.iter_tuples(6)) == expected
+    assert expected[1][3] is None
+    assert list(log.iter_tuples(10)) == []
+
+
+def test_counts_match_counter():
+    interactions = sample_interactions(40)
+    log = InteractionLog(ACTIONS)
+    log.extend(interactions)
+    clicks = Counter(i["ad_id"] for i in interactions if i["action"] == "click")
+    assert dict(zip(log.ads.values, log.count_by_ad("click").tolist())) == {
+        ad_id: clicks.get(ad_id, 0) for ad_id in log.ads.values}
+    users = Counter(i["user_id"] for i in interactions)
+    assert dict(zip(log.users.values, log.count_by_user().tolist())) == users
+    assert log.count_by_ad("unknown").sum() == 0
+
+
+def test_action_vocabulary_is_fixed():
+    log = InteractionLog(ACTIONS)
+    with pytest.raises(ValueError):
+        log.append("u1", "a1", "share")
+    assert len(log) == 0 and log.actions.values == ACTIONS
@@ -1,76 +1,497 @@
 import pandas as pd
 import numpy as np
-from typing import Dict, List, Any, Optional
+from typing import Dict, Iterable, List, Any, Optional
+import functools
 import json
+import os
+import threading
+import time
+import uuid
+from datetime import datetime, timedelta
+from sqlalchemy import func, select
+from contextlib import contextmanager
 from sqlalchemy.orm import Session
 from database.models import User, Advertisement, UserInteraction
+from database.database import session_scope
+from data.ad_feature_store import AdFeatureStore
+from data.candidate_index import CandidateIndex
+from data.eligibility_index import EligibilityIndex
+from data.interaction_log import InteractionLog
+from cache import LRUCache
+from config import Config
+from metrics import stage_timer, timed_stage
+import tracing
+import logging
+
+logger = logging.getLogger(__name__)
+
+
+def _notifying(method):
+    """包装原地修改的方法：调用后通知所属用户画像已变更"""
+    @functools.wraps(method)
+    def wrapper(self, *args, **kwargs):
+        result = method(self, *args, **kwargs)
+        self._notify()
+        return result
+    return wrapper
+
+
+class _TrackedList(list):
+    """用户画像中的列表字段（如 interests）：append 等原地修改时通知所属用户画像"""
+    __slots__ = ("_notify",)
+
+    def __init__(self, values, notify):
+        super().__init__(values)
+        self._notify = notify
+
+    def __reduce__(self):
+        return list, (list(self),)
+
+
+for _name in ("__setitem__", "__delitem__", "__iadd__", "__imul__", "append", "extend", "insert", "remove",
+              "pop", "clear", "sort", "reverse"):
+    setattr(_TrackedList, _name, _notifying(getattr(list, _name)))
+
+
+class _TrackedProfile(dict):
+    """单个用户画像：字段被原地修改（profiles[uid]["age"] = 40、profiles[uid]["interests"].append(...)）时通知回调
+
+    复制、序列化时还原为普通 dict / list。
+    """
+    __slots__ = ("_notify",)
+
+    def __init__(self, profile, notify):
+        super().__init__()
+        self._notify = notify
+        for field, value in profile.items():
+            super().__setitem__(field, self._track(value))
+
+    def _track(self, value):
+        return _TrackedList(value, self._notify) if isinstance(value, list) else value
+
+    def __reduce__(self):
+        return dict, ({field: list(value) if isinstance(value, list) else value for field, value in self.items()},)
+
+    @_notifying
+    def __setitem__(self, field, value):
+        super().__setitem__(field, self._track(value))
+
+    def setdefault(self, field, value=None):
+        if field not in self:
+            self[field] = value
+        return self[field]
+
+    def update(self, *args, **kwargs):
+        for field, value in dict(*args, **kwargs).items():
+            super().__setitem__(field, self._track(value))
+        self._notify()
+
+    def __ior__(self, other):
+        self.update(other)
+        return self
+
+
+for _name in ("__delitem__", "pop", "popitem", "clear"):
+    setattr(_TrackedProfile, _name, _notifying(getattr(dict, _name)))
+
+
+class UserProfileDict(dict):
+    """用户画像字典：条目被新增、替换、删除或原地修改字段时通知回调，用于失效用户特征缓存
+
+    写入的画像会被复制为可追踪的字典（列表字段同样可追踪），之后修改调用方原来的字典不会影响这里保存的画像。
+    """
+
+    def __init__(self, profiles=None, on_change=None):
+        super().__init__()
+        self._on_change = on_change
+        for user_id, profile in (profiles or {}).items():
+            super().__setitem__(user_id, self._track(user_id, profile))
+
+    def _track(self, user_id, profile):
+        if isinstance(profile, dict):
+            return _TrackedProfile(profile, functools.partial(self._changed, user_id))
+        return profile
+
+    def _changed(self, user_id):
+        if self._on_change:
+            self._on_change(user_id)
+
+    def __setitem__(self, user_id, profile):
+        super().__setitem__(user_id, self._track(user_id, profile))
+        self._changed(user_id)
+
+    def __delitem__(self, user_id):
+        super().__delitem__(user_id)
+        self._changed(user_id)
+
+    def pop(self, user_id, *default):
+        result = super().pop(user_id, *default)
+        self._changed(user_id)
+        return result
+
+    def setdefault(self, user_id, profile=None):
+        if user_id not in self:
+            self[user_id] = profile
+        return self[user_id]
+
+    def update(self, *args, **kwargs):
+        for user_id, profile in dict(*args, **kwargs).items():
+            self[user_id] = profile
+
+    def popitem(self):
+        user_id, profile = super().popitem()
+        self._changed(user_id)
+        return user_id, profile
+
+    def clear(self):
+        user_ids = list(self.keys())
+        super().clear()
+        for user_id in user_ids:
+            self._changed(user_id)
 
 
 class DataProcessor:
-    def __init__(self, db_session: Optional[Session] = None):
+    # 增量同步按 updated_at 拉取时向前重叠的时间窗口
+    WATERMARK_OVERLAP = timedelta(seconds=1)
+
+    def __init__(self, db_session: Optional[Session] = None, session_factory=None):
         """初始化数据处理器
 
         Args:
-            db_session: 数据库会话，如果为None则使用内存数据
+            db_session: 共享的数据库会话（单线程脚本使用）
+            session_factory: 会话工厂（如 SessionLocal），设置后每个工作单元使用独立的会话；
+                两者都为None时使用内存数据
         """
         self.db_session = db_session
+        self.session_factory = session_factory
+        self.feature_dim = 8
+        self.ad_features = AdFeatureStore(self.feature_dim)
+        self.candidate_index = CandidateIndex(Config.RETRIEVAL_POPULAR_REFRESH_SECONDS)
+        self.eligibility_index = EligibilityIndex()
+        self.user_feature_cache = LRUCache(max_size=Config.USER_FEATURE_CACHE_SIZE)
+        self._profile_listeners = []
+        self._interaction_history = InteractionLog(Config.INTERACTION_ACTIONS)
+        # 交互日志与广告热度的追加可能同时来自请求线程和增量同步线程
+        self.interaction_lock = threading.Lock()
+        # 本进程写入的交互记录带上该标记，增量同步时跳过（内存中已经记录过）
+        self.writer_id = f"{os.getpid()}-{uuid.uuid4().hex[:12]}"
+        # 设置后交互记录改为异步批量写入（见 database.interaction_writer.InteractionWriter）
+        self.interaction_writer = None
+        # 增量同步的高水位：用户/广告按 updated_at，交互记录按自增 id
+        self.watermarks = {"users": None, "ads": None, "interactions": 0}
+        # 高水位以下 DELTA_SYNC_INTERACTION_ID_OVERLAP 个 id 内已读到的交互记录 id（重叠窗口去重用）
+        self._recent_interaction_ids = set()
+        # 从数据库读到、因行为未知而跳过的交互记录数
+        self.unknown_action_interactions = 0
+        # 数据库不可用、改用示例数据时为 True（此时模型产物与后台训练都无从对应数据库数据）
+        self.using_sample_data = False
         self.user_profiles = {}
         self.ad_inventory = {}
-        self.interaction_history = []
-        self.feature_dim = 8
 
-    def load_data_from_db(self):
-        """从数据库加载数据"""
-        if not self.db_session:
+    @property
+    def user_profiles(self) -> Dict[str, Dict[str, Any]]:
+        return self._user_profiles
+
+    @user_profiles.setter
+    def user_profiles(self, profiles: Dict[str, Dict[str, Any]]):
+        """整体替换用户画像时清空用户特征缓存"""
+        self._user_profiles = UserProfileDict(profiles, on_change=self._on_profile_change)
+        self.user_feature_cache.clear()
+        for listener in self._profile_listeners:
+            listener(None)
+
+    def add_profile_listener(self, listener):
+        """注册用户画像变更回调，参数为 user_id（整体替换时为 None）"""
+        self._profile_listeners.append(listener)
+
+    def _on_profile_change(self, user_id: str):
+        self.user_feature_cache.invalidate(user_id)
+        for listener in self._profile_listeners:
+            listener(user_id)
+
+    @property
+    def interaction_history(self) -> InteractionLog:
+        return self._interaction_history
+
+    @interaction_history.setter
+    def interaction_history(self, interactions):
+        """整体替换交互历史（InteractionLog 或字典列表）时重新统计广告热度"""
+        if not isinstance(interactions, InteractionLog):
+            log = InteractionLog(Config.INTERACTION_ACTIONS)
+            log.extend(interactions)
+            interactions = log
+        self._interaction_history = interactions
+        self.refresh_ad_popularity()
+
+    @property
+    def ad_inventory(self) -> Dict[str, Dict[str, Any]]:
+        return self._ad_inventory
+
+    @ad_inventory.setter
+    def ad_inventory(self, inventory: Dict[str, Dict[str, Any]]):
+        """整体替换广告库时同步重建广告特征存储；单条变更请使用 upsert_ad / deactivate_ad"""
+        self._ad_inventory = inventory
+        self.rebuild_ad_feature_store()
+
+    @property
+    def has_database(self) -> bool:
+        return self.session_factory is not None or self.db_session is not None
+
+    @property
+    def serves_database_data(self) -> bool:
+        """内存数据来自数据库（而不是数据库不可用时的示例数据）"""
+        return self.has_database and not self.using_sample_data
+
+    @contextmanager
+    def session_scope(self):
+        """一个工作单元使用的数据库会话，正常结束时提交，出现异常时回滚
+
+        配置了 session_factory 时每次新建会话并在结束后关闭（连接归还连接池）；
+        否则复用共享会话，结束时同样提交/回滚，使下一个工作单元能读到其他写入方的最新数据。
+        """
+        if self.session_factory is not None:
+            with session_scope(self.session_factory) as session:
+                yield session
+            return
+
+        try:
+            yield self.db_session
+            with stage_timer("db_commit"):
+                self.db_session.commit()
+        except Exception:
+            self.db_session.rollback()
+            raise
+
+    @timed_stage("data_load")
+    def load_data_from_db(self, chunk_size: Optional[int] = None):
+        """从数据库流式加载数据
+
+        只查询需要的列，按 chunk_size 行分块读取（yield_per，MySQL 上为服务端游标），
+        边读边写入内存结构，不再一次性物化全部 ORM 对象。
+        """
+        if not self.has_database:
             print("⚠️ 未提供数据库会话，使用示例数据")
             self.load_sample_data()
             return
 
+        chunk_size = chunk_size or Config.DB_LOAD_CHUNK_SIZE
         try:
             print("📥 从数据库加载数据...")
 
-            # 加载用户数据
-            users = self.db_session.query(User).all()
-            for user in users:
-                self.user_profiles[user.user_id] = {
-                    "age": user.age,
-                    "gender": user.gender,
-                    "interests": user.interests or [],
-                    "location": user.location,
-                    "device": user.device
-                }
-
-            # 加载广告数据
-            ads = self.db_session.query(Advertisement).filter(Advertisement.is_active == True).all()
-            for ad in ads:
-                self.ad_inventory[ad.ad_id] = {
-                    "title": ad.title,
-                    "category": ad.category,
-                    "keywords": ad.keywords or [],
-                    "target_age": [ad.target_age_min, ad.target_age_max],
-                    "target_gender": ad.target_gender,
-                    "bid_price": ad.bid_price
-                }
-
-            # 加载交互数据
-            interactions = self.db_session.query(UserInteraction).all()
-            for interaction in interactions:
-                self.interaction_history.append({
-                    "user_id": interaction.user_id,
-                    "ad_id": interaction.ad_id,
-                    "action": interaction.action,
-                    "timestamp": interaction.timestamp.isoformat() if interaction.timestamp else None
-                })
-
-            print(f"✅ 从数据库加载: {len(users)} 用户, {len(ads)} 广告, {len(interactions)} 交互记录")
+            with self.session_scope() as session:
+                # 加载用户数据
+                profiles = dict(self._user_profiles)
+                n_users = 0
+                for chunk in self._stream_rows(session, self._user_query(), "用户", chunk_size):
+                    for row in chunk:
+                        profiles[row.user_id] = self._profile_from_row(row)
+                        self._advance_watermark("users", row.updated_at)
+                    n_users += len(chunk)
+                self.user_profiles = profiles
+
+                # 加载广告数据
+                inventory = dict(self._ad_inventory)
+                n_ads = 0
+                for chunk in self._stream_rows(
+                        session, self._ad_query().where(Advertisement.is_active == True), "广告", chunk_size):
+                    for row in chunk:
+                        inventory[row.ad_id] = self._ad_from_row(row)
+                        self._advance_watermark("ads", row.updated_at)
+                    n_ads += len(chunk)
+
+                # 加载交互数据（按块整列写入交互日志）
+                interaction_query = select(UserInteraction.user_id, UserInteraction.ad_id, UserInteraction.action,
+                                           UserInteraction.timestamp, UserInteraction.id).order_by(UserInteraction.id)
+                n_interactions = n_unknown = 0
+                for chunk in self._stream_rows(session, interaction_query, "交互记录", chunk_size):
+                    rows = [row for row in chunk if row.action in self._interaction_history.actions.codes]
+                    self._interaction_history.extend_rows(rows)
+                    self._mark_interactions_seen(row.id for row in chunk)
+                    n_interactions += len(rows)
+                    n_unknown += len(chunk) - len(rows)
+                self._count_unknown_actions(n_unknown)
+
+            # 整体替换广告库会重建特征矩阵、索引和广告热度
+            self.ad_inventory = inventory
+
+            self.using_sample_data = False
+            print(f"✅ 从数据库加载: {n_users} 用户, {n_ads} 广告, {n_interactions} 交互记录")
 
         except Exception as e:
             print(f"❌ 数据库加载失败: {e}，使用示例数据")
             self.load_sample_data()
 
+    @staticmethod
+    def _stream_rows(session: Session, query, label: str, chunk_size: int, report: bool = True):
+        """分块执行查询，逐块产出行元组，并定期打印进度和吞吐"""
+        start = time.perf_counter()
+        loaded = 0
+        next_report = Config.DB_LOAD_PROGRESS_EVERY
+        result = session.execute(query.execution_options(yield_per=chunk_size))
+        for chunk in result.partitions():
+            yield chunk
+            loaded += len(chunk)
+            if report and loaded >= next_report:
+                elapsed = time.perf_counter() - start
+                print(f"   ⏳ {label}: 已加载 {loaded} 行 ({loaded / max(elapsed, 1e-9):.0f} 行/秒)")
+                next_report += Config.DB_LOAD_PROGRESS_EVERY
+        if report:
+            elapsed = time.perf_counter() - start
+            print(f"   📦 {label}: {loaded} 行, 耗时 {elapsed:.2f} 秒 ({loaded / max(elapsed, 1e-9):.0f} 行/秒)")
+
+    @staticmethod
+    def _user_query():
+        return select(User.user_id, User.age, User.gender, User.interests, User.location, User.device,
+                      User.updated_at)
+
+    @staticmethod
+    def _ad_query():
+        return select(Advertisement.ad_id, Advertisement.title, Advertisement.category, Advertisement.keywords,
+                      Advertisement.target_age_min, Advertisement.target_age_max, Advertisement.target_gender,
+                      Advertisement.bid_price, Advertisement.is_active, Advertisement.updated_at)
+
+    @staticmethod
+    def _profile_from_row(row) -> Dict[str, Any]:
+        return {
+            "age": row.age,
+            "gender": row.gender,
+            "interests": row.interests or [],
+            "location": row.location,
+            "device": row.device
+        }
+
+    @staticmethod
+    def _ad_from_row(row) -> Dict[str, Any]:
+        return {
+            "title": row.title,
+            "category": row.category,
+            "keywords": row.keywords or [],
+            "target_age": [row.target_age_min, row.target_age_max],
+            "target_gender": row.target_gender,
+            "bid_price": row.bid_price
+        }
+
+    def _advance_watermark(self, table: str, value):
+        if value is not None and (self.watermarks[table] is None or value > self.watermarks[table]):
+            self.watermarks[table] = value
+
+    def _count_unknown_actions(self, n: int):
+        """行为不在 INTERACTION_ACTIONS 中的交互记录（与 /interaction 返回 400 的规则一致）不进入交互日志，只计数"""
+        if n:
+            self.unknown_action_interactions += n
+            print(f"⚠️ 跳过 {n} 条未知行为的交互记录（有效行为: {Config.INTERACTION_ACTIONS}）")
+
+    def _mark_interactions_seen(self, interaction_ids: Iterable[int]):
+        """记录已读到的交互 id 并推进高水位，只保留重叠窗口内的 id"""
+        self._recent_interaction_ids.update(interaction_ids)
+        if self._recent_interaction_ids:
+            self.watermarks["interactions"] = max(self.watermarks["interactions"], max(self._recent_interaction_ids))
+        floor = self.watermarks["interactions"] - Config.DELTA_SYNC_INTERACTION_ID_OVERLAP
+        self._recent_interaction_ids = {i for i in self._recent_interaction_ids if i > floor}
+
+    def sync_delta(self, chunk_size: Optional[int] = None) -> Dict[str, Any]:
+        """增量同步：按高水位只拉取上次同步后新增或变更的用户、广告和交互记录
+
+        用户和广告按 updated_at >= 高水位 - 1 秒拉取（updated_at 可能只有秒级精度，重叠窗口内的行会被重复拉取，
+        内容未变时不做修改），
+        is_active 变为 False 的广告会被下线；交互记录跳过本进程自己写入的记录，
+        按 id > 高水位 - DELTA_SYNC_INTERACTION_ID_OVERLAP 拉取并按 id 去重：MySQL 的自增 id 在插入时分配、
+        提交顺序可能不同，较小的 id 可能在较大的 id 之后才可见，重叠窗口内晚提交的记录仍会被同步。
+        updated_at 为空的旧数据只在全量加载时读取。
+
+        Returns:
+            各类变更的条数（late_interactions 为 id 低于上次高水位、晚提交的交互，unknown_actions 为因行为未知跳过的交互），
+            以及本次新增交互在交互日志中的起始下标 first_new_interaction
+        """
+        stats = {"users": 0, "ads_upserted": 0, "ads_deactivated": 0, "interactions": 0, "late_interactions": 0,
+                 "unknown_actions": 0, "first_new_interaction": len(self._interaction_history)}
+        if not self.has_database:
+            return stats
+
+        chunk_size = chunk_size or Config.DB_LOAD_CHUNK_SIZE
+        start = time.perf_counter()
+        # 每次同步是一个独立的工作单元（新事务），MySQL 可重复读隔离级别下才能看到其他写入方新提交的数据
+        with self.session_scope() as session:
+            user_query = self._user_query()
+            if self.watermarks["users"] is None:
+                user_query = user_query.where(User.updated_at.isnot(None))
+            else:
+                user_query = user_query.where(User.updated_at >= self.watermarks["users"] - self.WATERMARK_OVERLAP)
+            for chunk in self._stream_rows(session, user_query, "用户", chunk_size, report=False):
+                for row in chunk:
+                    profile = self._profile_from_row(row)
+                    if self._user_profiles.get(row.user_id) != profile:
+                        self._user_profiles[row.user_id] = profile
+                        stats["users"] += 1
+                    self._advance_watermark("users", row.updated_at)
+
+            ad_query = self._ad_query()
+            if self.watermarks["ads"] is None:
+                ad_query = ad_query.where(Advertisement.updated_at.isnot(None))
+            else:
+                ad_query = ad_query.where(Advertisement.updated_at >= self.watermarks["ads"] - self.WATERMARK_OVERLAP)
+            for chunk in self._stream_rows(session, ad_query, "广告", chunk_size, report=False):
+                for row in chunk:
+                    if row.is_active:
+                        ad_info = self._ad_from_row(row)
+                        if self._ad_inventory.get(row.ad_id) != ad_info:
+                            self.upsert_ad(row.ad_id, ad_info)
+                            stats["ads_upserted"] += 1
+                    elif row.ad_id in self._ad_inventory:
+                        self.deactivate_ad(row.ad_id)
+                        stats["ads_deactivated"] += 1
+                    self._advance_watermark("ads", row.updated_at)
+
+            interaction_query = select(
+                UserInteraction.user_id, UserInteraction.ad_id, UserInteraction.action, UserInteraction.timestamp,
+                UserInteraction.id, UserInteraction.context
+            ).where(
+                UserInteraction.id > self.watermarks["interactions"] - Config.DELTA_SYNC_INTERACTION_ID_OVERLAP
+            ).order_by(UserInteraction.id)
+            watermark, seen = self.watermarks["interactions"], self._recent_interaction_ids
+            known_actions = self._interaction_history.actions.codes
+            new_rows, new_ids = [], []
+            for chunk in self._stream_rows(session, interaction_query, "交互记录", chunk_size, report=False):
+                for row in chunk:
+                    if row.id in seen:
+                        continue
+                    new_ids.append(row.id)
+                    if isinstance(row.context, dict) and row.context.get("writer") == self.writer_id:
+                        continue
+                    if row.action not in known_actions:
+                        stats["unknown_actions"] += 1
+                        continue
+                    new_rows.append(row)
+                    if row.id <= watermark:
+                        stats["late_interactions"] += 1
+        self._count_unknown_actions(stats["unknown_actions"])
+
+        # 新增交互在交互日志中连续存放（追加期间请求线程的交互记录等待），调用方按下标区间同步到嵌入模型
+        with self.interaction_lock:
+            stats["first_new_interaction"] = len(self._interaction_history)
+            self._interaction_history.extend_rows(new_rows)
+            for row in new_rows:
+                ad_row = self.ad_features.row_of(row.ad_id)
+                if ad_row is not None:
+                    self.candidate_index.record_interaction(ad_row)
+            self._mark_interactions_seen(new_ids)
+            stats["interactions"] = len(new_rows)
+
+        stats["seconds"] = time.perf_counter() - start
+        return stats
+
+    def count_interactions_through(self, interaction_id: Optional[int] = None) -> int:
+        """数据库中 id 不超过 interaction_id（None 表示全部）的交互记录条数（全量加载时即这些记录在交互日志中占的前缀长度）"""
+        query = select(func.count(UserInteraction.id))
+        if interaction_id is not None:
+            query = query.where(UserInteraction.id <= interaction_id)
+        with self.session_scope() as session:
+            return session.execute(query).scalar()
+
     def load_sample_data(self):
         """加载示例数据（当没有数据库时使用）"""
         print("📝 加载示例数据...")
+        self.using_sample_data = True
 
         # 模拟用户数据
         self.user_profiles = {
@@ -145,43 +566,71 @@ class DataProcessor:
             f"✅ 示例数据加载: {len(self.user_profiles)} 用户, {len(self.ad_inventory)} 广告, {len(self.interaction_history)} 交互记录")
 
     def save_interaction_to_db(self, user_id: str, ad_id: str, action: str):
-        """保存交互记录到数据库"""
-        if not self.db_session:
-            print("⚠️ 无数据库会话，跳过保存")
-            return
+        """保存交互记录到数据库
 
-        try:
-            from datetime import datetime
-            interaction = UserInteraction(
-                user_id=user_id,
-                ad_id=ad_id,
-                action=action,
-                timestamp=datetime.now()
-            )
-            self.db_session.add(interaction)
-            self.db_session.commit()
-
-            # 更新内存中的交互历史
-            self.interaction_history.append({
+        设置了 interaction_writer 时只放入写入队列（队列满时抛出 queue.Full），否则同步写入并提交。
+        """
+        if self.interaction_writer is not None:
+            timestamp = datetime.now()
+            self.interaction_writer.submit({
                 "user_id": user_id,
                 "ad_id": ad_id,
                 "action": action,
-                "timestamp": interaction.timestamp.isoformat() if interaction.timestamp else None
+                "timestamp": timestamp,
+                "context": {"writer": self.writer_id}
             })
+            self.record_interaction_in_memory(user_id, ad_id, action, timestamp)
+            return
 
-            print(f"✅ 交互记录已保存到数据库")
+        if not self.has_database:
+            print("⚠️ 无数据库会话，跳过保存")
+            return
+
+        try:
+            timestamp = datetime.now()
+            with self.session_scope() as session:
+                session.add(UserInteraction(
+                    user_id=user_id,
+                    ad_id=ad_id,
+                    action=action,
+                    timestamp=timestamp,
+                    context={"writer": self.writer_id}
+                ))
+            self.record_interaction_in_memory(user_id, ad_id, action, timestamp)
+            logger.debug("交互记录已保存到数据库: %s -> %s (%s)", user_id, ad_id, action)
 
         except Exception as e:
             print(f"❌ 保存交互记录失败: {e}")
-            self.db_session.rollback()
+
+    def record_interaction_in_memory(self, user_id: str, ad_id: str, action: str, timestamp):
+        """更新内存中的交互历史和广告热度"""
+        with self.interaction_lock:
+            self.interaction_history.append(user_id, ad_id, action, timestamp)
+            row = self.ad_features.row_of(ad_id)
+            if row is not None:
+                self.candidate_index.record_interaction(row)
 
     def create_user_features(self, user_id: str) -> np.ndarray:
-        """创建用户特征向量 - 统一为8维"""
-        if user_id not in self.user_profiles:
+        """获取用户特征向量 - 统一为8维（按用户缓存，画像变更时失效）
+
+        返回的数组为只读，调用方不应原地修改。
+        """
+        features = self.user_feature_cache.get(user_id)
+        if features is not None:
+            tracing.count("user_feature_cache_hit")
+            return features
+
+        tracing.count("user_feature_cache_miss")
+        if user_id not in self._user_profiles:
             return np.zeros(self.feature_dim)
 
-        user = self.user_profiles[user_id]
+        features = self._build_user_features(self._user_profiles[user_id])
+        features.flags.writeable = False
+        self.user_feature_cache.put(user_id, features)
+        return features
 
+    def _build_user_features(self, user: Dict[str, Any]) -> np.ndarray:
+        """根据用户画像构建特征向量 - 统一为8维"""
         # 统一使用8维特征
         features = np.zeros(self.feature_dim)
 
@@ -218,13 +667,69 @@ class DataProcessor:
 
         return features
 
+    def rebuild_ad_feature_store(self):
+        """根据当前广告库全量重建广告特征矩阵、候选索引和定向资格索引"""
+        ad_ids = list(self._ad_inventory.keys())
+        features = np.array([self._build_ad_features(self._ad_inventory[ad_id]) for ad_id in ad_ids])
+        self.ad_features.build(ad_ids, features.reshape(len(ad_ids), self.feature_dim))
+        self.candidate_index.build(
+            (row, CandidateIndex.ad_tokens(self._ad_inventory[ad_id])) for row, ad_id in enumerate(ad_ids))
+        self.eligibility_index = EligibilityIndex(initial_capacity=max(len(ad_ids), 1024))
+        for row, ad_id in enumerate(ad_ids):
+            ad = self._ad_inventory[ad_id]
+            self.eligibility_index.update(row, ad.get("target_age"), ad.get("target_gender"))
+        self.refresh_ad_popularity()
+
+    def refresh_ad_popularity(self):
+        """根据交互历史重新统计每条广告的交互次数（用于热门广告兜底召回）"""
+        log = self._interaction_history
+        rows = self.ad_rows_for(log.ads.values)
+        ad_counts = log.count_by_ad()
+        known = rows >= 0
+        counts = np.bincount(rows[known], weights=ad_counts[known], minlength=self.ad_features.size)
+        self.candidate_index.set_popularity(counts.astype(np.int64))
+
+    def ad_rows_for(self, ad_ids: List[str]) -> np.ndarray:
+        """把广告 id 列表映射为广告特征存储中的行号，未知广告为 -1"""
+        index = self.ad_features.index
+        return np.fromiter((index.get(ad_id, -1) for ad_id in ad_ids), dtype=np.int64, count=len(ad_ids))
+
+    def upsert_ad(self, ad_id: str, ad_info: Dict[str, Any]):
+        """新增或修改单条广告，原地更新特征矩阵和候选索引中对应的行"""
+        self._ad_inventory[ad_id] = ad_info
+        row = self.ad_features.upsert(ad_id, self._build_ad_features(ad_info))
+        self.candidate_index.update(row, CandidateIndex.ad_tokens(ad_info))
+        self.eligibility_index.update(row, ad_info.get("target_age"), ad_info.get("target_gender"))
+
+    def deactivate_ad(self, ad_id: str):
+        """下线单条广告"""
+        self._ad_inventory.pop(ad_id, None)
+        row = self.ad_features.row_of(ad_id)
+        if row is not None:
+            self.ad_features.deactivate(ad_id)
+            self.candidate_index.remove(row)
+            self.eligibility_index.remove(row)
+
+    def filter_eligible(self, user_id: str, rows: np.ndarray) -> np.ndarray:
+        """按广告的目标年龄/性别过滤行号，只保留可以投放给该用户的广告"""
+        profile = self._user_profiles.get(user_id, {})
+        mask = self.eligibility_index.eligible_mask(rows, profile.get("age"), profile.get("gender"))
+        return rows[mask]
+
+    def retrieve_candidates(self, user_id: str, limit: int, popular_fallback: int = 0) -> np.ndarray:
+        """召回用户的候选广告行号：兴趣命中关键词/类别的广告 + 热门广告兜底"""
+        interests = self._user_profiles.get(user_id, {}).get("interests") or []
+        return self.candidate_index.candidates(interests, limit, popular_fallback)
+
     def create_ad_features(self, ad_id: str) -> np.ndarray:
-        """创建广告特征向量 - 统一为8维"""
-        if ad_id not in self.ad_inventory:
+        """获取广告特征向量 - 统一为8维（从广告特征存储读取）"""
+        features = self.ad_features.get(ad_id)
+        if features is None:
             return np.zeros(self.feature_dim)
+        return features.astype(np.float64)
 
-        ad = self.ad_inventory[ad_id]
-
+    def _build_ad_features(self, ad: Dict[str, Any]) -> np.ndarray:
+        """根据广告信息构建特征向量 - 统一为8维"""
         # 统一使用8维特征
         features = np.zeros(self.feature_dim)
 
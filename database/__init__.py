@@ -1,2 +1,3 @@
-from .database import SessionLocal, init_database, get_db, create_tables
-from .models import User, Advertisement, UserInteraction, UserEmbedding, Base
\ No newline at end of file
+from .database import SessionLocal, init_database, get_db, create_tables, session_scope, pool_metrics
+from .models import User, Advertisement, UserInteraction, UserEmbedding, Base
+from .interaction_writer import InteractionWriter
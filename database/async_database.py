@@ -0,0 +1,72 @@
+from datetime import datetime
+from typing import Any, Dict, List, Optional
+from sqlalchemy import insert, select
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
+from database.models import User, UserInteraction
+from config import Config
+from database.database import PoolMetrics
+from metrics import stage_timer
+
+# 创建异步引擎（MySQL 使用 aiomysql，SQLite 使用 aiosqlite）
+try:
+    async_engine = create_async_engine(Config.ASYNC_DATABASE_URL, **Config.ASYNC_ENGINE_KWARGS)
+    print(f"✅ 异步数据库引擎创建成功 - 使用 {Config.DB_TYPE}")
+except Exception as e:
+    print(f"⚠️ 创建异步数据库引擎失败: {e}，API 将使用同步数据库访问")
+    async_engine = None
+
+# 创建异步会话工厂
+AsyncSessionLocal = async_sessionmaker(async_engine, expire_on_commit=False) if async_engine else None
+async_pool_metrics = PoolMetrics(async_engine.sync_engine) if async_engine else None
+
+
+class AsyncRepository:
+    """API 使用的异步数据访问层：交互记录写入与用户画像读取，不阻塞事件循环"""
+
+    def __init__(self, session_factory: async_sessionmaker):
+        self.session_factory = session_factory
+
+    async def add_interaction(self, user_id: str, ad_id: str, action: str,
+                              context: Optional[Dict[str, Any]] = None) -> datetime:
+        """写入一条交互记录并提交，返回记录的时间戳"""
+        timestamp = datetime.now()
+        await self.add_interactions([{
+            "user_id": user_id,
+            "ad_id": ad_id,
+            "action": action,
+            "timestamp": timestamp,
+            "context": context
+        }])
+        return timestamp
+
+    async def add_interactions(self, interactions: List[Dict[str, Any]]):
+        """批量写入交互记录（一条 INSERT、一次提交）"""
+        if not interactions:
+            return
+        with stage_timer("db_commit"):
+            async with self.session_factory() as session:
+                async with session.begin():
+                    await session.execute(insert(UserInteraction), interactions)
+
+    async def get_user_profile(self, user_id: str) -> Optional[Dict[str, Any]]:
+        """从数据库读取用户画像，不存在时返回 None"""
+        async with self.session_factory() as session:
+            row = (await session.execute(
+                select(User.age, User.gender, User.interests, User.location, User.device)
+                .where(User.user_id == user_id)
+            )).first()
+        if row is None:
+            return None
+        return {
+            "age": row.age,
+            "gender": row.gender,
+            "interests": row.interests or [],
+            "location": row.location,
+            "device": row.device
+        }
+
+
+async def dispose_async_engine():
+    """关闭异步引擎的连接池"""
+    if async_engine is not None:
+        await async_engine.dispose()
@@ -1,22 +1,25 @@
-from sqlalchemy import create_engine
+import threading
+from contextlib import contextmanager
+from sqlalchemy import create_engine, event, inspect, text
 from sqlalchemy.orm import sessionmaker
 from database.models import Base
 from config import Config, get_connection_info
+from metrics import stage_timer
 
 # 创建引擎
 try:
     engine = create_engine(
         Config.DATABASE_URL,
         **Config.ENGINE_KWARGS,
-        echo=True  # 显示SQL语句，便于调试
+        echo=Config.DB_ECHO  # 调试时可通过 DB_ECHO=true 打印SQL语句
     )
     print(f"✅ 数据库引擎创建成功 - 使用 {Config.DB_TYPE}")
 except Exception as e:
     print(f"❌ 创建数据库引擎失败: {e}")
     # 如果失败，回退到SQLite
-    Config.DATABASE_URL = "sqlite:///./ad_recommendation.db"
-    Config.ENGINE_KWARGS = {"connect_args": {"check_same_thread": False}}
-    engine = create_engine(Config.DATABASE_URL, **Config.ENGINE_KWARGS, echo=True)
+    Config.DATABASE_URL = f"sqlite:///{Config.SQLITE_PATH}"
+    Config.ENGINE_KWARGS = {"connect_args": {"check_same_thread": False}, **Config.POOL_KWARGS}
+    engine = create_engine(Config.DATABASE_URL, **Config.ENGINE_KWARGS, echo=Config.DB_ECHO)
     print("✅ 已回退到SQLite数据库")
 
 # 创建会话工厂
@@ -30,15 +33,111 @@ def get_db():
     finally:
         db.close()
 
+@contextmanager
+def session_scope(session_factory=None):
+    """一个工作单元一个会话：正常结束时提交，出现异常时回滚，最后关闭（连接归还连接池）"""
+    session = (session_factory or SessionLocal)()
+    try:
+        yield session
+        with stage_timer("db_commit"):
+            session.commit()
+    except Exception:
+        session.rollback()
+        raise
+    finally:
+        session.close()
+
+
+class PoolMetrics:
+    """连接池使用情况：当前借出/空闲/溢出连接数，以及借出次数和借出峰值（基于连接池事件统计）"""
+
+    def __init__(self, engine):
+        self.engine = engine
+        self._lock = threading.Lock()
+        self.connects = 0
+        self.checkouts = 0
+        self.checkins = 0
+        self.checked_out = 0
+        self.max_checked_out = 0
+        event.listen(engine, "connect", self._on_connect)
+        event.listen(engine, "checkout", self._on_checkout)
+        event.listen(engine, "checkin", self._on_checkin)
+
+    def _on_connect(self, dbapi_connection, connection_record):
+        with self._lock:
+            self.connects += 1
+
+    def _on_checkout(self, dbapi_connection, connection_record, connection_proxy):
+        with self._lock:
+            self.checkouts += 1
+            self.checked_out += 1
+            self.max_checked_out = max(self.max_checked_out, self.checked_out)
+
+    def _on_checkin(self, dbapi_connection, connection_record):
+        with self._lock:
+            self.checkins += 1
+            self.checked_out = max(self.checked_out - 1, 0)
+
+    def snapshot(self):
+        pool = self.engine.pool
+        pool_size = pool.size() if hasattr(pool, "size") else None
+        max_overflow = getattr(pool, "_max_overflow", 0)
+        capacity = pool_size + max(max_overflow, 0) if pool_size is not None else None
+        with self._lock:
+            checked_out = self.checked_out
+            stats = {
+                "connects": self.connects,
+                "checkouts": self.checkouts,
+                "checkins": self.checkins,
+                "max_checked_out": self.max_checked_out,
+            }
+        return {
+            "pool_class": type(pool).__name__,
+            "pool_size": pool_size,
+            "max_overflow": max_overflow,
+            "timeout": getattr(pool, "_timeout", None),
+            "checked_out": checked_out,
+            "checked_in": pool.checkedin() if hasattr(pool, "checkedin") else None,
+            "overflow": pool.overflow() if hasattr(pool, "overflow") else None,
+            "utilization": checked_out / capacity if capacity else None,
+            **stats
+        }
+
+
+pool_metrics = PoolMetrics(engine)
+
+# 表创建之后才新增的列：表名 -> [(列名, 列类型, 补齐旧数据的 SQL)]
+ADDED_COLUMNS = {
+    "advertisements": [
+        ("updated_at", "DATETIME", "UPDATE advertisements SET updated_at = created_at WHERE updated_at IS NULL"),
+    ],
+}
+
 def create_tables():
     """创建所有表"""
     try:
         Base.metadata.create_all(bind=engine)
+        ensure_added_columns()
         print(f"✅ 数据库表创建成功")
     except Exception as e:
         print(f"❌ 创建表失败: {e}")
         raise
 
+def ensure_added_columns():
+    """为已存在的旧表补上新增的列（create_all 不会修改已有的表）"""
+    inspector = inspect(engine)
+    with engine.begin() as conn:
+        for table, columns in ADDED_COLUMNS.items():
+            if not inspector.has_table(table):
+                continue
+            existing = {column["name"] for column in inspector.get_columns(table)}
+            for name, column_type, backfill in columns:
+                if name in existing:
+                    continue
+                conn.execute(text(f"ALTER TABLE {table} ADD COLUMN {name} {column_type}"))
+                conn.execute(text(backfill))
+                print(f"✅ 已为表 {table} 新增列 {name}")
+
 def init_database():
     """初始化数据库"""
     print(f"🚀 初始化数据库连接...")
@@ -0,0 +1,197 @@
+import json
+import queue
+import threading
+import time
+from datetime import datetime
+from typing import Any, Callable, Dict, List, Optional
+from sqlalchemy import insert
+from database.models import UserInteraction
+from metrics import stage_timer
+
+_STOP = object()
+
+
+class InteractionWriter:
+    """交互记录的异步批量写入（write-behind）
+
+    请求线程只把记录放入有界队列后立即返回；后台线程攒够 batch_size 条或等待满 flush_interval 秒后，
+    用一条批量 INSERT + 一次 commit 写入数据库。队列满时 submit 抛出 queue.Full，由调用方返回 503 做背压。
+    重试后仍写入失败的批次追加到死信文件（每行一条 JSON 记录，可修复后重新导入），死信文件也写不了才算丢弃。
+    """
+
+    def __init__(self, session_factory: Callable, batch_size: int = 500, flush_interval: float = 0.2,
+                 max_queue_size: int = 10000, max_retries: int = 2, dead_letter_path: Optional[str] = None):
+        """
+        Args:
+            session_factory: 创建数据库会话的工厂（如 SessionLocal），后台线程使用独立的会话
+            batch_size: 每批最多写入的条数
+            flush_interval: 攒批的最长等待秒数
+            max_queue_size: 队列容量，超过后拒绝写入
+            max_retries: 批量写入失败后的重试次数，仍失败则写入死信文件
+            dead_letter_path: 死信文件路径，为 None 时失败的批次直接丢弃
+        """
+        self.session_factory = session_factory
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.max_retries = max_retries
+        self.dead_letter_path = dead_letter_path
+        self._queue = queue.Queue(maxsize=max_queue_size)
+        self._thread = None
+        self._closed = False
+        self._lock = threading.Lock()
+        self._stats = {
+            "enqueued": 0,
+            "rejected": 0,
+            "written": 0,
+            "failed": 0,
+            "dead_lettered": 0,
+            "dropped": 0,
+            "batches": 0,
+            "last_batch_size": 0,
+            "max_batch_size": 0,
+            "flush_seconds_total": 0.0,
+            "last_flush_ms": 0.0,
+            "max_flush_ms": 0.0,
+        }
+
+    def start(self):
+        """启动后台写入线程"""
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run, name="interaction-writer", daemon=True)
+            self._thread.start()
+
+    def submit(self, record: Dict[str, Any]):
+        """放入一条交互记录（UserInteraction 的列名 -> 值），队列已满时抛出 queue.Full"""
+        if self._closed:
+            raise RuntimeError("交互写入队列已关闭")
+        try:
+            self._queue.put_nowait(record)
+        except queue.Full:
+            with self._lock:
+                self._stats["rejected"] += 1
+            raise
+        with self._lock:
+            self._stats["enqueued"] += 1
+
+    def stop(self, timeout: float = 30.0):
+        """停止接收新记录，写完队列中剩余的记录后退出后台线程"""
+        if self._closed:
+            return
+        self._closed = True
+        if self._thread is None:
+            self._drain()
+            return
+        self._queue.put(_STOP)
+        self._thread.join(timeout)
+
+    @property
+    def queue_depth(self) -> int:
+        return self._queue.qsize()
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            stats = dict(self._stats)
+        batches = stats["batches"]
+        flush_seconds = stats.pop("flush_seconds_total")
+        stats["queue_depth"] = self.queue_depth
+        stats["queue_capacity"] = self._queue.maxsize
+        stats["avg_batch_size"] = stats["written"] / batches if batches else 0.0
+        stats["avg_flush_ms"] = 1000 * flush_seconds / batches if batches else 0.0
+        return stats
+
+    def _run(self):
+        while True:
+            item = self._queue.get()
+            if item is _STOP:
+                self._drain()
+                return
+
+            batch = [item]
+            stopping = False
+            deadline = time.monotonic() + self.flush_interval
+            while len(batch) < self.batch_size:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                try:
+                    item = self._queue.get(timeout=remaining)
+                except queue.Empty:
+                    break
+                if item is _STOP:
+                    stopping = True
+                    break
+                batch.append(item)
+
+            self._write(batch)
+            if stopping:
+                self._drain()
+                return
+
+    def _drain(self):
+        """把队列中剩余的记录全部写入"""
+        batch = []
+        while True:
+            try:
+                item = self._queue.get_nowait()
+            except queue.Empty:
+                break
+            if item is not _STOP:
+                batch.append(item)
+            if len(batch) >= self.batch_size:
+                self._write(batch)
+                batch = []
+        if batch:
+            self._write(batch)
+
+    def _write(self, batch: List[Dict[str, Any]]):
+        start = time.perf_counter()
+        for attempt in range(self.max_retries + 1):
+            session = self.session_factory()
+            try:
+                with stage_timer("db_commit"):
+                    session.execute(insert(UserInteraction), batch)
+                    session.commit()
+                break
+            except Exception as e:
+                session.rollback()
+                print(f"❌ 批量写入交互记录失败（第 {attempt + 1} 次）: {e}")
+            finally:
+                session.close()
+        else:
+            spilled = self._spill(batch)
+            with self._lock:
+                self._stats["failed"] += len(batch)
+                self._stats["dead_lettered" if spilled else "dropped"] += len(batch)
+            return
+
+        elapsed = time.perf_counter() - start
+        with self._lock:
+            stats = self._stats
+            stats["written"] += len(batch)
+            stats["batches"] += 1
+            stats["last_batch_size"] = len(batch)
+            stats["max_batch_size"] = max(stats["max_batch_size"], len(batch))
+            stats["flush_seconds_total"] += elapsed
+            stats["last_flush_ms"] = 1000 * elapsed
+            stats["max_flush_ms"] = max(stats["max_flush_ms"], 1000 * elapsed)
+
+    def _spill(self, batch: List[Dict[str, Any]]) -> bool:
+        """把写入失败的批次追加到死信文件，成功返回 True"""
+        if not self.dead_letter_path:
+            print(f"❌ 丢弃 {len(batch)} 条交互记录（未配置死信文件）")
+            return False
+        try:
+            with open(self.dead_letter_path, "a", encoding="utf-8") as f:
+                for record in batch:
+                    f.write(json.dumps(record, ensure_ascii=False, default=_json_default) + "\n")
+            print(f"⚠️ {len(batch)} 条交互记录已写入死信文件 {self.dead_letter_path}")
+            return True
+        except Exception as e:
+            print(f"❌ 写入死信文件失败，丢弃 {len(batch)} 条交互记录: {e}")
+            return False
+
+
+def _json_default(value):
+    if isinstance(value, datetime):
+        return value.isoformat()
+    raise TypeError(f"无法序列化的类型: {type(value).__name__}")
@@ -36,6 +36,7 @@ class Advertisement(Base):
     landing_page = Column(String(500))
     is_active = Column(Boolean, default=True)
     created_at = Column(DateTime, default=func.now())
+    updated_at = Column(DateTime, default=func.now(), onupdate=func.now())
 
 
 class UserInteraction(Base):
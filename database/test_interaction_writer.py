@@ -0,0 +1,48 @@
+import json
+from datetime import datetime
+from sqlalchemy import create_engine, select
+from sqlalchemy.orm import sessionmaker
+from database.interaction_writer import InteractionWriter
+from database.models import Base, UserInteraction
+
+
+def records(n):
+    return [{"user_id": f"u{i}", "ad_id": "a1", "action": "click", "timestamp": datetime(2024, 1, 1, 12, 0, i),
+             "context": {"writer": "test"}} for i in range(n)]
+
+
+def test_batches_are_written(tmp_path):
+    engine = create_engine(f"sqlite:///{tmp_path / 'writer.db'}")
+    Base.metadata.create_all(engine)
+    writer = InteractionWriter(sessionmaker(bind=engine), batch_size=2, flush_interval=0.01,
+                               dead_letter_path=str(tmp_path / "dead.jsonl"))
+    writer.start()
+    for record in records(5):
+        writer.submit(record)
+    writer.stop()
+    with engine.connect() as connection:
+        assert len(connection.execute(select(UserInteraction.id)).all()) == 5
+    stats = writer.stats()
+    assert (stats["written"], stats["failed"], stats["dead_lettered"], stats["dropped"]) == (5, 0, 0, 0)
+    assert not (tmp_path / "dead.jsonl").exists()
+
+
+def test_failed_batches_are_dead_lettered_or_counted_as_dropped(tmp_path):
+    # 没有建表，批量写入必然失败
+    engine = create_engine(f"sqlite:///{tmp_path / 'writer.db'}")
+    dead_letter = tmp_path / "dead.jsonl"
+    writer = InteractionWriter(sessionmaker(bind=engine), batch_size=10, max_retries=1,
+                               dead_letter_path=str(dead_letter))
+    for record in records(3):
+        writer.submit(record)
+    writer.stop()
+    stats = writer.stats()
+    assert (stats["written"], stats["failed"], stats["dead_lettered"], stats["dropped"]) == (0, 3, 3, 0)
+    lines = [json.loads(line) for line in dead_letter.read_text(encoding="utf-8").splitlines()]
+    assert [line["user_id"] for line in lines] == ["u0", "u1", "u2"]
+    assert lines[0]["timestamp"] == "2024-01-01T12:00:00"
+
+    writer = InteractionWriter(sessionmaker(bind=engine), max_retries=0)
+    writer.submit(records(1)[0])
+    writer.stop()
+    assert (writer.stats()["failed"], writer.stats()["dropped"]) == (1, 1)
@@ -1,29 +1,74 @@
 # 修改 main.py 开头的导入部分
 from data_processor import DataProcessor
-from models import RecommendationModel, UserEmbeddingModel
+from models import RecommendationModel, UserEmbeddingModel, ArtifactStore, schema_hash, top_k_indices
 from data import FeatureEngineer   # 移除 data. 前缀
-from typing import List, Dict, Any
+from typing import List, Dict, Any, Optional
+from datetime import datetime
+import itertools
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+import numpy as np
+from config import Config
 from database.database import SessionLocal, init_database
+from cache import RecommendationCache
+from concurrency import ReadWriteLock, reads_state, writes_state
+from metrics import RECOMMENDATIONS, INTERACTIONS, stage_timer, timed_stage
+import tracing
+import logging
+
+logger = logging.getLogger(__name__)
 
 
 class PersonalizedAdRecommendation:
-    def __init__(self, db_session=None):
+    def __init__(self, db_session=None, session_factory=None):
         print("🔧 初始化 PersonalizedAdRecommendation...")
         self.db_session = db_session
 
         # 先创建 DataProcessor 实例
         print("📦 创建 DataProcessor...")
-        self.data_processor = DataProcessor(db_session)
+        self.data_processor = DataProcessor(db_session, session_factory=session_factory)
 
         # 然后创建其他组件
         self.recommendation_model = RecommendationModel()
         self.user_embedding_model = UserEmbeddingModel()
         self.feature_engineer = FeatureEngineer()
 
+        # 推荐结果缓存：模型每次训练后版本号递增
+        self.model_version = 0
+        self.last_sync = None
+        # 推荐打分可能在多个线程中并发执行（读），增量同步修改广告库和索引（写）
+        self.state_lock = ReadWriteLock()
+        # 在线点击模型已学习到的交互日志位置；增量更新在单线程后台执行器中进行，同一时间最多排队一批
+        self.online_update_cursor = 0
+        self._online_update_lock = threading.Lock()
+        self._online_update_submit_lock = threading.Lock()
+        self._online_update_pending = False
+        self._online_update_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="online-update")
+        self.result_cache = RecommendationCache(max_size=Config.RESULT_CACHE_SIZE, ttl=Config.RESULT_CACHE_TTL)
+        self.data_processor.add_profile_listener(self._on_profile_change)
+        # 版本化的模型产物目录：启动时优先加载已保存的模型，避免每次重新训练
+        self.artifact_store = ArtifactStore(Config.MODEL_ARTIFACT_DIR, keep=Config.MODEL_ARTIFACT_KEEP)
+        self.artifact_version = None
+        self.last_trained_at = None
+
         print("✅ PersonalizedAdRecommendation 初始化完成")
 
-    def initialize(self):
-        """初始化系统"""
+    def _on_profile_change(self, user_id):
+        """用户画像变化时使对应的推荐结果失效"""
+        if user_id is None:
+            self.result_cache.clear()
+        else:
+            self.result_cache.invalidate_user(user_id)
+
+    def initialize(self, train: bool = True):
+        """初始化系统
+
+        Args:
+            train: 没有可加载的模型产物时是否立即训练；为 False 时由调用方安排后台训练，
+                训练完成前以未训练的模型提供服务（点击概率按 0.5 计）。
+                数据库不可用、使用示例数据时总是立即训练（后台训练进程同样连不上数据库）
+        """
         print("🚀 初始化个性化广告推荐系统...")
 
         # 检查数据
@@ -33,14 +78,17 @@ class PersonalizedAdRecommendation:
             # 重新加载数据
             self.data_processor.load_data_from_db()
 
-        # 训练模型
-        self.train_models()
+        # 加载最新的兼容模型产物；没有时训练模型并保存
+        train = train or not self.data_processor.serves_database_data
+        if not (Config.MODEL_WARM_START and self.warm_start()) and train:
+            self.train_models()
+            self.save_artifact()
 
         print("✅ 系统初始化完成")
 
     def create_sample_data_in_db(self):
         """在数据库中创建示例数据"""
-        if not self.db_session:
+        if not self.data_processor.has_database:
             print("⚠️ 无数据库会话，跳过创建示例数据")
             return
 
@@ -50,52 +98,53 @@ class PersonalizedAdRecommendation:
 
             print("📝 在数据库中创建示例数据...")
 
-            # 检查是否已存在数据
-            existing_users = self.db_session.query(User).count()
-            if existing_users > 0:
-                print("✅ 数据库中已有数据，跳过创建")
-                return
-
-            # 创建示例用户
-            users = [
-                User(user_id="user_1", age=25, gender="male", interests=["technology", "sports"], location="Beijing",
-                     device="mobile"),
-                User(user_id="user_2", age=30, gender="female", interests=["fashion", "beauty"], location="Shanghai",
-                     device="desktop"),
-                User(user_id="user_3", age=35, gender="male", interests=["business", "travel"], location="Shenzhen",
-                     device="tablet"),
-            ]
-
-            # 创建示例广告
-            advertisements = [
-                Advertisement(ad_id="ad_1", title="最新智能手机", category="electronics",
-                              keywords=["technology", "mobile"], target_age_min=18, target_age_max=35,
-                              target_gender="all", bid_price=2.5),
-                Advertisement(ad_id="ad_2", title="时尚女装", category="clothing", keywords=["fashion", "beauty"],
-                              target_age_min=20, target_age_max=40, target_gender="female", bid_price=1.8),
-                Advertisement(ad_id="ad_3", title="旅游套餐", category="travel", keywords=["travel", "vacation"],
-                              target_age_min=25, target_age_max=50, target_gender="all", bid_price=3.2),
-            ]
-
-            # 添加到数据库
-            for user in users:
-                self.db_session.add(user)
-            for ad in advertisements:
-                self.db_session.add(ad)
-
-            self.db_session.commit()
+            with self.data_processor.session_scope() as session:
+                # 检查是否已存在数据
+                existing_users = session.query(User).count()
+                if existing_users > 0:
+                    print("✅ 数据库中已有数据，跳过创建")
+                    return
+
+                # 创建示例用户
+                users = [
+                    User(user_id="user_1", age=25, gender="male", interests=["technology", "sports"], location="Beijing",
+                         device="mobile"),
+                    User(user_id="user_2", age=30, gender="female", interests=["fashion", "beauty"], location="Shanghai",
+                         device="desktop"),
+                    User(user_id="user_3", age=35, gender="male", interests=["business", "travel"], location="Shenzhen",
+                         device="tablet"),
+                ]
+
+                # 创建示例广告
+                advertisements = [
+                    Advertisement(ad_id="ad_1", title="最新智能手机", category="electronics",
+                                  keywords=["technology", "mobile"], target_age_min=18, target_age_max=35,
+                                  target_gender="all", bid_price=2.5),
+                    Advertisement(ad_id="ad_2", title="时尚女装", category="clothing", keywords=["fashion", "beauty"],
+                                  target_age_min=20, target_age_max=40, target_gender="female", bid_price=1.8),
+                    Advertisement(ad_id="ad_3", title="旅游套餐", category="travel", keywords=["travel", "vacation"],
+                                  target_age_min=25, target_age_max=50, target_gender="all", bid_price=3.2),
+                ]
+
+                # 添加到数据库
+                for user in users:
+                    session.add(user)
+                for ad in advertisements:
+                    session.add(ad)
             print("✅ 示例数据创建成功")
 
         except Exception as e:
             print(f"❌ 创建示例数据失败: {e}")
-            self.db_session.rollback()
 
+    @timed_stage("train")
     def train_models(self):
         """训练所有模型"""
         print("=== 开始训练个性化广告推荐模型 ===")
 
         # 训练传统推荐模型
         self.recommendation_model.train(self.data_processor)
+        self._use_click_model()
+        self.last_trained_at = datetime.now().isoformat()
 
         # 如果训练数据太少，生成一些模拟数据
         if len(self.data_processor.interaction_history) < 10:
@@ -103,15 +152,194 @@ class PersonalizedAdRecommendation:
             self._generate_simulated_interactions()
 
         # 训练嵌入模型
-        for interaction in self.data_processor.interaction_history:
-            self.user_embedding_model.update_user_embedding(
-                interaction['user_id'],
-                interaction['ad_id'],
-                interaction['action']
-            )
+        for user_id, ad_id, action, timestamp_us in self.data_processor.interaction_history.iter_tuples():
+            self.user_embedding_model.update_user_embedding(user_id, ad_id, action, timestamp_us)
+        self.user_embedding_model.shrink_to_fit()
+        self.online_update_cursor = len(self.data_processor.interaction_history)
 
         print("=== 模型训练完成 ===\n")
 
+    def _use_click_model(self):
+        """线上相似度计算复用点击模型训练时拟合的标准化器；模型版本号递增使推荐缓存失效"""
+        if self.recommendation_model.feature_engineer.is_fitted:
+            self.feature_engineer.use_scaler(self.recommendation_model.feature_engineer.scaler)
+        self.model_version += 1
+
+    def feature_schema(self) -> Dict[str, Any]:
+        """决定模型产物能否直接复用的特征与模型结构"""
+        return {
+            "feature_dim": self.data_processor.feature_dim,
+            "combined_feature_dim": self.recommendation_model.combined_feature_dim,
+            "click_model": type(self.recommendation_model.model).__name__,
+            "embedding_size": self.user_embedding_model.embedding_size,
+            "embedding_dtype": Config.EMBEDDING_DTYPE,
+            "user_embedding_dtype": Config.USER_EMBEDDING_DTYPE,
+            "interaction_actions": Config.INTERACTION_ACTIONS,
+            "interaction_history_depth": Config.INTERACTION_HISTORY_DEPTH,
+            "ad_categories": Config.AD_CATEGORIES
+        }
+
+    def save_artifact(self) -> Optional[int]:
+        """把当前模型保存为新的产物版本，返回版本号
+
+        产物记录训练数据的高水位，只在数据来自数据库时保存（示例数据无法判断产物是否仍对应当前数据）。
+        """
+        if not self.data_processor.serves_database_data or not self.recommendation_model.is_trained:
+            return None
+
+        watermarks = self.data_processor.watermarks
+        schema = self.feature_schema()
+        try:
+            version = self.artifact_store.save(self.recommendation_model, self.user_embedding_model, {
+                "schema_hash": schema_hash(schema),
+                "schema": schema,
+                "trained_at": self.last_trained_at,
+                "watermark": {
+                    "users": watermarks["users"].isoformat() if watermarks["users"] else None,
+                    "ads": watermarks["ads"].isoformat() if watermarks["ads"] else None,
+                    "interactions": watermarks["interactions"]
+                },
+                # 高水位之前的数据库记录数，加载时用于判断数据库是否已被重建
+                "db_interactions": self.data_processor.count_interactions_through(watermarks["interactions"]),
+                "interaction_count": len(self.data_processor.interaction_history)
+            })
+        except Exception as e:
+            print(f"⚠️ 保存模型产物失败: {e}")
+            return None
+
+        self.artifact_version = version
+        print(f"💾 模型产物已保存: {self.artifact_store.path_of(version)}")
+        return version
+
+    @timed_stage("model_load")
+    def warm_start(self) -> bool:
+        """加载最新的兼容模型产物，并把产物高水位之后新增的交互补充到嵌入模型，成功返回 True"""
+        if not self.data_processor.serves_database_data:
+            return False
+
+        version = self.artifact_store.latest_compatible(schema_hash(self.feature_schema()))
+        if version is None:
+            print("📦 没有兼容的模型产物，需要训练")
+            return False
+
+        metadata = self.artifact_store.read_metadata(version)
+        # 交互日志按 id 顺序全量加载，高水位之前的记录数即需要补充的起始位置
+        replay_from = self.data_processor.count_interactions_through(metadata["watermark"]["interactions"])
+        if replay_from != metadata["db_interactions"] or replay_from > len(self.data_processor.interaction_history):
+            print(f"📦 模型产物 v{version} 与当前数据库数据不一致，需要重新训练")
+            return False
+
+        try:
+            recommendation_model, embedding_model, metadata = self._load_artifact(version)
+        except Exception as e:
+            print(f"⚠️ 加载模型产物 v{version} 失败: {e}")
+            return False
+
+        replayed = self._replay_interactions(recommendation_model, embedding_model, replay_from)
+        self._swap_models(recommendation_model, embedding_model, version, metadata["trained_at"],
+                          replay_from + replayed)
+        print(f"♻️ 已加载模型产物 v{version}（训练于 {metadata['trained_at']}），"
+              f"补充 {replayed} 条新交互，跳过训练")
+        return True
+
+    def _load_artifact(self, version: int):
+        """把产物加载到新建的模型对象中，返回 (点击模型, 嵌入模型, 元数据)"""
+        recommendation_model, embedding_model = RecommendationModel(), UserEmbeddingModel()
+        metadata = self.artifact_store.load(version, recommendation_model, embedding_model)
+        return recommendation_model, embedding_model, metadata
+
+    def _replay_interactions(self, recommendation_model: RecommendationModel, embedding_model: UserEmbeddingModel,
+                             start: int) -> int:
+        """把交互日志中 start 之后的记录补充到嵌入模型（在线点击模型同时增量更新），返回补充的条数"""
+        replayed = 0
+        for user_id, ad_id, action, timestamp_us in self.data_processor.interaction_history.iter_tuples(start):
+            embedding_model.update_user_embedding(user_id, ad_id, action, timestamp_us)
+            replayed += 1
+        embedding_model.shrink_to_fit()
+        if replayed:
+            recommendation_model.partial_fit(self.data_processor, start, start + replayed)
+        return replayed
+
+    def _swap_models(self, recommendation_model: RecommendationModel, embedding_model: UserEmbeddingModel,
+                     version: int, trained_at: str, online_update_cursor: int):
+        """换入新的点击模型与嵌入模型（初始化阶段直接调用，服务中须持有写锁）"""
+        with self._online_update_lock:
+            self.recommendation_model, self.user_embedding_model = recommendation_model, embedding_model
+            self.online_update_cursor = online_update_cursor
+        self._use_click_model()
+        self.artifact_version = version
+        self.last_trained_at = trained_at
+
+    def _update_click_model(self):
+        """在线点击模型：新交互攒够 ONLINE_UPDATE_BATCH_SIZE 条后提交一次后台增量更新
+
+        新交互先缓存在交互日志中（online_update_cursor 之后的部分），调用方（请求处理、增量同步）
+        只做 O(1) 的条数判断和提交，partial_fit 在单线程的后台执行器中运行；已有更新在排队或进行中时直接跳过，
+        这批交互留给下一次一起学习。每次发布新参数后模型版本号递增，按旧参数缓存的推荐结果随之失效。
+        """
+        if not self.recommendation_model.supports_online_updates:
+            return
+        if len(self.data_processor.interaction_history) - self.online_update_cursor < Config.ONLINE_UPDATE_BATCH_SIZE:
+            return
+        with self._online_update_submit_lock:
+            if self._online_update_pending or self._online_update_executor is None:
+                return
+            self._online_update_pending = True
+            self._online_update_executor.submit(self._run_click_model_update)
+
+    def _run_click_model_update(self):
+        """后台执行器中的增量更新：持有读锁构建样本（与增量同步互斥），新参数由 OnlineClickModel 原子发布"""
+        try:
+            with self.state_lock.read(), self._online_update_lock:
+                start, end = self.online_update_cursor, len(self.data_processor.interaction_history)
+                if end - start >= Config.ONLINE_UPDATE_BATCH_SIZE:
+                    with stage_timer("online_update"):
+                        self.recommendation_model.partial_fit(self.data_processor, start, end)
+                    self.online_update_cursor = end
+                    # 推荐结果缓存以模型版本号为键，新参数发布后不再返回旧参数的打分结果
+                    self.model_version += 1
+        except Exception as e:
+            print(f"❌ 在线点击模型增量更新失败: {e}")
+        finally:
+            with self._online_update_submit_lock:
+                self._online_update_pending = False
+
+    def close(self):
+        """关闭后台增量更新执行器（等待进行中的一批完成）"""
+        with self._online_update_submit_lock:
+            executor, self._online_update_executor = self._online_update_executor, None
+        if executor is not None:
+            executor.shutdown(wait=True)
+
+    def install_artifact(self, version: int, replay_from: int,
+                         db_interactions: Optional[int] = None) -> Dict[str, Any]:
+        """热替换为后台训练产出的模型版本
+
+        加载产物和补充训练快照之后的交互都在锁外进行（新模型尚未对外可见），
+        写锁内只补充剩余的少量交互并换入新模型：进行中的推荐请求在读锁内继续使用旧模型，
+        换入后模型版本号递增，推荐结果缓存随之失效。
+
+        Args:
+            version: 后台训练保存的产物版本
+            replay_from: 触发训练时交互日志的长度，其后的交互补充到新的嵌入模型
+            db_interactions: 触发训练时数据库中的交互记录数；触发之后、训练进程加载数据之前写入数据库的交互
+                已包含在新模型中，补充时跳过这部分
+        """
+        start = time.perf_counter()
+        recommendation_model, embedding_model, metadata = self._load_artifact(version)
+        if db_interactions is not None:
+            replay_from = min(replay_from + max(0, metadata["db_interactions"] - db_interactions),
+                              len(self.data_processor.interaction_history))
+        replayed = self._replay_interactions(recommendation_model, embedding_model, replay_from)
+        with self.state_lock.write():
+            with stage_timer("model_swap"):
+                replayed += self._replay_interactions(recommendation_model, embedding_model, replay_from + replayed)
+                self._swap_models(recommendation_model, embedding_model, version, metadata["trained_at"],
+                                  replay_from + replayed)
+        print(f"🔁 已换入模型产物 v{version}（训练于 {metadata['trained_at']}），"
+              f"补充 {replayed} 条新交互，耗时 {time.perf_counter() - start:.2f} 秒")
+        return {"artifact_version": version, "model_version": self.model_version, "replayed_interactions": replayed}
+
     def _generate_simulated_interactions(self):
         """生成模拟交互数据以丰富训练集"""
         simulated_interactions = []
@@ -148,18 +376,208 @@ class PersonalizedAdRecommendation:
         self.data_processor.interaction_history.extend(simulated_interactions)
         print(f"✅ 生成 {len(simulated_interactions)} 条模拟交互数据")
 
+    @reads_state
     def get_recommendations(self, user_id: str, top_k: int = 5) -> List[Dict[str, Any]]:
         """为用户获取广告推荐"""
-        print(f"为用户 {user_id} 生成推荐...")
+        logger.debug("为用户 %s 生成推荐...", user_id)
 
         if user_id not in self.data_processor.user_profiles:
             return [{"error": f"用户 {user_id} 不存在"}]
 
+        if not Config.RESULT_CACHE_ENABLED:
+            RECOMMENDATIONS.inc(cache="disabled")
+            return self._score_ads(user_id, top_k)
+
+        # 打分前读取一次版本号：在线增量更新先发布参数再递增版本号，按该版本缓存的结果不会早于对应的参数
+        inventory_version, model_version = self.data_processor.ad_features.version, self.model_version
+        cached = self.result_cache.get(user_id, top_k, model_version, inventory_version)
+        if cached is not None:
+            RECOMMENDATIONS.inc(cache="hit")
+            tracing.count("result_cache_hit")
+            return list(cached)
+
+        RECOMMENDATIONS.inc(cache="miss")
+        tracing.count("result_cache_miss")
+        recommendations = self._score_ads(user_id, top_k)
+        self.result_cache.put(user_id, top_k, model_version, recommendations, inventory_version)
+        return list(recommendations)
+
+    def _score_ads(self, user_id: str, top_k: int) -> List[Dict[str, Any]]:
+        if Config.BATCH_SCORING_ENABLED:
+            return self._score_ads_batch(user_id, top_k)
+        return self._score_ads_per_ad(user_id, top_k)
+
+    def _candidate_ads(self, user_id: str, full_scan: bool = False, force_retrieval: bool = False):
+        """召回候选广告，返回 (广告行号, 广告特征矩阵)
+
+        广告库不超过 RETRIEVAL_MAX_CANDIDATES 时直接全量打分（结果精确且代价很小）。
+        之后按广告的目标年龄/性别过滤掉不能投放给该用户的广告。
+
+        Args:
+            full_scan: 跳过候选召回，从全部在线广告中过滤
+            force_retrieval: 不论 RETRIEVAL_ENABLED 和广告库大小都走候选召回（评估召回率时使用）
+        """
+        ad_store = self.data_processor.ad_features
+        use_retrieval = force_retrieval or (
+            Config.RETRIEVAL_ENABLED and len(ad_store) > Config.RETRIEVAL_MAX_CANDIDATES)
+        if full_scan or not use_retrieval:
+            rows, ad_features = ad_store.active_matrix()
+        else:
+            rows = self.data_processor.retrieve_candidates(
+                user_id, Config.RETRIEVAL_MAX_CANDIDATES, Config.RETRIEVAL_POPULAR_FALLBACK)
+            ad_features = None
+
+        if Config.ELIGIBILITY_FILTER_ENABLED:
+            eligible_rows = self.data_processor.filter_eligible(user_id, rows)
+            if len(eligible_rows) != len(rows):
+                rows, ad_features = eligible_rows, None
+
+        if ad_features is None:
+            ad_features = ad_store.matrix[rows]
+        return rows, ad_features
+
+    def _score_ads_batch(self, user_id: str, top_k: int, full_scan: bool = False,
+                         force_retrieval: bool = False) -> List[Dict[str, Any]]:
+        """批量打分：读取候选广告的特征矩阵，一次 predict_proba + 一次矩阵相似度计算
+
+        Args:
+            full_scan: 跳过候选召回，对全部可投放的在线广告打分
+            force_retrieval: 不论配置都只对召回的候选集打分
+        """
+        ad_store = self.data_processor.ad_features
+        with tracing.span("retrieval"):
+            rows, ad_features = self._candidate_ads(user_id, full_scan, force_retrieval)
+        tracing.count("candidates_scored", len(rows))
+        if len(rows) == 0:
+            return []
+
+        with stage_timer("feature_build"):
+            user_feature = self.data_processor.create_user_features(user_id)
+
+        with stage_timer("click_predict"):
+            click_probabilities = self.recommendation_model.predict_click_probabilities(user_feature, ad_features)
+        with stage_timer("similarity"):
+            self.feature_engineer.prepare_ad_vectors(ad_store.matrix, ad_store.version)
+            similarities = self.feature_engineer.batch_similarity(user_feature, rows)
+        combined_scores = click_probabilities * similarities
+
+        # 部分选择前 top_k 个，并列时按行号先后，与逐个打分路径中 list.sort 的顺序一致
+        with stage_timer("top_k"):
+            top_indices = top_k_indices(combined_scores, top_k)
+
+        top_ad_ids = [ad_store.ad_ids[rows[i]] for i in top_indices]
+        return [{
+            'ad_id': ad_id,
+            'ad_info': self.data_processor.ad_inventory[ad_id],
+            'click_probability': float(click_probabilities[i]),
+            'similarity': float(similarities[i]),
+            'combined_score': float(combined_scores[i]),
+            'from_collaborative_filtering': False  # 简化版本
+        } for ad_id, i in zip(top_ad_ids, top_indices)]
+
+    @reads_state
+    def evaluate_retrieval_recall(self, user_ids: List[str] = None, top_k: int = 10,
+                                  sample_size: int = 100) -> Dict[str, Any]:
+        """评估候选召回的召回率：召回后的 top_k 结果与全量扫描 top_k 结果的重合比例（RETRIEVAL_ENABLED 关闭时同样评估）"""
+        if user_ids is None:
+            user_ids = list(self.data_processor.user_profiles.keys())[:sample_size]
+
+        recalls = []
+        candidate_counts = []
+        for user_id in user_ids:
+            if user_id not in self.data_processor.user_profiles:
+                continue
+            full = {rec['ad_id'] for rec in self._score_ads_batch(user_id, top_k, full_scan=True)}
+            if not full:
+                continue
+            retrieved = {rec['ad_id'] for rec in self._score_ads_batch(user_id, top_k, force_retrieval=True)}
+            recalls.append(len(full & retrieved) / len(full))
+            candidate_counts.append(len(self._candidate_ads(user_id, force_retrieval=True)[0]))
+
+        return {
+            "users": len(recalls),
+            "top_k": top_k,
+            "catalog_size": len(self.data_processor.ad_features),
+            "mean_candidates": float(np.mean(candidate_counts)) if candidate_counts else 0.0,
+            "recall_at_k": float(np.mean(recalls)) if recalls else 0.0,
+            "min_recall_at_k": float(np.min(recalls)) if recalls else 0.0
+        }
+
+    @reads_state
+    def get_batch_recommendations(self, user_ids: List[str], top_k: int = 5) -> Dict[str, List[Dict[str, Any]]]:
+        """为多个用户批量获取广告推荐
+
+        按用户分块构建 用户 × 广告 的打分矩阵，每块只调用一次点击模型和一次相似度矩阵计算。
+        每块的 用户数 × 广告数 不超过 Config.BATCH_SCORING_MAX_ROWS，以限制内存占用。
+        批量场景对全部可投放的在线广告打分，不经过候选召回。
+        """
+        logger.debug("为 %d 个用户批量生成推荐...", len(user_ids))
+
+        results = {}
+        valid_user_ids = []
+        for user_id in user_ids:
+            if user_id not in self.data_processor.user_profiles:
+                results[user_id] = [{"error": f"用户 {user_id} 不存在"}]
+            elif user_id not in results:
+                results[user_id] = []
+                valid_user_ids.append(user_id)
+
+        ad_store = self.data_processor.ad_features
+        rows, ad_features = ad_store.active_matrix()
+        if not valid_user_ids or len(rows) == 0:
+            return results
+
+        self.feature_engineer.prepare_ad_vectors(ad_store.matrix, ad_store.version)
+        chunk_size = max(1, Config.BATCH_SCORING_MAX_ROWS // len(rows))
+
+        for start in range(0, len(valid_user_ids), chunk_size):
+            chunk_user_ids = valid_user_ids[start:start + chunk_size]
+            with stage_timer("feature_build"):
+                user_features = np.array([self.data_processor.create_user_features(user_id)
+                                          for user_id in chunk_user_ids])
+
+            with stage_timer("click_predict"):
+                click_probabilities = self.recommendation_model.predict_click_probability_matrix(
+                    user_features, ad_features)
+            with stage_timer("similarity"):
+                similarities = self.feature_engineer.batch_similarity_matrix(user_features, rows)
+            combined_scores = click_probabilities * similarities
+            tracing.count("candidates_scored", combined_scores.size)
+
+            with stage_timer("top_k"):
+                for j, user_id in enumerate(chunk_user_ids):
+                    user_scores = combined_scores[j]
+                    n_select = top_k
+                    if Config.ELIGIBILITY_FILTER_ENABLED:
+                        profile = self.data_processor.user_profiles[user_id]
+                        eligible = self.data_processor.eligibility_index.eligible_mask(
+                            rows, profile.get("age"), profile.get("gender"))
+                        user_scores = np.where(eligible, user_scores, -np.inf)
+                        n_select = min(top_k, int(eligible.sum()))
+
+                    results[user_id] = [{
+                        'ad_id': ad_store.ad_ids[rows[i]],
+                        'ad_info': self.data_processor.ad_inventory[ad_store.ad_ids[rows[i]]],
+                        'click_probability': float(click_probabilities[j, i]),
+                        'similarity': float(similarities[j, i]),
+                        'combined_score': float(combined_scores[j, i]),
+                        'from_collaborative_filtering': False  # 简化版本
+                    } for i in top_k_indices(user_scores, n_select)]
+
+        return results
+
+    def _score_ads_per_ad(self, user_id: str, top_k: int) -> List[Dict[str, Any]]:
+        """逐个广告打分（原始实现，保留用于结果校验和基准对比）
+
+        广告特征由广告信息直接按 float64 计算，不读取特征存储中的 float32 行，作为批量路径的独立参照。
+        """
         recommendations = []
         user_feature = self.data_processor.create_user_features(user_id)
 
-        for ad_id in self.data_processor.ad_inventory.keys():
-            ad_feature = self.data_processor.create_ad_features(ad_id)
+        for ad_id, ad_info in self.data_processor.ad_inventory.items():
+            if Config.ELIGIBILITY_FILTER_ENABLED and not self._is_eligible(user_id, ad_id):
+                continue
+            ad_feature = self.data_processor._build_ad_features(ad_info)
 
             click_probability = self.recommendation_model.predict_click_probability(user_feature, ad_feature)
             similarity = self.feature_engineer.calculate_similarity(user_feature, ad_feature)
@@ -177,10 +595,49 @@ class PersonalizedAdRecommendation:
         recommendations.sort(key=lambda x: x['combined_score'], reverse=True)
         return recommendations[:top_k]
 
+    def _is_eligible(self, user_id: str, ad_id: str) -> bool:
+        row = self.data_processor.ad_features.row_of(ad_id)
+        return row is not None and len(self.data_processor.filter_eligible(user_id, np.array([row]))) == 1
+
     def record_user_interaction(self, user_id: str, ad_id: str, action: str):
         """记录用户交互"""
-        print(f"记录交互: 用户 {user_id} -> 广告 {ad_id} -> 行为 {action}")
+        logger.debug("记录交互: 用户 %s -> 广告 %s -> 行为 %s", user_id, ad_id, action)
         self.data_processor.save_interaction_to_db(user_id, ad_id, action)
+        self.result_cache.invalidate_user(user_id)
+        INTERACTIONS.inc(action=action)
+        self._update_click_model()
+
+    def apply_persisted_interaction(self, user_id: str, ad_id: str, action: str, timestamp):
+        """交互记录已由调用方写入数据库（如 API 的异步数据访问层）后，只更新内存状态"""
+        self.data_processor.record_interaction_in_memory(user_id, ad_id, action, timestamp)
+        self.result_cache.invalidate_user(user_id)
+        INTERACTIONS.inc(action=action)
+        self._update_click_model()
+
+    @writes_state
+    def sync_from_db(self) -> Dict[str, Any]:
+        """增量同步其他写入方的新数据，并把新增交互同步到嵌入模型
+
+        用户画像变更通过画像回调、广告变更通过广告库版本号使推荐缓存失效，
+        有新增交互的用户单独失效。
+        """
+        stats = self.data_processor.sync_delta()
+        interaction_log = self.data_processor.interaction_history
+        affected_users = set()
+        new_interactions = itertools.islice(interaction_log.iter_tuples(stats["first_new_interaction"]),
+                                            stats["interactions"])
+        for user_id, ad_id, action, timestamp_us in new_interactions:
+            self.user_embedding_model.update_user_embedding(user_id, ad_id, action, timestamp_us)
+            affected_users.add(user_id)
+        for user_id in affected_users:
+            self.result_cache.invalidate_user(user_id)
+        self._update_click_model()
+
+        self.last_sync = stats
+        if stats["users"] or stats["ads_upserted"] or stats["ads_deactivated"] or stats["interactions"]:
+            print(f"🔄 增量同步: {stats['users']} 用户, {stats['ads_upserted']} 广告更新, "
+                  f"{stats['ads_deactivated']} 广告下线, {stats['interactions']} 交互记录")
+        return stats
 
     def display_recommendations(self, user_id: str):
         """显示推荐结果"""
@@ -201,17 +658,15 @@ class PersonalizedAdRecommendation:
 
 
 def main():
+    logging.basicConfig(level=Config.LOG_LEVEL, format="%(asctime)s %(levelname)s %(name)s: %(message)s")
     try:
         # 初始化数据库
         init_database()
 
-        # 创建数据库会话
-        db = SessionLocal()
-
         try:
-            # 创建推荐系统实例
+            # 创建推荐系统实例（每个工作单元从连接池取独立的会话）
             print("🔧 创建推荐系统实例...")
-            ad_system = PersonalizedAdRecommendation(db)
+            ad_system = PersonalizedAdRecommendation(session_factory=SessionLocal)
 
             # 初始化系统
             ad_system.initialize()
@@ -227,8 +682,6 @@ def main():
             print(f"❌ 系统运行错误: {e}")
             import traceback
             traceback.print_exc()
-        finally:
-            db.close()
 
     except Exception as e:
         print(f"❌ 数据库初始化失败: {e}")
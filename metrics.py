@@ -0,0 +1,220 @@
+import bisect
+import functools
+import threading
+import time
+from contextlib import contextmanager, nullcontext
+from typing import Dict, List, Sequence, Tuple
+from config import Config
+import tracing
+
+# 延迟直方图的默认桶边界（秒），覆盖从单次特征构建（亚毫秒）到启动时加载/训练（数十秒）
+DEFAULT_BUCKETS = (0.0001, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5,
+                   1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+
+def _format_labels(labelnames: Sequence[str], labelvalues: Tuple[str, ...], extra: str = "") -> str:
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(labelnames, labelvalues)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+def _escape(value: str) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_value(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class Counter:
+    """单调递增计数器，按标签值分别计数"""
+
+    type_name = "counter"
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._values: Dict[Tuple[str, ...], float] = {}
+        self._lock = threading.Lock()
+
+    def inc(self, amount: float = 1, **labels):
+        key = tuple(str(labels[name]) for name in self.labelnames)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def value(self, **labels) -> float:
+        return self._values.get(tuple(str(labels[name]) for name in self.labelnames), 0)
+
+    def collect(self) -> List[str]:
+        with self._lock:
+            items = sorted(self._values.items())
+        return [f"{self.name}{_format_labels(self.labelnames, key)} {_format_value(value)}"
+                for key, value in items]
+
+
+class Histogram:
+    """延迟直方图：累计桶计数 + 总和 + 次数（Prometheus histogram 语义）"""
+
+    type_name = "histogram"
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = (),
+                 buckets: Sequence[float] = DEFAULT_BUCKETS):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self.buckets = tuple(sorted(buckets))
+        # 标签值 -> [各桶计数（非累计，最后一个为 +Inf）, 总和, 次数]
+        self._series: Dict[Tuple[str, ...], list] = {}
+        self._lock = threading.Lock()
+
+    def observe(self, value: float, **labels):
+        key = tuple(str(labels[name]) for name in self.labelnames)
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(key)
+            if series is None:
+                series = self._series[key] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+            series[0][index] += 1
+            series[1] += value
+            series[2] += 1
+
+    @contextmanager
+    def time(self, **labels):
+        """计时上下文：退出时（包括抛出异常）记录耗时秒数"""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - start, **labels)
+
+    def summary(self, **labels) -> Dict[str, float]:
+        """某组标签的次数、总耗时和平均耗时"""
+        series = self._series.get(tuple(str(labels[name]) for name in self.labelnames))
+        if series is None:
+            return {"count": 0, "sum": 0.0, "avg": 0.0}
+        return {"count": series[2], "sum": series[1], "avg": series[1] / series[2]}
+
+    def collect(self) -> List[str]:
+        with self._lock:
+            items = sorted((key, (list(counts), total, count)) for key, (counts, total, count) in self._series.items())
+        lines = []
+        for key, (counts, total, count) in items:
+            cumulative = 0
+            for bound, bucket_count in zip(self.buckets + (float("inf"),), counts):
+                cumulative += bucket_count
+                le = f'le="{_format_value(bound)}"'
+                lines.append(f"{self.name}_bucket{_format_labels(self.labelnames, key, le)} {cumulative}")
+            lines.append(f"{self.name}_sum{_format_labels(self.labelnames, key)} {_format_value(total)}")
+            lines.append(f"{self.name}_count{_format_labels(self.labelnames, key)} {count}")
+        return lines
+
+
+class MetricsRegistry:
+    """指标注册表，按 Prometheus 文本格式（0.0.4）导出全部指标"""
+
+    def __init__(self):
+        self._metrics: Dict[str, object] = {}
+        self._lock = threading.Lock()
+
+    def _register(self, metric):
+        with self._lock:
+            existing = self._metrics.get(metric.name)
+            if existing is not None:
+                if type(existing) is not type(metric) or existing.labelnames != metric.labelnames:
+                    raise ValueError(f"指标 {metric.name} 已以不同的类型或标签注册")
+                return existing
+            self._metrics[metric.name] = metric
+            return metric
+
+    def counter(self, name: str, documentation: str, labelnames: Sequence[str] = ()) -> Counter:
+        return self._register(Counter(name, documentation, labelnames))
+
+    def histogram(self, name: str, documentation: str, labelnames: Sequence[str] = (),
+                  buckets: Sequence[float] = DEFAULT_BUCKETS) -> Histogram:
+        return self._register(Histogram(name, documentation, labelnames, buckets))
+
+    def render(self) -> str:
+        with self._lock:
+            metrics = list(self._metrics.values())
+        lines = []
+        for metric in metrics:
+            lines.append(f"# HELP {metric.name} {metric.documentation}")
+            lines.append(f"# TYPE {metric.name} {metric.type_name}")
+            lines.extend(metric.collect())
+        return "\n".join(lines) + "\n"
+
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+registry = MetricsRegistry()
+
+# 推荐链路与启动过程各阶段的耗时
+STAGE_SECONDS = registry.histogram(
+    "ad_stage_duration_seconds",
+    "各处理阶段耗时（秒）：feature_build, click_predict, similarity, top_k, db_commit, data_load, train, "
+    "model_load, retrain, model_swap, online_update",
+    labelnames=("stage",)
+)
+RECOMMENDATIONS = registry.counter("ad_recommendations_total", "推荐请求次数（按结果缓存是否命中）", ("cache",))
+INTERACTIONS = registry.counter("ad_interactions_total", "记录的交互次数（按行为）", ("action",))
+MODEL_RETRAINS = registry.counter("ad_model_retrains_total", "后台重新训练次数（按结果 success/failure）", ("result",))
+
+# API 各接口（按路由模板，不含路径参数值）的请求数、错误数和延迟
+HTTP_REQUESTS = registry.counter("ad_http_requests_total", "HTTP 请求数", ("method", "endpoint", "status"))
+HTTP_ERRORS = registry.counter("ad_http_errors_total", "HTTP 错误响应数（状态码 >= 400 或未处理异常）",
+                               ("method", "endpoint", "status"))
+HTTP_REQUEST_SECONDS = registry.histogram("ad_http_request_duration_seconds", "HTTP 请求处理耗时（秒）",
+                                          ("method", "endpoint"))
+
+
+class _StageTimer:
+    """阶段计时：记录到阶段耗时直方图，当前请求开启了追踪时同时记录为追踪中的一个 span"""
+
+    __slots__ = ("stage", "observe", "span", "start")
+
+    def __init__(self, stage: str, observe: bool, trace):
+        self.stage = stage
+        self.observe = observe
+        self.span = tracing.span(stage) if trace is not None else None
+
+    def __enter__(self):
+        if self.span is not None:
+            self.span.__enter__()
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        if self.observe:
+            STAGE_SECONDS.observe(time.perf_counter() - self.start, stage=self.stage)
+        if self.span is not None:
+            self.span.__exit__(exc_type, exc, tb)
+        return False
+
+
+_NOOP_TIMER = nullcontext()
+
+
+def stage_timer(stage: str):
+    """阶段计时上下文，如 with stage_timer("click_predict"): ...
+
+    Config.METRICS_ENABLED 为 False 且当前请求未开启追踪时返回空上下文。
+    """
+    trace = tracing.current_trace()
+    if not Config.METRICS_ENABLED and trace is None:
+        return _NOOP_TIMER
+    return _StageTimer(stage, Config.METRICS_ENABLED, trace)
+
+
+def timed_stage(stage: str):
+    """方法/函数装饰器：整个调用计入 stage 阶段耗时"""
+    def decorator(fn):
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            with stage_timer(stage):
+                return fn(*args, **kwargs)
+        return wrapper
+    return decorator
@@ -1,2 +1,8 @@
 from .recommendation_model import RecommendationModel
-from .user_embedding import UserEmbeddingModel
\ No newline at end of file
+from .online_click_model import OnlineClickModel
+from .user_embedding import UserEmbeddingModel
+from .ranking import top_k_indices
+from .vector_index import BruteForceIndex, IVFIndex, create_vector_index
+from .embedding_store import EmbeddingStore
+from .interaction_history import UserInteractionHistory
+from .artifact_store import ArtifactStore, schema_hash
@@ -0,0 +1,116 @@
+import hashlib
+import json
+import os
+import shutil
+import uuid
+from datetime import datetime
+from typing import Any, Dict, List, Optional
+import numpy as np
+
+# 特征构造方式（DataProcessor 中用户/广告特征的含义与顺序）变化时递增，使旧的模型产物不再被加载
+FEATURE_SCHEMA_VERSION = 1
+
+CLICK_MODEL_FILE = "click_model.joblib"
+EMBEDDINGS_FILE = "embeddings.npz"
+METADATA_FILE = "metadata.json"
+
+
+def schema_hash(schema: Dict[str, Any]) -> str:
+    """特征/模型结构描述的哈希，只有哈希相同的产物才能直接加载"""
+    encoded = json.dumps({"feature_schema_version": FEATURE_SCHEMA_VERSION, **schema}, sort_keys=True)
+    return hashlib.sha256(encoded.encode("utf-8")).hexdigest()[:16]
+
+
+class ArtifactStore:
+    """版本化的模型产物目录
+
+    每个版本一个子目录 v000001、v000002 ...，包含点击模型与特征标准化器（joblib）、
+    用户/广告嵌入矩阵与交互历史（npz）以及元数据（训练数据高水位、特征结构哈希、训练时间等）。
+    写入时先写临时目录再整体重命名，读取方不会看到写了一半的版本；只保留最近 keep 个版本。
+    """
+
+    def __init__(self, root: str, keep: int = 3):
+        self.root = root
+        self.keep = keep
+
+    def path_of(self, version: int) -> str:
+        return os.path.join(self.root, f"v{version:06d}")
+
+    def versions(self) -> List[int]:
+        """已完成写入的版本号（升序）"""
+        if not os.path.isdir(self.root):
+            return []
+        versions = []
+        for name in os.listdir(self.root):
+            if name.startswith("v") and name[1:].isdigit():
+                versions.append(int(name[1:]))
+        return sorted(versions)
+
+    def read_metadata(self, version: int) -> Optional[Dict[str, Any]]:
+        """读取版本元数据，文件缺失或损坏时返回 None"""
+        try:
+            with open(os.path.join(self.path_of(version), METADATA_FILE), encoding="utf-8") as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return None
+
+    def latest_compatible(self, expected_schema_hash: str) -> Optional[int]:
+        """特征结构哈希一致且文件完整的最新版本"""
+        for version in reversed(self.versions()):
+            metadata = self.read_metadata(version)
+            if metadata is None or metadata.get("schema_hash") != expected_schema_hash:
+                continue
+            path = self.path_of(version)
+            if all(os.path.exists(os.path.join(path, name)) for name in (CLICK_MODEL_FILE, EMBEDDINGS_FILE)):
+                return version
+        return None
+
+    def save(self, recommendation_model, embedding_model, metadata: Dict[str, Any]) -> int:
+        """保存一个新版本，返回版本号
+
+        Args:
+            recommendation_model: 已训练的 RecommendationModel
+            embedding_model: UserEmbeddingModel
+            metadata: 额外元数据（至少包含 schema_hash 和 watermark）
+        """
+        os.makedirs(self.root, exist_ok=True)
+        tmp_path = os.path.join(self.root, f".tmp-{uuid.uuid4().hex}")
+        os.makedirs(tmp_path)
+        try:
+            recommendation_model.save_model(os.path.join(tmp_path, CLICK_MODEL_FILE))
+            np.savez(os.path.join(tmp_path, EMBEDDINGS_FILE), **embedding_model.get_state())
+
+            # 重命名到已存在的目录会失败（另一个进程同时保存时），此时换下一个版本号重试
+            while True:
+                version = (self.versions() or [0])[-1] + 1
+                with open(os.path.join(tmp_path, METADATA_FILE), "w", encoding="utf-8") as f:
+                    json.dump({**metadata, "version": version, "saved_at": datetime.now().isoformat()},
+                              f, ensure_ascii=False, indent=2)
+                try:
+                    os.rename(tmp_path, self.path_of(version))
+                    break
+                except OSError:
+                    if not os.path.exists(self.path_of(version)):
+                        raise
+        except Exception:
+            shutil.rmtree(tmp_path, ignore_errors=True)
+            raise
+
+        self.prune()
+        return version
+
+    def load(self, version: int, recommendation_model, embedding_model) -> Dict[str, Any]:
+        """把指定版本加载到传入的（新建的）模型对象中，返回元数据"""
+        path = self.path_of(version)
+        metadata = self.read_metadata(version)
+        if metadata is None:
+            raise FileNotFoundError(f"模型版本 {version} 的元数据缺失或损坏")
+        recommendation_model.load_model(os.path.join(path, CLICK_MODEL_FILE))
+        with np.load(os.path.join(path, EMBEDDINGS_FILE)) as state:
+            embedding_model.load_state(dict(state))
+        return metadata
+
+    def prune(self):
+        """删除超出保留数量的旧版本"""
+        for version in self.versions()[:-self.keep] if self.keep > 0 else []:
+            shutil.rmtree(self.path_of(version), ignore_errors=True)
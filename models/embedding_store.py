@@ -0,0 +1,130 @@
+import numpy as np
+from collections.abc import MutableMapping
+from typing import Dict, Hashable, Iterator, List, Optional
+
+
+class EmbeddingStore(MutableMapping):
+    """紧凑的嵌入向量存储：可增长的连续 float32 矩阵 + id→行号索引 + 空闲行列表
+
+    兼容 dict 的读写方式（store[id]、store[id] = vector、del store[id]、in、len、遍历），
+    store[id] 返回矩阵中该行的视图，as_matrix() 返回全部已分配行的矩阵视图，便于批量打分。
+    """
+
+    def __init__(self, dim: int, initial_capacity: int = 1024, dtype=np.float32):
+        self.dim = dim
+        self.dtype = np.dtype(dtype)
+        self._matrix = np.zeros((max(initial_capacity, 1), dim), dtype=self.dtype)
+        self._active = np.zeros(max(initial_capacity, 1), dtype=bool)
+        self.ids: List[Optional[Hashable]] = []  # 行号 -> id（空闲行为 None）
+        self.index: Dict[Hashable, int] = {}  # id -> 行号
+        self._free_rows: List[int] = []
+
+    # ---- dict 兼容接口 ----
+    def __getitem__(self, item_id: Hashable) -> np.ndarray:
+        return self._matrix[self.index[item_id]]
+
+    def __setitem__(self, item_id: Hashable, vector: np.ndarray):
+        self.set(item_id, vector)
+
+    def __delitem__(self, item_id: Hashable):
+        if not self.remove(item_id):
+            raise KeyError(item_id)
+
+    def __iter__(self) -> Iterator[Hashable]:
+        return iter(list(self.index))
+
+    def __len__(self) -> int:
+        return len(self.index)
+
+    def __contains__(self, item_id) -> bool:
+        return item_id in self.index
+
+    # ---- 行级接口 ----
+    @property
+    def size(self) -> int:
+        """已分配的行数（包含空闲行）"""
+        return len(self.ids)
+
+    @property
+    def capacity(self) -> int:
+        return len(self._matrix)
+
+    @property
+    def nbytes(self) -> int:
+        """矩阵本身占用的字节数"""
+        return self._matrix.nbytes + self._active.nbytes
+
+    def _grow(self):
+        """按 1.25 倍扩容：追加成本仍是摊销 O(1)，空余容量最多 25%（翻倍扩容最多空出一半）"""
+        capacity = self.capacity + max(self.capacity // 4, 1)
+        matrix = np.zeros((capacity, self.dim), dtype=self.dtype)
+        matrix[:self.size] = self._matrix[:self.size]
+        active = np.zeros(capacity, dtype=bool)
+        active[:self.size] = self._active[:self.size]
+        self._matrix, self._active = matrix, active
+
+    def shrink_to_fit(self):
+        """释放扩容留下的空余容量（批量加载/训练结束后调用），之后再追加时按倍数重新扩容"""
+        capacity = max(self.size, 1)
+        if capacity < self.capacity:
+            self._matrix = self._matrix[:capacity].copy()
+            self._active = self._active[:capacity].copy()
+
+    def set(self, item_id: Hashable, vector: np.ndarray) -> int:
+        """写入向量（新 id 优先复用空闲行），返回行号"""
+        row = self.index.get(item_id)
+        if row is None:
+            if self._free_rows:
+                row = self._free_rows.pop()
+                self.ids[row] = item_id
+            else:
+                row = self.size
+                if row >= self.capacity:
+                    self._grow()
+                self.ids.append(item_id)
+            self.index[item_id] = row
+            self._active[row] = True
+        self._matrix[row] = vector
+        return row
+
+    def remove(self, item_id: Hashable) -> bool:
+        """删除向量，行号放入空闲列表等待复用"""
+        row = self.index.pop(item_id, None)
+        if row is None:
+            return False
+        self._matrix[row] = 0
+        self._active[row] = False
+        self.ids[row] = None
+        self._free_rows.append(row)
+        return True
+
+    def row_of(self, item_id: Hashable) -> Optional[int]:
+        return self.index.get(item_id)
+
+    def as_matrix(self) -> np.ndarray:
+        """全部已分配行的矩阵视图 (size, dim)，空闲行为全零，配合 active_mask() 使用"""
+        return self._matrix[:self.size]
+
+    def active_mask(self) -> np.ndarray:
+        """已分配行中哪些行正在使用"""
+        return self._active[:self.size]
+
+    # ---- 持久化 ----
+    def to_arrays(self) -> Dict[str, np.ndarray]:
+        """导出为数组（可直接 np.savez 保存）：ids（空闲行为空字符串）、矩阵、使用中标记，行号保持不变"""
+        return {
+            "ids": np.array(["" if item_id is None else item_id for item_id in self.ids], dtype=str),
+            "matrix": self.as_matrix().copy(),
+            "active": self.active_mask().copy()
+        }
+
+    @classmethod
+    def from_arrays(cls, ids: np.ndarray, matrix: np.ndarray, active: np.ndarray, dtype=np.float32) -> "EmbeddingStore":
+        """由 to_arrays 的结果重建存储"""
+        store = cls(matrix.shape[1], initial_capacity=len(ids), dtype=dtype)
+        store._matrix[:len(ids)] = matrix
+        store._active[:len(ids)] = active
+        store.ids = [str(item_id) if is_active else None for item_id, is_active in zip(ids, active)]
+        store.index = {item_id: row for row, item_id in enumerate(store.ids) if item_id is not None}
+        store._free_rows = [row for row, is_active in enumerate(active) if not is_active]
+        return store
@@ -0,0 +1,127 @@
+import time
+import numpy as np
+from typing import Dict, Hashable, List, Optional, Tuple
+
+
+class UserInteractionHistory:
+    """有界的用户交互历史：每个用户一个固定深度的环形缓冲区
+
+    所有用户共用三块二维类型化数组（广告行号 int32、行为编码 int8、时间戳 int64 微秒），
+    每个用户占一行，写满后覆盖最旧的记录，内存只随用户数增长，不随总流量增长。
+    """
+
+    def __init__(self, actions: List[str], depth: int = 50, max_age_seconds: Optional[float] = None,
+                 initial_users: int = 1024):
+        """
+        Args:
+            actions: 行为名称列表，下标即行为编码
+            depth: 每个用户保留的最近交互条数
+            max_age_seconds: 超过该时长的交互视为过期，None 表示不过期
+        """
+        self.actions = list(actions)
+        self.action_codes = {action: code for code, action in enumerate(self.actions)}
+        self.depth = depth
+        self.max_age_seconds = max_age_seconds
+        self._slots: Dict[Hashable, int] = {}  # user_id -> 行号
+        self._ad_rows = np.zeros((initial_users, depth), dtype=np.int32)
+        self._action_codes = np.zeros((initial_users, depth), dtype=np.int8)
+        self._timestamps = np.zeros((initial_users, depth), dtype=np.int64)
+        self._heads = np.zeros(initial_users, dtype=np.int32)  # 下一次写入的位置
+        self._counts = np.zeros(initial_users, dtype=np.int32)  # 已写入条数（不超过 depth）
+
+    def __contains__(self, user_id: Hashable) -> bool:
+        return user_id in self._slots
+
+    def __len__(self) -> int:
+        return len(self._slots)
+
+    @property
+    def nbytes(self) -> int:
+        return sum(a.nbytes for a in (self._ad_rows, self._action_codes, self._timestamps, self._heads, self._counts))
+
+    @staticmethod
+    def now_us() -> int:
+        return time.time_ns() // 1000
+
+    def _grow(self):
+        capacity = 2 * len(self._heads)
+
+        def grown(array):
+            result = np.zeros((capacity,) + array.shape[1:], dtype=array.dtype)
+            result[:len(array)] = array
+            return result
+
+        self._ad_rows = grown(self._ad_rows)
+        self._action_codes = grown(self._action_codes)
+        self._timestamps = grown(self._timestamps)
+        self._heads = grown(self._heads)
+        self._counts = grown(self._counts)
+
+    def _slot(self, user_id: Hashable) -> int:
+        slot = self._slots.get(user_id)
+        if slot is None:
+            slot = len(self._slots)
+            if slot >= len(self._heads):
+                self._grow()
+            self._slots[user_id] = slot
+        return slot
+
+    def append(self, user_id: Hashable, ad_row: int, action: str, timestamp_us: Optional[int] = None):
+        """记录一条交互，缓冲区满时覆盖最旧的记录；未知行为编码为 -1"""
+        slot = self._slot(user_id)
+        head = self._heads[slot]
+        self._ad_rows[slot, head] = ad_row
+        self._action_codes[slot, head] = self.action_codes.get(action, -1)
+        self._timestamps[slot, head] = self.now_us() if timestamp_us is None else timestamp_us
+        self._heads[slot] = (head + 1) % self.depth
+        self._counts[slot] = min(self._counts[slot] + 1, self.depth)
+
+    def recent(self, user_id: Hashable, n: Optional[int] = None,
+               now_us: Optional[int] = None) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+        """最近 n 条交互（从新到旧），返回 (广告行号, 行为编码, 时间戳微秒) 三个数组，已过期的记录不返回"""
+        slot = self._slots.get(user_id)
+        if slot is None:
+            return np.zeros(0, dtype=np.int32), np.zeros(0, dtype=np.int8), np.zeros(0, dtype=np.int64)
+
+        count = int(self._counts[slot])
+        if n is not None:
+            count = min(count, n)
+        positions = (self._heads[slot] - 1 - np.arange(count)) % self.depth
+        ad_rows = self._ad_rows[slot, positions]
+        action_codes = self._action_codes[slot, positions]
+        timestamps = self._timestamps[slot, positions]
+
+        if self.max_age_seconds:
+            cutoff = (self.now_us() if now_us is None else now_us) - int(self.max_age_seconds * 1_000_000)
+            fresh = timestamps >= cutoff
+            ad_rows, action_codes, timestamps = ad_rows[fresh], action_codes[fresh], timestamps[fresh]
+        return ad_rows, action_codes, timestamps
+
+    def to_arrays(self) -> Dict[str, np.ndarray]:
+        """导出为数组（可直接 np.savez 保存），users 按行号排列"""
+        n_users = len(self._slots)
+        return {
+            "users": np.array(list(self._slots), dtype=str),
+            "ad_rows": self._ad_rows[:n_users].copy(),
+            "action_codes": self._action_codes[:n_users].copy(),
+            "timestamps": self._timestamps[:n_users].copy(),
+            "heads": self._heads[:n_users].copy(),
+            "counts": self._counts[:n_users].copy()
+        }
+
+    def load_arrays(self, arrays: Dict[str, np.ndarray]):
+        """用 to_arrays 的结果替换当前内容（环形缓冲区深度必须一致）"""
+        if arrays["ad_rows"].shape[1] != self.depth:
+            raise ValueError(f"交互历史深度不一致: {arrays['ad_rows'].shape[1]} != {self.depth}")
+        n_users = len(arrays["users"])
+        while len(self._heads) < n_users:
+            self._grow()
+        self._slots = {str(user_id): slot for slot, user_id in enumerate(arrays["users"])}
+        self._ad_rows[:n_users] = arrays["ad_rows"]
+        self._action_codes[:n_users] = arrays["action_codes"]
+        self._timestamps[:n_users] = arrays["timestamps"]
+        self._heads[:n_users] = arrays["heads"]
+        self._counts[:n_users] = arrays["counts"]
+
+    def action_name(self, code: int) -> str:
+        return self.actions[code] if 0 <= code < len(self.actions) else "unknown"
@@ -0,0 +1,89 @@
+import threading
+import numpy as np
+from sklearn.linear_model import SGDClassifier
+from sklearn.preprocessing import StandardScaler
+
+
+class OnlineClickModel:
+    """在线点击率模型：特征标准化 + SGD 训练的逻辑回归（log_loss），可用 partial_fit 按小批量增量更新
+
+    与 RandomForestClassifier 一样提供 fit / predict_proba / classes_，可直接作为 RecommendationModel.model；
+    整个对象可用 joblib 保存和加载（模型产物中的 click_model.joblib）。
+    标准化器只在 fit（或首次增量更新）时拟合，之后保持不变，避免已学到的权重与特征缩放不一致。
+
+    训练用的 SGDClassifier 与标准化器只由训练方读写；每次训练后把 (均值, 标准差, 权重, 偏置) 复制成一个
+    新的元组整体替换 _published，predict_proba 只读取一次该引用，并发打分不会读到更新了一半的模型。
+    """
+
+    def __init__(self, alpha: float = 1e-4, random_state: int = 42):
+        """
+        Args:
+            alpha: L2 正则化系数
+            random_state: 随机种子（fit 时打乱样本顺序）
+        """
+        self.scaler = StandardScaler()
+        self.classifier = SGDClassifier(loss="log_loss", alpha=alpha, random_state=random_state)
+        self.classes_ = np.array([0, 1])
+        self.scaler_fitted = False
+        self.n_updates = 0
+        self.n_samples_seen = 0
+        self._published = None
+        # 训练（fit / partial_fit）同一时间只允许一个
+        self._lock = threading.Lock()
+
+    def __getstate__(self):
+        state = self.__dict__.copy()
+        del state["_lock"]
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self._lock = threading.Lock()
+        # 兼容发布参数之前保存的模型产物
+        if "_published" not in state:
+            self._published = None
+            if self.scaler_fitted and hasattr(self.classifier, "coef_"):
+                self._publish()
+
+    def _publish(self):
+        self._published = (self.scaler.mean_.copy(), self.scaler.scale_.copy(),
+                           self.classifier.coef_[0].copy(), float(self.classifier.intercept_[0]))
+
+    def fit(self, X, y):
+        """全量训练（多轮迭代直到收敛）；样本只有一个类别时退化为一次增量更新"""
+        with self._lock:
+            self.scaler.fit(X)
+            self.scaler_fitted = True
+            X = self.scaler.transform(X)
+            if len(np.unique(y)) < len(self.classes_):
+                self.classifier.partial_fit(X, y, classes=self.classes_)
+            else:
+                self.classifier.fit(X, y)
+            self.n_samples_seen = len(X)
+            self._publish()
+        return self
+
+    def partial_fit(self, X, y):
+        """用一个小批量样本做一轮 SGD 更新，完成后发布新的模型参数"""
+        with self._lock:
+            if not self.scaler_fitted:
+                self.scaler.fit(X)
+                self.scaler_fitted = True
+            self.classifier.partial_fit(self.scaler.transform(X), y, classes=self.classes_)
+            self.n_updates += 1
+            self.n_samples_seen += len(X)
+            self._publish()
+        return self
+
+    def predict_proba(self, X):
+        """按最近一次发布的参数预测，返回 (n, 2)：未点击/点击概率（与 SGDClassifier.predict_proba 一致）"""
+        published = self._published
+        if published is None:
+            raise ValueError("OnlineClickModel 尚未训练")
+        mean, scale, coef, intercept = published
+        X = np.asarray(X, dtype=np.float64)
+        probabilities = 1.0 / (1.0 + np.exp(-(((X - mean) / scale) @ coef + intercept)))
+        return np.column_stack([1.0 - probabilities, probabilities])
+
+    def score(self, X, y):
+        return float(np.mean((self.predict_proba(X)[:, 1] >= 0.5).astype(int) == np.asarray(y)))
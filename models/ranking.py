@@ -0,0 +1,23 @@
+import numpy as np
+
+
+def top_k_indices(scores: np.ndarray, k: int) -> np.ndarray:
+    """按分数从高到低选出前 k 个下标
+
+    使用 np.partition 做部分选择，只对入选的 k 个元素排序。
+    分数相同时下标小的在前，与稳定降序排序 np.argsort(-scores, kind="stable")[:k] 结果一致。
+    """
+    n = len(scores)
+    if k <= 0 or n == 0:
+        return np.zeros(0, dtype=np.int64)
+    if k >= n:
+        return np.argsort(-scores, kind="stable")
+
+    # 第 k 大的分数作为阈值：严格大于阈值的全部入选，等于阈值的按下标顺序补足
+    threshold = np.partition(scores, n - k)[n - k]
+    above = np.flatnonzero(scores > threshold)
+    ties = np.flatnonzero(scores == threshold)[:k - len(above)]
+    candidates = np.concatenate([above, ties])
+
+    order = np.lexsort((candidates, -scores[candidates]))
+    return candidates[order]
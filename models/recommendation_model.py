@@ -4,6 +4,9 @@ from sklearn.preprocessing import StandardScaler
 from sklearn.metrics.pairwise import cosine_similarity
 import joblib
 import os
+from config import Config
+from .online_click_model import OnlineClickModel
+import tracing
 
 
 class SimpleFeatureEngineer:
@@ -46,54 +49,76 @@ class SimpleFeatureEngineer:
 
 
 class RecommendationModel:
-    def __init__(self):
-        self.model = RandomForestClassifier(n_estimators=100, random_state=42)
+    def __init__(self, model_type: str = None):
+        """
+        Args:
+            model_type: 点击模型类型，random_forest（随机森林，只能全量训练）或 sgd（在线逻辑回归，
+                支持按新交互增量更新），默认取 Config.CLICK_MODEL_TYPE
+        """
+        self.model_type = model_type or Config.CLICK_MODEL_TYPE
+        if self.model_type == "sgd":
+            self.model = OnlineClickModel(alpha=Config.ONLINE_SGD_ALPHA)
+        elif self.model_type == "random_forest":
+            self.model = RandomForestClassifier(n_estimators=100, random_state=42)
+        else:
+            raise ValueError(f"未知的点击模型类型: {self.model_type}")
         self.feature_engineer = SimpleFeatureEngineer()
         self.is_trained = False
         self.combined_feature_dim = 16  # 用户8维 + 广告8维
 
     def prepare_training_data(self, data_processor):
         """准备训练数据"""
-        X = []
-        y = []
+        # 收集用户特征
+        user_features = [data_processor.create_user_features(user_id)
+                         for user_id in data_processor.user_profiles.keys()]
 
-        # 收集所有特征用于标准化
-        all_features = []
+        # 广告特征直接读取广告特征存储
+        _, ad_matrix = data_processor.ad_features.active_matrix()
 
-        # 收集用户特征
-        for user_id in data_processor.user_profiles.keys():
-            user_feature = data_processor.create_user_features(user_id)
-            all_features.append(user_feature)
-
-        # 收集广告特征
-        for ad_id in data_processor.ad_inventory.keys():
-            ad_feature = data_processor.create_ad_features(ad_id)
-            all_features.append(ad_feature)
-
-        # 转换为numpy数组
-        if all_features:
-            all_features = np.array(all_features)
+        # 收集所有特征用于标准化
+        all_features = np.vstack([np.array(user_features).reshape(-1, data_processor.feature_dim), ad_matrix])
+        if len(all_features) > 0:
             # 拟合特征工程
             self.feature_engineer.fit(all_features)
 
-        # 准备训练样本
-        for interaction in data_processor.interaction_history:
-            user_id = interaction["user_id"]
-            ad_id = interaction["ad_id"]
-            action = interaction["action"]
+        if not data_processor.interaction_history:
+            return np.array([]), np.array([])
+
+        return self.interaction_samples(data_processor)
+
+    @staticmethod
+    def interaction_samples(data_processor, start: int = 0, end: int = None):
+        """交互日志 [start, end) 区间的训练样本 (X, y)
+
+        按区间内出现的唯一用户/广告各构建一次特征，再按交互日志的编码列整体索引。
+        """
+        log = data_processor.interaction_history
+        user_codes, ad_codes, action_codes, _ = (column[start:end] for column in log.columns())
+        users, user_rows = np.unique(user_codes, return_inverse=True)
+        ads, ad_rows = np.unique(ad_codes, return_inverse=True)
+        user_matrix = np.array([data_processor.create_user_features(log.users.values[code]) for code in users])
+        ad_matrix = data_processor.ad_features.lookup([log.ads.values[code] for code in ads])
+
+        # 标签：点击为1，其他为0
+        y = (action_codes == log.actions.codes.get("click", -1)).astype(int)
 
-            user_feature = data_processor.create_user_features(user_id)
-            ad_feature = data_processor.create_ad_features(ad_id)
+        # 合并特征 - 用户8维 + 广告8维
+        X = np.hstack([user_matrix.reshape(-1, data_processor.feature_dim)[user_rows], ad_matrix[ad_rows]])
+        return X, y
 
-            # 合并特征 - 现在维度一致了
-            combined_feature = np.concatenate([user_feature, ad_feature])
-            X.append(combined_feature)
+    @property
+    def supports_online_updates(self) -> bool:
+        return isinstance(self.model, OnlineClickModel)
 
-            # 标签：点击为1，其他为0
-            label = 1 if action == "click" else 0
-            y.append(label)
+    def partial_fit(self, data_processor, start: int, end: int = None) -> int:
+        """用交互日志 [start, end) 区间的新交互增量更新点击模型（仅在线模型，且已完成全量训练），返回样本数"""
+        if not self.supports_online_updates or not self.is_trained:
+            return 0
 
-        return np.array(X) if X else np.array([]), np.array(y) if y else np.array([])
+        X, y = self.interaction_samples(data_processor, start, end)
+        if len(X) > 0:
+            self.model.partial_fit(X, y)
+        return len(X)
 
     def train(self, data_processor):
         """训练模型"""
@@ -134,15 +159,79 @@ class RecommendationModel:
             print(f"预测错误: {e}")
             return 0.5
 
+    def predict_click_probabilities(self, user_feature, ad_features):
+        """批量预测点击概率：一个用户对多个广告，只调用一次 predict_proba
+
+        Args:
+            user_feature: 用户特征向量 (8,)
+            ad_features: 广告特征矩阵 (n_ads, 8)
+
+        Returns:
+            点击概率数组 (n_ads,)
+        """
+        n_ads = len(ad_features)
+        if not self.is_trained or len(user_feature) == 0 or n_ads == 0:
+            return np.full(n_ads, 0.5)
+
+        # 构建 (n_ads, 16) 的合并特征矩阵
+        with tracing.span("combine_features"):
+            user_block = np.broadcast_to(user_feature, (n_ads, len(user_feature)))
+            combined_features = np.hstack([user_block, ad_features])
+
+        try:
+            with tracing.span("predict_proba"):
+                return self.model.predict_proba(combined_features)[:, 1]
+        except Exception as e:
+            print(f"批量预测错误: {e}")
+            return np.full(n_ads, 0.5)
+
+    def predict_click_probability_matrix(self, user_features, ad_features):
+        """批量预测多个用户对多个广告的点击概率，只调用一次 predict_proba
+
+        Args:
+            user_features: 用户特征矩阵 (n_users, 8)
+            ad_features: 广告特征矩阵 (n_ads, 8)
+
+        Returns:
+            点击概率矩阵 (n_users, n_ads)
+        """
+        n_users, n_ads = len(user_features), len(ad_features)
+        if not self.is_trained or n_users == 0 or n_ads == 0:
+            return np.full((n_users, n_ads), 0.5)
+
+        # 构建 (n_users * n_ads, 16) 的合并特征矩阵，按用户分块排列
+        with tracing.span("combine_features"):
+            combined_features = np.hstack([
+                np.repeat(user_features, n_ads, axis=0),
+                np.tile(ad_features, (n_users, 1))
+            ])
+
+        try:
+            with tracing.span("predict_proba"):
+                return self.model.predict_proba(combined_features)[:, 1].reshape(n_users, n_ads)
+        except Exception as e:
+            print(f"批量预测错误: {e}")
+            return np.full((n_users, n_ads), 0.5)
+
     def save_model(self, filepath: str):
-        """保存模型"""
+        """保存模型（点击模型与拟合好的特征标准化器）"""
         if self.is_trained:
-            joblib.dump(self.model, filepath)
+            joblib.dump({
+                "model": self.model,
+                "scaler": self.feature_engineer.scaler,
+                "scaler_fitted": self.feature_engineer.is_fitted
+            }, filepath)
             print(f"模型已保存到: {filepath}")
 
     def load_model(self, filepath: str):
-        """加载模型"""
+        """加载模型（兼容只保存了点击模型的旧格式，此时标准化器保持未拟合）"""
         if os.path.exists(filepath):
-            self.model = joblib.load(filepath)
+            state = joblib.load(filepath)
+            if isinstance(state, dict):
+                self.model = state["model"]
+                self.feature_engineer.scaler = state["scaler"]
+                self.feature_engineer.is_fitted = state["scaler_fitted"]
+            else:
+                self.model = state
             self.is_trained = True
             print(f"模型已从 {filepath} 加载")
\ No newline at end of file
@@ -0,0 +1,80 @@
+import json
+import os
+import numpy as np
+import pytest
+from models import ArtifactStore, RecommendationModel, UserEmbeddingModel, schema_hash
+from models.artifact_store import METADATA_FILE
+
+SCHEMA = {"user_features": 8, "ad_features": 8, "click_model": "random_forest"}
+
+
+@pytest.fixture
+def models():
+    rng = np.random.default_rng(0)
+    recommendation_model = RecommendationModel()
+    X = rng.random((40, recommendation_model.combined_feature_dim))
+    recommendation_model.model.fit(X, np.arange(40) % 2)
+    recommendation_model.is_trained = True
+    embedding_model = UserEmbeddingModel()
+    embedding_model.update_user_embedding("u1", "a1", "click")
+    return recommendation_model, embedding_model, X
+
+
+def save(store, models, schema=SCHEMA):
+    recommendation_model, embedding_model, _ = models
+    return store.save(recommendation_model, embedding_model,
+                      {"schema_hash": schema_hash(schema), "watermark": {"interactions": 0}})
+
+
+def test_schema_hash_is_stable_and_order_independent():
+    assert schema_hash(SCHEMA) == schema_hash(dict(reversed(list(SCHEMA.items()))))
+    assert schema_hash(SCHEMA) != schema_hash({**SCHEMA, "click_model": "sgd"})
+
+
+def test_round_trip(tmp_path, models):
+    store = ArtifactStore(str(tmp_path))
+    version = save(store, models)
+    assert version == 1
+    assert store.latest_compatible(schema_hash(SCHEMA)) == 1
+
+    recommendation_model, embedding_model = RecommendationModel(), UserEmbeddingModel()
+    metadata = store.load(version, recommendation_model, embedding_model)
+    assert metadata["version"] == 1
+    X = models[2]
+    assert np.array_equal(recommendation_model.model.predict_proba(X), models[0].model.predict_proba(X))
+    expected_state = models[1].get_state()
+    for key, value in embedding_model.get_state().items():
+        assert np.array_equal(value, expected_state[key])
+
+
+def test_schema_hash_mismatch_is_skipped(tmp_path, models):
+    store = ArtifactStore(str(tmp_path))
+    save(store, models)
+    save(store, models, schema={**SCHEMA, "click_model": "sgd"})
+    # 最新版本结构不一致时退回到较早的兼容版本；都不一致时需要重新训练
+    assert store.latest_compatible(schema_hash(SCHEMA)) == 1
+    assert store.latest_compatible(schema_hash({**SCHEMA, "click_model": "sgd"})) == 2
+    assert store.latest_compatible(schema_hash({**SCHEMA, "user_features": 9})) is None
+
+
+def test_incomplete_or_corrupt_versions_are_skipped(tmp_path, models):
+    store = ArtifactStore(str(tmp_path))
+    save(store, models)
+    save(store, models)
+    with open(os.path.join(store.path_of(2), METADATA_FILE), "w", encoding="utf-8") as f:
+        f.write("{")
+    assert store.read_metadata(2) is None
+    assert store.latest_compatible(schema_hash(SCHEMA)) == 1
+
+    os.makedirs(store.path_of(3))
+    with open(os.path.join(store.path_of(3), METADATA_FILE), "w", encoding="utf-8") as f:
+        json.dump({"schema_hash": schema_hash(SCHEMA)}, f)
+    assert store.latest_compatible(schema_hash(SCHEMA)) == 1
+
+
+def test_prune_keeps_latest_versions(tmp_path, models):
+    store = ArtifactStore(str(tmp_path), keep=2)
+    for _ in range(4):
+        save(store, models)
+    assert store.versions() == [3, 4]
+    assert not any(name.startswith(".tmp-") for name in os.listdir(tmp_path))
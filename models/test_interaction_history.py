@@ -0,0 +1,76 @@
+import numpy as np
+import pytest
+from conftest import build_system
+from models.interaction_history import UserInteractionHistory
+
+ACTIONS = ["click", "view", "purchase", "ignore"]
+
+
+def test_wraparound_keeps_latest_depth_entries():
+    history = UserInteractionHistory(ACTIONS, depth=3)
+    for i in range(7):
+        history.append("u1", i, "click" if i % 2 else "view", timestamp_us=i)
+    ad_rows, action_codes, timestamps = history.recent("u1")
+    assert ad_rows.tolist() == [6, 5, 4]
+    assert action_codes.tolist() == [1, 0, 1]
+    assert timestamps.tolist() == [6, 5, 4]
+    assert history.recent("u1", n=2)[0].tolist() == [6, 5]
+
+
+def test_partial_buffer_and_unknown_user():
+    history = UserInteractionHistory(ACTIONS, depth=5)
+    history.append("u1", 1, "purchase", timestamp_us=0)
+    history.append("u1", 2, "share", timestamp_us=0)
+    ad_rows, action_codes, _ = history.recent("u1")
+    assert ad_rows.tolist() == [2, 1]
+    assert action_codes.tolist() == [-1, 2]
+    assert len(history.recent("nobody")[0]) == 0
+
+
+def test_users_are_isolated_across_growth():
+    history = UserInteractionHistory(ACTIONS, depth=2, initial_users=2)
+    for user in range(5):
+        for i in range(3):
+            history.append(f"u{user}", user * 10 + i, "view", timestamp_us=i)
+    assert len(history) == 5
+    for user in range(5):
+        assert history.recent(f"u{user}")[0].tolist() == [user * 10 + 2, user * 10 + 1]
+
+
+def test_expired_entries_are_skipped():
+    history = UserInteractionHistory(ACTIONS, depth=4, max_age_seconds=10)
+    history.append("u1", 1, "view", timestamp_us=0)
+    history.append("u1", 2, "view", timestamp_us=15_000_000)
+    assert history.recent("u1", now_us=20_000_000)[0].tolist() == [2]
+
+
+def test_array_round_trip_preserves_ring_order():
+    history = UserInteractionHistory(ACTIONS, depth=3)
+    for i in range(5):
+        history.append("u1", i, "click", timestamp_us=i)
+    history.append("u2", 9, "view", timestamp_us=0)
+
+    restored = UserInteractionHistory(ACTIONS, depth=3, initial_users=1)
+    restored.load_arrays(history.to_arrays())
+    for user in ("u1", "u2"):
+        for expected, actual in zip(history.recent(user), restored.recent(user)):
+            assert np.array_equal(expected, actual)
+    restored.append("u1", 5, "click", timestamp_us=5)
+    assert restored.recent("u1")[0].tolist() == [5, 4, 3]
+
+    with pytest.raises(ValueError):
+        UserInteractionHistory(ACTIONS, depth=4).load_arrays(history.to_arrays())
+
+
+def test_replayed_interactions_keep_stored_timestamps():
+    system = build_system(n_ads=20, n_users=5, n_interactions=100)
+    log = system.data_processor.interaction_history
+    user_id = log[len(log) - 1]["user_id"]
+    expected = [np.datetime64(record["timestamp"], "us")
+                for record in log if record["user_id"] == user_id][::-1][:3]
+    recent = system.user_embedding_model.get_recent_interactions(user_id, 3)
+    assert [record["timestamp"] for record in recent] == expected
+
+    # 回放的历史交互按存储的时间判断是否过期，不会被当作刚刚发生
+    system.user_embedding_model.user_interaction_history.max_age_seconds = 60
+    assert system.user_embedding_model.get_recent_interactions(user_id, 3) == []
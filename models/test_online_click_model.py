@@ -0,0 +1,103 @@
+import pickle
+import numpy as np
+import pytest
+from config import Config
+from conftest import build_system
+from models import OnlineClickModel, RecommendationModel
+
+
+@pytest.fixture
+def data():
+    rng = np.random.default_rng(0)
+    X = rng.random((400, 16)) * np.arange(1, 17)
+    y = (X[:, 0] + X[:, 3] / 4 + rng.normal(0, 0.2, 400) > 1.0).astype(int)
+    return X, y
+
+
+def reference_proba(model, X):
+    return model.classifier.predict_proba(model.scaler.transform(X))
+
+
+def test_predict_proba_matches_sklearn(data):
+    X, y = data
+    model = OnlineClickModel().fit(X, y)
+    assert np.allclose(model.predict_proba(X), reference_proba(model, X), rtol=0, atol=1e-12)
+    assert model.score(X, y) > 0.8
+
+
+def test_partial_fit_publishes_new_parameters(data):
+    X, y = data
+    model = OnlineClickModel().fit(X[:200], y[:200])
+    before = model.predict_proba(X)
+    published = model._published
+    model.partial_fit(X[200:264], y[200:264])
+
+    assert model._published is not published
+    assert model.n_updates == 1 and model.n_samples_seen == 264
+    assert not np.allclose(before, model.predict_proba(X))
+    assert np.allclose(model.predict_proba(X), reference_proba(model, X), rtol=0, atol=1e-12)
+    # 已发布的旧参数不会被原地修改（并发读取方持有的引用保持一致）
+    mean, scale, coef, intercept = published
+    assert not np.allclose(coef, model._published[2])
+
+
+def test_scaler_fitted_once(data):
+    X, y = data
+    model = OnlineClickModel()
+    with pytest.raises(ValueError):
+        model.predict_proba(X)
+    model.partial_fit(X[:100], y[:100])
+    mean = model.scaler.mean_.copy()
+    model.partial_fit(X[100:] * 10, y[100:])
+    assert np.array_equal(model.scaler.mean_, mean)
+
+
+def test_single_class_batch(data):
+    X, _ = data
+    model = OnlineClickModel().fit(X[:50], np.zeros(50, dtype=int))
+    assert model.predict_proba(X[:5]).shape == (5, 2)
+
+
+def test_pickle_round_trip(data):
+    X, y = data
+    model = OnlineClickModel().fit(X, y)
+    restored = pickle.loads(pickle.dumps(model))
+    assert np.array_equal(restored.predict_proba(X), model.predict_proba(X))
+    restored.partial_fit(X[:32], y[:32])
+    assert restored.n_updates == 1
+
+    # 发布参数之前保存的产物加载后重新发布
+    state = model.__getstate__()
+    del state["_published"]
+    legacy = OnlineClickModel.__new__(OnlineClickModel)
+    legacy.__setstate__(state)
+    assert np.array_equal(legacy.predict_proba(X), model.predict_proba(X))
+
+
+def test_recommendation_model_partial_fit_uses_log_range(monkeypatch):
+    system = build_system(n_ads=30, n_users=10, n_interactions=300)
+    processor = system.data_processor
+    model = RecommendationModel("sgd")
+    X, y = model.interaction_samples(processor, 0, 200)
+    model.model.fit(X, y)
+    model.is_trained = True
+
+    assert model.partial_fit(processor, 200, 264) == 64
+    assert model.model.n_samples_seen == 264
+    assert RecommendationModel("random_forest").partial_fit(processor, 0, 10) == 0
+
+    # 系统中的增量更新：请求路径只提交，后台执行器中学习新交互并推进游标
+    monkeypatch.setattr(Config, "ONLINE_UPDATE_BATCH_SIZE", 16)
+    start = len(processor.interaction_history)
+    system._swap_models(model, system.user_embedding_model, None, None, start)
+    user_id, ad_id = next(iter(processor.user_profiles)), next(iter(processor.ad_inventory))
+    model_version = system.model_version
+    for i in range(20):
+        system.apply_persisted_interaction(user_id, ad_id, "click" if i % 2 else "view", None)
+    system.close()
+    # 攒够一批后至少更新一次，未学习的剩余交互不足一批，留给下一次
+    assert model.model.n_updates >= 2
+    # 每次发布新参数都递增模型版本号，按旧参数缓存的推荐结果失效
+    assert system.model_version - model_version == model.model.n_updates - 1
+    assert system.online_update_cursor - start >= Config.ONLINE_UPDATE_BATCH_SIZE
+    assert len(processor.interaction_history) - system.online_update_cursor < Config.ONLINE_UPDATE_BATCH_SIZE
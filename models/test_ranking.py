@@ -0,0 +1,38 @@
+import numpy as np
+import pytest
+from models.ranking import top_k_indices
+
+
+def reference_top_k(scores, k):
+    return np.argsort(-scores, kind="stable")[:max(k, 0)]
+
+
+@pytest.mark.parametrize("k", [0, 1, 3, 5, 10])
+def test_matches_stable_sort(k):
+    scores = np.random.default_rng(0).random(10)
+    assert top_k_indices(scores, k).tolist() == reference_top_k(scores, k).tolist()
+
+
+def test_ties_prefer_smaller_index():
+    scores = np.array([1.0, 3.0, 2.0, 3.0, 2.0, 2.0, 1.0])
+    # 第 k 大的分数（2.0）有并列时，按下标顺序补足
+    assert top_k_indices(scores, 4).tolist() == [1, 3, 2, 4]
+    assert top_k_indices(np.zeros(5), 3).tolist() == [0, 1, 2]
+
+
+def test_ties_match_stable_sort_on_integer_scores():
+    scores = np.random.default_rng(1).integers(0, 4, size=200)
+    for k in (1, 7, 50, 199):
+        assert top_k_indices(scores, k).tolist() == reference_top_k(scores, k).tolist()
+
+
+def test_k_larger_than_n_returns_all_sorted():
+    scores = np.array([0.2, 0.9, 0.2, 0.5])
+    assert top_k_indices(scores, 10).tolist() == [1, 3, 0, 2]
+    assert top_k_indices(scores, 4).tolist() == [1, 3, 0, 2]
+
+
+def test_empty_input_and_non_positive_k():
+    assert len(top_k_indices(np.zeros(0), 5)) == 0
+    assert len(top_k_indices(np.array([1.0, 2.0]), 0)) == 0
+    assert len(top_k_indices(np.array([1.0, 2.0]), -1)) == 0
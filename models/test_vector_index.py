@@ -0,0 +1,66 @@
+import numpy as np
+from models import BruteForceIndex, IVFIndex, UserEmbeddingModel
+from models.embedding_store import EmbeddingStore
+
+
+def reference_search(vectors, query, k):
+    vectors = vectors / np.linalg.norm(vectors, axis=1, keepdims=True)
+    scores = vectors @ (query / np.linalg.norm(query))
+    return list(np.argsort(-scores, kind="stable")[:k]), np.sort(scores)[::-1][:k]
+
+
+def test_index_scores_shared_store_rows_without_copy():
+    rng = np.random.default_rng(0)
+    vectors = rng.normal(0, 1, (300, 16))
+    store = EmbeddingStore(16, initial_capacity=4)
+    index = BruteForceIndex(16, store=store)
+    for i, vector in enumerate(vectors):
+        index.add(f"ad_{i}", vector)
+
+    assert len(store) == 300 and index.nbytes == index._inv_norms.nbytes
+    query = rng.normal(0, 1, 16)
+    expected_rows, expected_scores = reference_search(vectors, query, 10)
+    results = index.search(query, 10)
+    assert [ad_id for ad_id, _ in results] == [f"ad_{row}" for row in expected_rows]
+    assert np.allclose([score for _, score in results], expected_scores, atol=1e-5)
+
+    index.remove(f"ad_{expected_rows[0]}")
+    assert f"ad_{expected_rows[0]}" not in store
+    assert [ad_id for ad_id, _ in index.search(query, 9)] == [f"ad_{row}" for row in expected_rows[1:]]
+
+
+def test_ivf_index_on_shared_store_matches_exact_with_all_probes():
+    rng = np.random.default_rng(1)
+    store = EmbeddingStore(8)
+    index = IVFIndex(8, n_lists=4, n_probe=4, min_train_size=0, store=store)
+    exact = BruteForceIndex(8)
+    for i, vector in enumerate(rng.normal(0, 1, (200, 8))):
+        index.add(f"ad_{i}", vector)
+        exact.add(f"ad_{i}", vector)
+    query = rng.normal(0, 1, 8)
+    assert [ad_id for ad_id, _ in index.search(query, 5)] == [ad_id for ad_id, _ in exact.search(query, 5)]
+
+
+def test_shrink_to_fit_releases_spare_capacity():
+    store = EmbeddingStore(4, initial_capacity=1)
+    for i in range(100):
+        store[f"user_{i}"] = np.full(4, i)
+    assert store.capacity <= 125
+    store.shrink_to_fit()
+    assert store.capacity == 100
+    assert np.array_equal(store["user_99"], np.full(4, 99))
+    store["user_100"] = np.ones(4)
+    assert store.capacity == 125 and len(store) == 101
+
+
+def test_loaded_model_rebuilds_index_on_ad_store():
+    model = UserEmbeddingModel(embedding_size=16)
+    for i in range(50):
+        model.update_user_embedding(f"u{i % 5}", f"a{i}", "click")
+    model.shrink_to_fit()
+
+    restored = UserEmbeddingModel(embedding_size=16)
+    restored.load_state(model.get_state())
+    assert restored.ad_index._store is restored.ad_embeddings
+    for user_id in ("u0", "u3"):
+        assert restored.get_user_similar_ads(user_id, 5) == model.get_user_similar_ads(user_id, 5)
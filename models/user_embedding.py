@@ -1,28 +1,49 @@
 import numpy as np
-from collections import defaultdict
+from config import Config
+from .embedding_store import EmbeddingStore
+from .interaction_history import UserInteractionHistory
+from .vector_index import create_vector_index
 
 
 class UserEmbeddingModel:
-    def __init__(self, embedding_size=128):
+    def __init__(self, embedding_size=128, index_type=None):
         self.embedding_size = embedding_size
-        self.user_embeddings = {}
-        self.ad_embeddings = {}
-        self.user_interaction_history = defaultdict(list)
+        # 连续矩阵存储，保留 dict 式访问；as_matrix() 可用于批量计算。
+        # 用户向量只逐行读取作为检索 query，默认用 float16 存储；广告向量要整体参与矩阵打分，默认 float32
+        self.user_embeddings = EmbeddingStore(embedding_size, dtype=Config.USER_EMBEDDING_DTYPE)
+        self.ad_embeddings = EmbeddingStore(embedding_size, dtype=Config.EMBEDDING_DTYPE)
+        # 每个用户只保留最近 INTERACTION_HISTORY_DEPTH 条交互（环形缓冲区）
+        self.user_interaction_history = UserInteractionHistory(
+            Config.INTERACTION_ACTIONS,
+            depth=Config.INTERACTION_HISTORY_DEPTH,
+            max_age_seconds=Config.INTERACTION_HISTORY_MAX_AGE_SECONDS or None
+        )
 
-    def update_user_embedding(self, user_id, ad_id, action):
-        """基于用户交互更新嵌入向量"""
+        # 广告嵌入向量索引，用于按用户向量检索相似广告；直接引用 ad_embeddings 的矩阵，不另存一份向量
+        self.index_type = index_type or Config.EMBEDDING_INDEX_TYPE
+        self.ad_index = self._create_ad_index()
+
+    def _create_ad_index(self):
+        index_kwargs = {}
+        if self.index_type == "ivf":
+            index_kwargs = {"n_probe": Config.EMBEDDING_IVF_NPROBE,
+                            "min_train_size": Config.EMBEDDING_IVF_MIN_TRAIN_SIZE}
+        return create_vector_index(self.index_type, self.embedding_size, store=self.ad_embeddings, **index_kwargs)
+
+    def update_user_embedding(self, user_id, ad_id, action, timestamp_us=None):
+        """基于用户交互更新嵌入向量
+
+        timestamp_us 为交互发生的时间（微秒）；回放已存储的交互时必须传入，否则交互历史按当前时间记录，
+        按时间过期的近期行为特征会出错。实时交互可省略。
+        """
         if user_id not in self.user_embeddings:
             self.user_embeddings[user_id] = np.random.normal(0, 0.1, self.embedding_size)
 
         if ad_id not in self.ad_embeddings:
-            self.ad_embeddings[ad_id] = np.random.normal(0, 0.1, self.embedding_size)
+            self.ad_index.add(ad_id, np.random.normal(0, 0.1, self.embedding_size))
 
         # 记录交互历史
-        self.user_interaction_history[user_id].append({
-            'ad_id': ad_id,
-            'action': action,
-            'timestamp': np.datetime64('now')
-        })
+        self.user_interaction_history.append(user_id, self.ad_embeddings.row_of(ad_id), action, timestamp_us)
 
         user_embedding = self.user_embeddings[user_id]
         ad_embedding = self.ad_embeddings[ad_id]
@@ -35,20 +56,57 @@ class UserEmbeddingModel:
             learning_rate = 0.01
             self.user_embeddings[user_id] = user_embedding + learning_rate * ad_embedding
 
+    def shrink_to_fit(self):
+        """批量训练或回放结束后释放存储扩容留下的空余容量"""
+        self.user_embeddings.shrink_to_fit()
+        self.ad_embeddings.shrink_to_fit()
+        self.ad_index.shrink_to_fit()
+
+    @property
+    def nbytes(self) -> int:
+        """嵌入矩阵与向量索引占用的字节数"""
+        return self.user_embeddings.nbytes + self.ad_embeddings.nbytes + self.ad_index.nbytes
+
+    def get_state(self):
+        """用户/广告嵌入矩阵与交互历史的全部状态（数组形式，可直接 np.savez 保存）"""
+        state = {}
+        for prefix, arrays in (("user", self.user_embeddings.to_arrays()), ("ad", self.ad_embeddings.to_arrays()),
+                               ("history", self.user_interaction_history.to_arrays())):
+            for key, value in arrays.items():
+                state[f"{prefix}_{key}"] = value
+        return state
+
+    def load_state(self, state):
+        """恢复 get_state 保存的状态，并重建广告向量索引"""
+        def arrays(prefix):
+            return {key[len(prefix) + 1:]: state[key] for key in state if key.startswith(prefix + "_")}
+
+        user_arrays, ad_arrays = arrays("user"), arrays("ad")
+        self.user_embeddings = EmbeddingStore.from_arrays(
+            user_arrays["ids"], user_arrays["matrix"], user_arrays["active"], dtype=Config.USER_EMBEDDING_DTYPE)
+        self.ad_embeddings = EmbeddingStore.from_arrays(
+            ad_arrays["ids"], ad_arrays["matrix"], ad_arrays["active"], dtype=Config.EMBEDDING_DTYPE)
+        self.user_interaction_history.load_arrays(arrays("history"))
+        self.ad_index = self._create_ad_index()
+        self.ad_index.rebuild()
+
+    def get_recent_interactions(self, user_id, n=10):
+        """获取用户最近 n 条交互（从新到旧），用于近期行为特征"""
+        history = self.user_interaction_history
+        ad_rows, action_codes, timestamps = history.recent(user_id, n)
+        return [{
+            'ad_id': self.ad_embeddings.ids[row],
+            'action': history.action_name(code),
+            'timestamp': np.datetime64(int(timestamp), 'us')
+        } for row, code, timestamp in zip(ad_rows, action_codes, timestamps)]
+
     def get_user_similar_ads(self, user_id, top_k=5):
-        """获取与用户相似的广告"""
+        """获取与用户相似的广告（通过广告向量索引检索）"""
         if user_id not in self.user_embeddings:
             return []
 
         user_embedding = self.user_embeddings[user_id]
-        similarities = []
-
-        for ad_id, ad_embedding in self.ad_embeddings.items():
-            similarity = self.cosine_similarity(user_embedding, ad_embedding)
-            similarities.append((ad_id, similarity))
-
-        similarities.sort(key=lambda x: x[1], reverse=True)
-        return [ad_id for ad_id, similarity in similarities[:top_k]]
+        return [ad_id for ad_id, similarity in self.ad_index.search(user_embedding, top_k)]
 
     @staticmethod
     def cosine_similarity(vec1, vec2):
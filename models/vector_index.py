@@ -0,0 +1,236 @@
+import numpy as np
+from typing import Dict, Hashable, List, Tuple
+from .embedding_store import EmbeddingStore
+from .ranking import top_k_indices
+
+
+class BruteForceIndex:
+    """精确向量索引：检索为一次矩阵-向量乘法（余弦相似度）
+
+    向量本身不再复制一份：传入 store 时直接引用模型的 EmbeddingStore（如广告嵌入），否则自建一个；
+    索引只额外保存每行范数的倒数，打分时用原始行的内积乘以该倒数得到余弦相似度。
+    """
+
+    def __init__(self, dim: int, initial_capacity: int = 1024, store: EmbeddingStore = None):
+        self.dim = dim
+        self._store = store if store is not None else EmbeddingStore(dim, initial_capacity)
+        self._inv_norms = np.zeros(max(self._store.capacity, 1), dtype=np.float32)
+
+    def __len__(self) -> int:
+        return len(self._store)
+
+    def __contains__(self, item_id: Hashable) -> bool:
+        return item_id in self._store
+
+    @property
+    def ids(self) -> List[Hashable]:
+        """行号 -> id"""
+        return self._store.ids
+
+    @property
+    def nbytes(self) -> int:
+        """索引自身额外占用的字节数（不含共享的向量矩阵）"""
+        return self._inv_norms.nbytes
+
+    @staticmethod
+    def _normalize(vector: np.ndarray) -> np.ndarray:
+        vector = np.asarray(vector, dtype=np.float32)
+        norm = np.linalg.norm(vector, axis=-1, keepdims=True)
+        return vector / np.where(norm == 0, 1.0, norm)
+
+    @staticmethod
+    def _inverse_norms(vectors: np.ndarray) -> np.ndarray:
+        norms = np.linalg.norm(np.asarray(vectors, dtype=np.float32), axis=-1)
+        return np.divide(1.0, norms, out=np.zeros_like(norms), where=norms > 0)
+
+    def _ensure_norms(self, size: int):
+        if size > len(self._inv_norms):
+            inv_norms = np.zeros(max(size, 2 * len(self._inv_norms)), dtype=np.float32)
+            inv_norms[:len(self._inv_norms)] = self._inv_norms
+            self._inv_norms = inv_norms
+
+    def add(self, item_id: Hashable, vector: np.ndarray) -> int:
+        """新增或更新向量（写入存储），返回行号"""
+        row = self._store.set(item_id, vector)
+        self._ensure_norms(row + 1)
+        self._inv_norms[row] = self._inverse_norms(self._store.as_matrix()[row])
+        self._on_vector_changed(row)
+        return row
+
+    def remove(self, item_id: Hashable) -> bool:
+        """删除向量，行号回收复用"""
+        row = self._store.row_of(item_id)
+        if row is None:
+            return False
+        self._on_vector_removed(row)
+        self._inv_norms[row] = 0
+        return self._store.remove(item_id)
+
+    def rebuild(self):
+        """存储中的向量被批量写入后（如从模型产物加载），重新计算全部行的范数"""
+        size = self._store.size
+        self._inv_norms = np.zeros(max(size, 1), dtype=np.float32)
+        for start in range(0, size, 65536):
+            self._inv_norms[start:start + 65536] = self._inverse_norms(self._store.as_matrix()[start:start + 65536])
+
+    def shrink_to_fit(self):
+        """释放范数数组扩容留下的空余容量"""
+        self._inv_norms = self._inv_norms[:max(self._store.size, 1)].copy()
+
+    def _on_vector_changed(self, row: int):
+        pass
+
+    def _on_vector_removed(self, row: int):
+        pass
+
+    def _score_rows(self, query: np.ndarray, rows, k: int) -> List[Tuple[Hashable, float]]:
+        """对给定行（None 表示全部）打分并取前 k 个，分数相同时行号小的在前"""
+        vectors = self._store.as_matrix()
+        if rows is None:
+            scores = (vectors @ query) * self._inv_norms[:len(vectors)]
+            scores[~self._store.active_mask()] = -np.inf
+            top = top_k_indices(scores, min(k, len(self._store)))
+            return [(self.ids[row], float(scores[row])) for row in top]
+
+        scores = (vectors[rows] @ query) * self._inv_norms[rows]
+        top = top_k_indices(scores, k)
+        return [(self.ids[rows[i]], float(scores[i])) for i in top]
+
+    def search(self, query: np.ndarray, k: int) -> List[Tuple[Hashable, float]]:
+        """返回与 query 余弦相似度最高的 k 个 (id, 相似度)"""
+        if len(self._store) == 0 or k <= 0:
+            return []
+        return self._score_rows(self._normalize(query), None, k)
+
+
+class IVFIndex(BruteForceIndex):
+    """近似向量索引（IVF）：球面 k-means 粗聚类，检索时只扫描与 query 最近的 n_probe 个簇
+
+    向量数少于 min_train_size 时退化为精确检索；达到后在首次检索时训练聚类中心，
+    之后新增/更新的向量直接分配到最近的簇。向量数增长到训练时的 retrain_factor 倍时重新训练。
+    """
+
+    def __init__(self, dim: int, n_probe: int = 8, n_lists: int = None, min_train_size: int = 10000,
+                 retrain_factor: float = 4.0, initial_capacity: int = 1024, seed: int = 42,
+                 store: EmbeddingStore = None):
+        super().__init__(dim, initial_capacity, store)
+        self.n_probe = n_probe
+        self.n_lists = n_lists
+        self.min_train_size = min_train_size
+        self.retrain_factor = retrain_factor
+        self._rng = np.random.default_rng(seed)
+        self._centroids = None
+        self._trained_size = 0
+        self._assignments = np.full(max(self._store.capacity, 1), -1, dtype=np.int64)
+        self._lists: List[set] = []
+        self._list_arrays: Dict[int, np.ndarray] = {}  # 簇 -> 行号数组（按需生成的缓存）
+
+    @property
+    def is_trained(self) -> bool:
+        return self._centroids is not None
+
+    def _ensure_assignments(self, size: int):
+        if size > len(self._assignments):
+            assignments = np.full(max(size, 2 * len(self._assignments)), -1, dtype=np.int64)
+            assignments[:len(self._assignments)] = self._assignments
+            self._assignments = assignments
+
+    def _assign(self, vectors: np.ndarray, chunk_size: int = 65536) -> np.ndarray:
+        """分块计算每个向量最近的聚类中心（按内积取最大，向量无需归一化）"""
+        assignments = np.empty(len(vectors), dtype=np.int64)
+        for start in range(0, len(vectors), chunk_size):
+            assignments[start:start + chunk_size] = np.argmax(
+                vectors[start:start + chunk_size] @ self._centroids.T, axis=1)
+        return assignments
+
+    def train(self, n_iter: int = 10):
+        """在当前向量的抽样上训练聚类中心，并重建全部倒排列表"""
+        vectors = self._store.as_matrix()
+        rows = np.flatnonzero(self._store.active_mask())
+        n_lists = self.n_lists or max(1, int(np.sqrt(len(rows))))
+        sample_size = min(len(rows), 64 * n_lists)
+        sample_rows = self._rng.choice(rows, sample_size, replace=False)
+        sample = vectors[sample_rows].astype(np.float32) * self._inv_norms[sample_rows, None]
+
+        centroids = sample[self._rng.choice(sample_size, n_lists, replace=False)].copy()
+        for _ in range(n_iter):
+            labels = np.argmax(sample @ centroids.T, axis=1)
+            sums = np.zeros_like(centroids)
+            np.add.at(sums, labels, sample)
+            empty = np.bincount(labels, minlength=n_lists) == 0
+            # 空簇重新随机选一个样本作为中心
+            sums[empty] = sample[self._rng.choice(sample_size, int(empty.sum()))]
+            centroids = self._normalize(sums)
+        self._centroids = centroids
+
+        self._ensure_assignments(self._store.size)
+        self._assignments[:] = -1
+        self._assignments[rows] = self._assign(vectors[rows])
+        self._lists = [set() for _ in range(n_lists)]
+        order = np.argsort(self._assignments[rows], kind="stable")
+        boundaries = np.searchsorted(self._assignments[rows][order], np.arange(n_lists + 1))
+        for list_id in range(n_lists):
+            self._lists[list_id] = set(rows[order[boundaries[list_id]:boundaries[list_id + 1]]].tolist())
+        self._list_arrays = {}
+        self._trained_size = len(rows)
+
+    def rebuild(self):
+        super().rebuild()
+        # 聚类在下一次检索时按新的向量重新训练
+        self._centroids = None
+        self._assignments = np.full(max(self._store.size, 1), -1, dtype=np.int64)
+        self._lists, self._list_arrays = [], {}
+
+    def shrink_to_fit(self):
+        super().shrink_to_fit()
+        self._assignments = self._assignments[:max(self._store.size, 1)].copy()
+
+    def _on_vector_changed(self, row: int):
+        if not self.is_trained:
+            return
+        self._ensure_assignments(row + 1)
+        self._on_vector_removed(row)
+        list_id = int(np.argmax(self._centroids @ self._store.as_matrix()[row]))
+        self._assignments[row] = list_id
+        self._lists[list_id].add(row)
+        self._list_arrays.pop(list_id, None)
+
+    def _on_vector_removed(self, row: int):
+        list_id = self._assignments[row] if row < len(self._assignments) else -1
+        if list_id >= 0:
+            self._lists[list_id].discard(row)
+            self._list_arrays.pop(int(list_id), None)
+            self._assignments[row] = -1
+
+    def _list_rows(self, list_id: int) -> np.ndarray:
+        rows = self._list_arrays.get(list_id)
+        if rows is None:
+            rows = np.fromiter(self._lists[list_id], dtype=np.int64, count=len(self._lists[list_id]))
+            rows.sort()
+            self._list_arrays[list_id] = rows
+        return rows
+
+    def search(self, query: np.ndarray, k: int) -> List[Tuple[Hashable, float]]:
+        n_vectors = len(self._store)
+        if n_vectors == 0 or k <= 0:
+            return []
+        if n_vectors < self.min_train_size:
+            return super().search(query, k)
+        if not self.is_trained or n_vectors > self.retrain_factor * self._trained_size:
+            self.train()
+
+        query = self._normalize(query)
+        n_probe = min(self.n_probe, len(self._centroids))
+        probe = np.argpartition(-(self._centroids @ query), n_probe - 1)[:n_probe]
+        rows = np.concatenate([self._list_rows(int(list_id)) for list_id in probe])
+        rows.sort()
+        return self._score_rows(query, rows, k)
+
+
+def create_vector_index(index_type: str, dim: int, store: EmbeddingStore = None, **kwargs) -> BruteForceIndex:
+    """按类型创建向量索引：exact（精确）或 ivf（近似）；传入 store 时直接在该存储的向量上建索引"""
+    if index_type == "exact":
+        return BruteForceIndex(dim, store=store)
+    if index_type == "ivf":
+        return IVFIndex(dim, store=store, **kwargs)
+    raise ValueError(f"未知的向量索引类型: {index_type}")
@@ -0,0 +1,164 @@
+import multiprocessing
+import threading
+import time
+from datetime import datetime
+from typing import Any, Dict, Optional
+from metrics import MODEL_RETRAINS, STAGE_SECONDS
+
+
+def train_artifact() -> int:
+    """训练进程入口：从数据库加载当前数据快照，训练模型并保存为新的产物版本，返回版本号"""
+    from database.database import SessionLocal
+    from main import PersonalizedAdRecommendation
+
+    system = PersonalizedAdRecommendation(session_factory=SessionLocal)
+    system.data_processor.load_data_from_db()
+    system.train_models()
+    version = system.save_artifact()
+    if version is None:
+        raise RuntimeError("模型产物保存失败")
+    return version
+
+
+def _train_worker(conn):
+    try:
+        conn.send(("ok", train_artifact()))
+    except BaseException as e:
+        conn.send(("error", f"{type(e).__name__}: {e}"))
+    finally:
+        conn.close()
+
+
+class BackgroundTrainer:
+    """后台重新训练：在独立进程中训练并保存模型产物，完成后热替换服务中的模型
+
+    训练进程使用 spawn 方式启动（不继承服务进程的数据库连接和线程），自行从数据库加载数据，
+    与服务进程只通过产物目录交换结果；同一时间最多一个训练任务。
+    服务进程中的等待线程在训练完成后调用 system.install_artifact 换入新模型，
+    并补充训练快照之后的新交互：起点为触发时交互日志的长度，加上触发之后、训练进程加载数据之前
+    写入数据库的条数（按数据库记录数之差估算；有其他写入方时只是近似）。
+    """
+
+    def __init__(self, system, retrain_interval: float = 0, retrain_after_interactions: int = 0):
+        """
+        Args:
+            system: PersonalizedAdRecommendation 实例
+            retrain_interval: 距上次训练开始的秒数达到该值时触发，0 表示关闭
+            retrain_after_interactions: 距上次训练新增的交互条数达到该值时触发，0 表示关闭
+        """
+        self.system = system
+        self.retrain_interval = retrain_interval
+        self.retrain_after_interactions = retrain_after_interactions
+        self._lock = threading.Lock()
+        self._process = None
+        self._thread = None
+        self._closed = False
+        self._last_started = time.monotonic()
+        self._interactions_at_last_train = len(system.data_processor.interaction_history)
+        self._stats = {
+            "state": "idle",
+            "runs": 0,
+            "failures": 0,
+            "last_trigger": None,
+            "last_started_at": None,
+            "last_finished_at": None,
+            "last_train_seconds": None,
+            "last_error": None,
+            "last_swap": None
+        }
+
+    @property
+    def running(self) -> bool:
+        return self._thread is not None and self._thread.is_alive()
+
+    def interactions_since_last_train(self) -> int:
+        return len(self.system.data_processor.interaction_history) - self._interactions_at_last_train
+
+    def due(self) -> Optional[str]:
+        """按定时和新增交互条数判断是否需要重新训练，返回触发原因"""
+        if self.retrain_interval > 0 and time.monotonic() - self._last_started >= self.retrain_interval:
+            return "schedule"
+        if 0 < self.retrain_after_interactions <= self.interactions_since_last_train():
+            return "interactions"
+        return None
+
+    def trigger(self, reason: str) -> bool:
+        """开始一次后台训练；已有训练在进行或已关闭时返回 False"""
+        with self._lock:
+            if self._closed or self.running:
+                return False
+            replay_from = len(self.system.data_processor.interaction_history)
+            self._last_started = time.monotonic()
+            self._interactions_at_last_train = replay_from
+            self._stats.update(state="training", last_trigger=reason,
+                               last_started_at=datetime.now().isoformat(), last_error=None)
+            self._thread = threading.Thread(target=self._run, args=(replay_from,),
+                                            name="model-retrain", daemon=True)
+            self._thread.start()
+        print(f"🏋️ 后台重新训练已开始（触发原因: {reason}）")
+        return True
+
+    def _train_in_subprocess(self) -> int:
+        context = multiprocessing.get_context("spawn")
+        receiver, sender = context.Pipe(duplex=False)
+        process = context.Process(target=_train_worker, args=(sender,), name="model-retrain", daemon=True)
+        with self._lock:
+            if self._closed:
+                raise RuntimeError("后台训练已关闭")
+            process.start()
+            self._process = process
+        sender.close()
+        try:
+            status, value = receiver.recv()
+        except EOFError:
+            process.join()
+            raise RuntimeError(f"训练进程异常退出（exitcode={process.exitcode}）")
+        finally:
+            receiver.close()
+        process.join()
+        if status != "ok":
+            raise RuntimeError(value)
+        return value
+
+    def _run(self, replay_from: int):
+        start = time.perf_counter()
+        try:
+            # 在训练线程中查询（数据库不可用时记为一次训练失败，不影响触发方）
+            db_interactions = self.system.data_processor.count_interactions_through()
+            version = self._train_in_subprocess()
+            train_seconds = time.perf_counter() - start
+            STAGE_SECONDS.observe(train_seconds, stage="retrain")
+            self._stats.update(state="swapping", last_train_seconds=train_seconds)
+            swap = self.system.install_artifact(version, replay_from, db_interactions)
+        except Exception as e:
+            MODEL_RETRAINS.inc(result="failure")
+            self._stats.update(failures=self._stats["failures"] + 1, last_error=str(e))
+            print(f"❌ 后台重新训练失败: {e}")
+        else:
+            MODEL_RETRAINS.inc(result="success")
+            self._stats.update(last_swap=swap)
+            print(f"✅ 后台重新训练完成: 训练耗时 {self._stats['last_train_seconds']:.1f} 秒")
+        finally:
+            self._stats.update(state="idle", runs=self._stats["runs"] + 1,
+                               last_finished_at=datetime.now().isoformat())
+            with self._lock:
+                self._process = None
+
+    def stop(self):
+        """关闭：终止进行中的训练进程（已训练的产物版本保留在产物目录，下次启动可直接加载）"""
+        with self._lock:
+            self._closed = True
+            process = self._process
+        if process is not None and process.is_alive():
+            process.terminate()
+        if self._thread is not None:
+            self._thread.join(timeout=10)
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            **self._stats,
+            "retrain_interval": self.retrain_interval,
+            "retrain_after_interactions": self.retrain_after_interactions,
+            "interactions_since_last_train": self.interactions_since_last_train()
+        }
+
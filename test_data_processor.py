@@ -0,0 +1,147 @@
+import copy
+from datetime import datetime, timedelta
+import pytest
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+from database.models import Base, User, Advertisement, UserInteraction
+from data_processor import DataProcessor
+
+T0 = datetime(2024, 1, 1, 12, 0, 0)
+
+
+@pytest.fixture
+def session_factory(tmp_path):
+    engine = create_engine(f"sqlite:///{tmp_path / 'sync.db'}")
+    Base.metadata.create_all(engine)
+    factory = sessionmaker(bind=engine)
+    with factory.begin() as session:
+        session.add_all([
+            User(user_id="u1", age=25, gender="male", interests=["sports"], updated_at=T0),
+            Advertisement(ad_id="a1", title="A1", category="sports", keywords=["sports"], target_age_min=18,
+                          target_age_max=40, target_gender="all", bid_price=1.0, is_active=True, updated_at=T0),
+            Advertisement(ad_id="a2", title="A2", category="food", keywords=["food"], target_age_min=18,
+                          target_age_max=40, target_gender="all", bid_price=2.0, is_active=True, updated_at=T0),
+            UserInteraction(user_id="u1", ad_id="a1", action="view", timestamp=T0),
+        ])
+    yield factory
+    engine.dispose()
+
+
+@pytest.fixture
+def processor(session_factory):
+    processor = DataProcessor(session_factory=session_factory)
+    processor.load_data_from_db()
+    return processor
+
+
+def add(session_factory, *rows):
+    with session_factory.begin() as session:
+        session.add_all(rows)
+
+
+def test_sync_without_changes_is_empty(processor):
+    stats = processor.sync_delta()
+    assert (stats["users"], stats["ads_upserted"], stats["ads_deactivated"], stats["interactions"]) == (0, 0, 0, 0)
+    assert stats["first_new_interaction"] == 1
+
+
+def test_overlap_window_picks_up_same_second_rows_once(processor, session_factory):
+    # updated_at 与高水位在同一秒（秒级精度的数据库会出现），需要靠重叠窗口拉取
+    add(session_factory, User(user_id="u2", age=30, gender="female", interests=[], updated_at=T0))
+    stats = processor.sync_delta()
+    assert stats["users"] == 1
+    assert processor.user_profiles["u2"]["gender"] == "female"
+
+    # 重叠窗口内再次拉到的未变化行不计为变更
+    assert processor.sync_delta()["users"] == 0
+
+
+def test_ad_changes_and_deactivation(processor, session_factory):
+    later = T0 + timedelta(seconds=5)
+    with session_factory.begin() as session:
+        session.query(Advertisement).filter_by(ad_id="a1").update({"bid_price": 3.0, "updated_at": later})
+        session.query(Advertisement).filter_by(ad_id="a2").update({"is_active": False, "updated_at": later})
+    stats = processor.sync_delta()
+    assert (stats["ads_upserted"], stats["ads_deactivated"]) == (1, 1)
+    assert processor.ad_inventory["a1"]["bid_price"] == 3.0
+    assert "a2" not in processor.ad_inventory
+    assert processor.watermarks["ads"] == later
+
+    stats = processor.sync_delta()
+    assert (stats["ads_upserted"], stats["ads_deactivated"]) == (0, 0)
+
+
+def test_interactions_are_appended_once_and_own_writes_skipped(processor, session_factory):
+    add(session_factory,
+        UserInteraction(user_id="u1", ad_id="a2", action="click", timestamp=T0, context={"writer": "other"}),
+        UserInteraction(user_id="u1", ad_id="a1", action="click", timestamp=T0,
+                        context={"writer": processor.writer_id}),
+        UserInteraction(user_id="u1", ad_id="a2", action="purchase", timestamp=T0))
+    stats = processor.sync_delta()
+    assert stats["interactions"] == 2
+    assert stats["first_new_interaction"] == 1
+    log = processor.interaction_history
+    assert [(i["ad_id"], i["action"]) for i in list(log)[1:]] == [("a2", "click"), ("a2", "purchase")]
+    # 高水位推进到最后一条（包括跳过的本进程记录），再次同步不会重复追加
+    assert processor.watermarks["interactions"] == 4
+    assert processor.sync_delta()["interactions"] == 0
+    assert len(log) == 3
+
+
+def test_late_committed_interaction_ids_are_synced_once(processor, session_factory):
+    # 自增 id 10 先提交、id 5 后提交（MySQL 并发事务），id 5 低于高水位但在重叠窗口内
+    add(session_factory, UserInteraction(id=10, user_id="u1", ad_id="a1", action="click", timestamp=T0))
+    assert processor.sync_delta()["interactions"] == 1
+    assert processor.watermarks["interactions"] == 10
+
+    add(session_factory, UserInteraction(id=5, user_id="u1", ad_id="a2", action="purchase", timestamp=T0))
+    stats = processor.sync_delta()
+    assert (stats["interactions"], stats["late_interactions"]) == (1, 1)
+    assert processor.interaction_history[-1]["action"] == "purchase"
+    assert processor.watermarks["interactions"] == 10
+
+    assert processor.sync_delta()["interactions"] == 0
+    assert len(processor.interaction_history) == 3
+
+
+def test_in_place_profile_edits_invalidate_cached_features(processor):
+    changed = []
+    processor.add_profile_listener(changed.append)
+    before = processor.create_user_features("u1")
+
+    processor.user_profiles["u1"]["age"] = 40
+    assert processor.create_user_features("u1")[0] == 0.4
+    processor.user_profiles["u1"]["interests"].append("technology")
+    assert processor.create_user_features("u1")[2] == before[2] + 0.1
+    processor.user_profiles["u1"].update(gender="female")
+    assert processor.create_user_features("u1")[1] == 0.0
+    assert changed == ["u1", "u1", "u1"]
+
+    # 保存的画像是副本，复制后是普通 dict，修改副本或调用方原来的字典都不会影响缓存
+    profile = {"age": 20, "gender": "male", "interests": [], "location": "Beijing", "device": "mobile"}
+    processor.user_profiles["u2"] = profile
+    profile["age"] = 90
+    snapshot = dict(processor.user_profiles["u2"])
+    snapshot["age"] = 70
+    assert processor.create_user_features("u2")[0] == 0.2
+    assert type(copy.deepcopy(processor.user_profiles["u2"])) is dict
+    assert type(copy.deepcopy(processor.user_profiles["u2"])["interests"]) is list
+
+
+def test_unknown_actions_are_skipped_and_counted(session_factory):
+    add(session_factory, UserInteraction(user_id="u1", ad_id="a2", action="share", timestamp=T0))
+    processor = DataProcessor(session_factory=session_factory)
+    processor.load_data_from_db()
+    assert [i["action"] for i in processor.interaction_history] == ["view"]
+    assert processor.unknown_action_interactions == 1
+
+    add(session_factory,
+        UserInteraction(user_id="u1", ad_id="a1", action="like", timestamp=T0),
+        UserInteraction(user_id="u1", ad_id="a1", action="click", timestamp=T0))
+    stats = processor.sync_delta()
+    assert (stats["interactions"], stats["unknown_actions"]) == (1, 1)
+    assert processor.unknown_action_interactions == 2
+    # 跳过的记录同样推进高水位，不会被反复拉取
+    assert processor.watermarks["interactions"] == 4
+    assert processor.sync_delta()["unknown_actions"] == 0
+    assert processor.interaction_history.actions.values == ["click", "view", "purchase", "ignore"]
@@ -0,0 +1,54 @@
+import numpy as np
+import pytest
+from conftest import build_system, check_equivalent
+from config import Config
+
+
+@pytest.fixture(scope="module")
+def system():
+    return build_system(n_ads=200, n_users=10, n_interactions=1000)
+
+
+@pytest.mark.parametrize("top_k", [1, 10, 500])
+def test_batch_scoring_matches_per_ad(system, top_k):
+    for user_id in list(system.data_processor.user_profiles)[:5]:
+        check_equivalent(system, user_id, top_k)
+
+
+
+def test_batch_scoring_matches_per_ad_without_eligibility(system, monkeypatch):
+    monkeypatch.setattr(Config, "ELIGIBILITY_FILTER_ENABLED", False)
+    for user_id in list(system.data_processor.user_profiles)[:5]:
+        check_equivalent(system, user_id, 20)
+
+def test_batch_scoring_matches_per_ad_after_inventory_changes():
+    system = build_system(n_ads=50, n_users=5, n_interactions=200)
+    processor = system.data_processor
+    ad_ids = list(processor.ad_inventory)
+    processor.deactivate_ad(ad_ids[0])
+    processor.upsert_ad(ad_ids[1], {**processor.ad_inventory[ad_ids[1]], "bid_price": 4.9})
+    processor.upsert_ad("ad_new", {"title": "新广告", "category": "sports", "keywords": ["sports"],
+                                   "target_age": [10, 90], "target_gender": "all", "bid_price": 3.0})
+    user_id = next(iter(processor.user_profiles))
+    check_equivalent(system, user_id, 60)
+    assert ad_ids[0] not in {r["ad_id"] for r in system._score_ads_batch(user_id, 60)}
+
+
+def test_batch_recommendations_match_single_user(system):
+    user_ids = list(system.data_processor.user_profiles)[:8]
+    results = system.get_batch_recommendations(user_ids + ["missing"], top_k=10)
+    assert "error" in results["missing"][0]
+    for user_id in user_ids:
+        expected = system._score_ads_batch(user_id, 10, full_scan=True)
+        assert [r["ad_id"] for r in results[user_id]] == [r["ad_id"] for r in expected]
+        assert np.allclose([r["combined_score"] for r in results[user_id]],
+                           [r["combined_score"] for r in expected], rtol=0, atol=1e-9)
+
+
+def test_batch_recommendations_are_chunked(system, monkeypatch):
+    user_ids = list(system.data_processor.user_profiles)[:5]
+    expected = system.get_batch_recommendations(user_ids, top_k=5)
+    monkeypatch.setattr(Config, "BATCH_SCORING_MAX_ROWS", 1)
+    chunked = system.get_batch_recommendations(user_ids, top_k=5)
+    for user_id in user_ids:
+        assert [r["ad_id"] for r in chunked[user_id]] == [r["ad_id"] for r in expected[user_id]]
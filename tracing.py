@@ -0,0 +1,85 @@
+import contextvars
+import time
+from contextlib import contextmanager, nullcontext
+from typing import Any, Dict, Optional
+
+# 当前请求的追踪记录；未开启追踪时为 None，span()/count() 直接返回
+_active_trace: contextvars.ContextVar = contextvars.ContextVar("active_trace", default=None)
+
+_NOOP_SPAN = nullcontext()
+
+
+class Trace:
+    """一次请求的耗时追踪：按发生顺序记录各阶段（span）的耗时与嵌套深度，以及计数项（候选数、缓存命中等）"""
+
+    def __init__(self):
+        self.start = time.perf_counter()
+        self.spans = []
+        self.counters: Dict[str, Any] = {}
+        self._depth = 0
+
+    def count(self, key: str, amount=1):
+        self.counters[key] = self.counters.get(key, 0) + amount
+
+    def to_dict(self) -> Dict[str, Any]:
+        """耗时单位为毫秒；stage_totals 按阶段名汇总（同一阶段可能出现多次，如批量推荐的每个分块）"""
+        totals = {}
+        for name, _, duration, _ in self.spans:
+            totals[name] = totals.get(name, 0.0) + 1000 * duration
+        return {
+            "total_ms": 1000 * (time.perf_counter() - self.start),
+            "spans": [{"name": name, "start_ms": 1000 * (start - self.start), "duration_ms": 1000 * duration,
+                       "depth": depth} for name, start, duration, depth in self.spans],
+            "stage_totals": totals,
+            "counters": dict(self.counters)
+        }
+
+
+class _Span:
+    __slots__ = ("trace", "name", "start", "depth")
+
+    def __init__(self, trace: Trace, name: str):
+        self.trace = trace
+        self.name = name
+
+    def __enter__(self):
+        self.depth = self.trace._depth
+        self.trace._depth += 1
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        duration = time.perf_counter() - self.start
+        self.trace._depth -= 1
+        self.trace.spans.append((self.name, self.start, duration, self.depth))
+        return False
+
+
+@contextmanager
+def start_trace():
+    """在当前上下文开启追踪，退出时恢复；通过 contextvars 传递，随 run_in_executor 的上下文拷贝进入打分线程"""
+    trace = Trace()
+    token = _active_trace.set(trace)
+    try:
+        yield trace
+    finally:
+        _active_trace.reset(token)
+
+
+def current_trace() -> Optional[Trace]:
+    return _active_trace.get()
+
+
+def span(name: str):
+    """记录一个阶段的耗时，如 with span("click_predict"): ...；未开启追踪时返回共享的空上下文"""
+    trace = _active_trace.get()
+    if trace is None:
+        return _NOOP_SPAN
+    return _Span(trace, name)
+
+
+def count(key: str, amount=1):
+    """累加当前追踪的计数项；未开启追踪时不做任何事"""
+    trace = _active_trace.get()
+    if trace is not None:
+        trace.count(key, amount)